@@ -0,0 +1,80 @@
+"""Inserts per second: check-then-insert vs. the single-statement add_expense.
+
+    python -m benchmarks.bench_add_expense --rows 2000
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import aiosqlite
+
+from src.db import add_expense, init_db, is_user_registered, register_user
+
+USER_ID = 1
+
+
+async def legacy_add_expense(conn: aiosqlite.Connection, i: int) -> None:
+    """The previous hot path: registration check, two SELECTs, INSERT, commit."""
+    await is_user_registered(conn, USER_ID)
+    cur = await conn.execute("SELECT 1 FROM categories WHERE name = ?", ("TEST",))
+    await cur.fetchone()
+    await cur.close()
+    cur = await conn.execute(
+        "SELECT 1 FROM user_categories WHERE user_id = ? AND category_name = ?",
+        (USER_ID, "TEST"),
+    )
+    await cur.fetchone()
+    await cur.close()
+    await conn.execute(
+        """
+        INSERT INTO expenses (message_id, chat_id, user_id, date, amount_cents, category_name, currency, message)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (i, USER_ID, USER_ID, 1735689600, 100, "TEST", "ARS", "test 1"),
+    )
+    await conn.commit()
+
+
+async def single_statement_add_expense(conn: aiosqlite.Connection, i: int) -> None:
+    await add_expense(
+        conn,
+        message_id=i,
+        chat_id=USER_ID,
+        user_id=USER_ID,
+        date=1735689600,
+        value=1.0,
+        category="TEST",
+        currency="ARS",
+        message="test 1",
+    )
+
+
+async def run(rows: int) -> None:
+    for name, insert in (
+        ("legacy", legacy_add_expense),
+        ("single", single_statement_add_expense),
+    ):
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = await aiosqlite.connect(os.path.join(tmp, "bench.db"))
+            await init_db(conn)
+            await register_user(conn, USER_ID)
+            start = time.perf_counter()
+            for i in range(rows):
+                await insert(conn, i)
+            elapsed = time.perf_counter() - start
+            await conn.close()
+        print(f"{name:>7}: {rows / elapsed:,.0f} inserts/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows))
+
+
+if __name__ == "__main__":
+    main()
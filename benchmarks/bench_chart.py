@@ -0,0 +1,73 @@
+"""Event-loop stalls while rendering /chart: inline vs. in the process pool.
+
+    python -m benchmarks.bench_chart --charts 20
+
+A ticker coroutine sleeps 10 ms in a loop and records how late it wakes
+up; that lateness is what every other update waits while a chart renders.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import List
+
+from src.charts import ChartRenderer, ChartRow, render_monthly_chart
+
+MONTHS = [f"2025-{m:02d}" for m in range(1, 13)]
+CATEGORIES = ["SUPERMERCADO", "SALIR A COMER", "TRANSPORTE", "SERVICIOS", "SALUD"]
+
+
+def sample_rows(seed: int) -> List[ChartRow]:
+    rng = random.Random(seed)
+    return [
+        (month, category, currency, rng.uniform(1000, 50000))
+        for month in MONTHS
+        for category in CATEGORIES
+        for currency in ("ARS", "USD")
+    ]
+
+
+async def ticker(stop: asyncio.Event, lags: List[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - start - 0.01)
+
+
+async def measure(label: str, charts: int, pooled: bool) -> None:
+    renderer = ChartRenderer(workers=2, max_entries=0)
+    if pooled:
+        renderer.start()
+        await asyncio.sleep(3)  # let the warm-up import finish
+    stop = asyncio.Event()
+    lags: List[float] = []
+    tick = asyncio.create_task(ticker(stop, lags))
+    start = time.perf_counter()
+    for i in range(charts):
+        if pooled:
+            await renderer.render((i, "bench", 0), sample_rows(i), MONTHS)
+        else:
+            render_monthly_chart(sample_rows(i), MONTHS)
+            await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    renderer.close()
+    print(
+        f"{label:<8} {charts} charts in {elapsed:5.2f}s, "
+        f"loop lag max {max(lags) * 1000:7.1f} ms, "
+        f"mean {sum(lags) / len(lags) * 1000:6.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--charts", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(measure("inline", args.charts, pooled=False))
+    asyncio.run(measure("pool", args.charts, pooled=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""A month's total in the base currency: per-row conversion vs. the rollup.
+
+    python -m benchmarks.bench_fx --rows 100000
+
+Per-row is what a total costs without amount_base_cents: fetch every
+expense of the month and convert each with its day's rate in Python.
+Rollup is get_monthly_base_total, one SUM over expense_monthly_totals.
+Also times the startup backfill and one in-memory rate lookup.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+import aiosqlite
+
+from src.db import (
+    backfill_base_amounts,
+    get_fx_rates,
+    get_monthly_base_total,
+    import_fx_rates,
+    init_db,
+    register_user,
+)
+from src.fx_rates import FxRates, fx_rates
+
+MONTH_START = 1735689600  # 2025-01-01
+CURRENCIES = ("ARS", "USD", "EUR", "BRL")
+
+
+def sample_rates(days: int):
+    start = date(2024, 12, 1)
+    return [
+        ((start + timedelta(days=d)).isoformat(), currency, rate * (1 + d / 1000))
+        for d in range(days)
+        for currency, rate in (("USD", 1000.0), ("EUR", 1100.0), ("BRL", 180.0))
+    ]
+
+
+async def per_row(conn: aiosqlite.Connection, index: FxRates) -> float:
+    cur = await conn.execute(
+        """
+        SELECT amount_cents, currency, date FROM expenses
+        WHERE user_id = 1 AND date >= ? AND date < ?
+        """,
+        (MONTH_START, MONTH_START + 31 * 86400),
+    )
+    total = 0
+    for cents, currency, epoch in await cur.fetchall():
+        total += index.to_base_cents(cents, currency, epoch) or 0
+    await cur.close()
+    return total / 100
+
+
+async def run(rows: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = await aiosqlite.connect(os.path.join(tmp, "bench.db"))
+        await init_db(conn)
+        await register_user(conn, 1)
+        spread = 31 * 86400 // rows or 1
+        expenses = [
+            (i, MONTH_START + i * spread, 100 + i % 5000, CURRENCIES[i % 4], f"m{i}")
+            for i in range(rows)
+        ]
+        start = time.perf_counter()
+        await conn.executemany(
+            """
+            INSERT INTO expenses (message_id, chat_id, user_id, date, amount_cents, category_name, currency, message)
+            VALUES (?, 1, 1, ?, ?, 'SUPERMERCADO', ?, ?)
+            """,
+            expenses,
+        )
+        await conn.commit()
+        insert = time.perf_counter() - start
+
+        await import_fx_rates(conn, [(c, d, r) for d, c, r in sample_rates(days=120)])
+        start = time.perf_counter()
+        await backfill_base_amounts(conn, "ARS")
+        backfill = time.perf_counter() - start
+        fx_rates.load(await get_fx_rates(conn))
+
+        lookups = [(e[2], e[3], e[1]) for e in expenses]
+        start = time.perf_counter()
+        for cents, currency, epoch in lookups:
+            fx_rates.to_base_cents(cents, currency, epoch)
+        lookup = (time.perf_counter() - start) / len(lookups)
+
+        slow, fast = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            expected = await per_row(conn, fx_rates)
+            slow.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            total, _, _ = await get_monthly_base_total(conn, 1, "2025-01")
+            fast.append(time.perf_counter() - start)
+        assert abs(total - expected) < 0.005, (total, expected)
+        print(
+            f"{rows:>9,} rows: load {insert:6.2f}s, backfill {backfill:6.2f}s, "
+            f"index lookup {lookup * 1e6:5.2f} us | month total: "
+            f"per-row {statistics.median(slow) * 1000:8.1f} ms, "
+            f"rollup {statistics.median(fast) * 1000:6.3f} ms"
+        )
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="10000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    for rows in args.rows.split(","):
+        asyncio.run(run(int(rows), args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Commits/s and add_expense latency with and without group commit.
+
+    python -m benchmarks.bench_group_commit --writers 50 --per-writer 40
+
+Each writer awaits its own add_expense calls back to back, like concurrent
+Telegram updates sharing the bot's single connection. Use --dir to place the
+database on the disk you deploy to; on tmpfs fsync is free and coalescing
+only adds latency.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+
+import aiosqlite
+
+from src.db import add_expense, init_db, register_user
+from src.group_commit import disable_group_commit, enable_group_commit
+
+
+async def run(writers: int, per_writer: int, window_ms: float, directory: str) -> None:
+    with tempfile.TemporaryDirectory(dir=directory or None) as tmp:
+        conn = await aiosqlite.connect(os.path.join(tmp, "bench.db"))
+        await init_db(conn)
+        await register_user(conn, 1)
+        group = enable_group_commit(conn, window_ms) if window_ms > 0 else None
+        latencies: List[float] = []
+
+        async def writer(w: int) -> None:
+            for i in range(per_writer):
+                start = time.perf_counter()
+                await add_expense(
+                    conn,
+                    message_id=w * per_writer + i,
+                    chat_id=1,
+                    user_id=1,
+                    date=1735689600,
+                    value=1.0,
+                    category="TEST",
+                    currency="ARS",
+                    message="test 1",
+                )
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(writer(w) for w in range(writers)))
+        elapsed = time.perf_counter() - start
+        disable_group_commit(conn)
+        await conn.close()
+
+    total = writers * per_writer
+    commits = group.commits if group else total
+    p99 = statistics.quantiles(latencies, n=100)[98] * 1000
+    label = f"group {window_ms:g}ms" if window_ms > 0 else "per-write"
+    print(
+        f"{label:>12}: {total / elapsed:8,.0f} writes/s  "
+        f"{commits / elapsed:8,.0f} commits/s  p99 {p99:6.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=50)
+    parser.add_argument("--per-writer", type=int, default=40)
+    parser.add_argument("--windows", default="0,1,2,5,10")
+    parser.add_argument("--dir", default="", help="directory for the database")
+    args = parser.parse_args()
+    for window in args.windows.split(","):
+        asyncio.run(run(args.writers, args.per_writer, float(window), args.dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""/import throughput: a /report-layout CSV parsed and bulk inserted.
+
+    python -m benchmarks.bench_import --rows 100000 --chunks 1000,5000,20000
+
+Also times the one-message-per-expense path (add_expense, a commit each)
+on a sample, for comparison. Run twice per chunk size; the second run of
+the same import must insert nothing.
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import tempfile
+import time
+
+import aiosqlite
+
+from src.csv_import import parse_import_csv
+from src.db import (
+    add_expense,
+    import_expenses,
+    init_db,
+    missing_import_categories,
+    register_user,
+)
+from src.rows_to_csv_bytes import HEADER_LABELS
+
+CATEGORIES = ["SUPERMERCADO", "SALIR A COMER", "TAXI", "GAS", "INTERNET"]
+CURRENCIES = ["ARS", "ARS", "ARS", "USD"]
+
+
+def sample_csv(rows: int) -> bytes:
+    out = io.StringIO()
+    out.write(",".join(HEADER_LABELS) + "\n")
+    for i in range(rows):
+        day = 1577836800 + i * 1800  # from 2020-01-01, every 30 min
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(day))
+        out.write(
+            f"{stamp},{(i % 997) + 0.5},{CATEGORIES[i % 5]},{CURRENCIES[i % 4]},"
+            f'"compra {i} en el super, cuotas",\n'
+        )
+    return out.getvalue().encode("utf-8")
+
+
+async def run(data: bytes, chunk_rows: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = await aiosqlite.connect(os.path.join(tmp, "bench.db"))
+        await init_db(conn)
+        await register_user(conn, 1)
+
+        start = time.perf_counter()
+        rows = parse_import_csv(data)
+        parsed = time.perf_counter() - start
+        assert not await missing_import_categories(conn, 1, {r[2] for r in rows})
+        validated = time.perf_counter() - start - parsed
+        timings = []
+        for _ in range(2):
+            start = time.perf_counter()
+            inserted = await import_expenses(conn, 1, 1, 1, rows, chunk_rows=chunk_rows)
+            timings.append((inserted, time.perf_counter() - start))
+        (first, insert), (again, rerun) = timings
+        assert first == len(rows) and again == 0, timings
+        print(
+            f"chunk {chunk_rows:>6}: parse {parsed:5.2f}s, validate "
+            f"{validated * 1000:5.1f} ms, insert {insert:5.2f}s "
+            f"({len(rows) / insert:,.0f} rows/s), re-run {rerun:5.2f}s"
+        )
+
+        sample = rows[:1000]
+        start = time.perf_counter()
+        for i, (date, cents, category, currency, message) in enumerate(sample):
+            await add_expense(
+                conn, 10**6 + i, 1, 1, date, cents / 100, category, currency, message
+            )
+        one_by_one = (time.perf_counter() - start) / len(sample)
+        print(
+            f"{'':13}one message per expense: {one_by_one * 1000:.2f} ms/row, "
+            f"{one_by_one * len(rows):.0f}s for {len(rows):,}"
+        )
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--chunks", default="1000,5000,20000")
+    args = parser.parse_args()
+    data = sample_csv(args.rows)
+    print(f"{args.rows:,} rows, {len(data) / 2**20:.1f} MiB")
+    for chunk_rows in args.chunks.split(","):
+        asyncio.run(run(data, int(chunk_rows)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Requests sent and wall time for a burst of extractions, with and without
+micro-batching, against the local Responses API stub.
+
+    python -m benchmarks.bench_llm_batching --burst 50 --latency 0.3
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--burst", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--window-ms", type=int, default=20)
+    parser.add_argument("--max-size", type=int, default=10)
+    args = parser.parse_args()
+
+    with FakeOpenAIServer(latency=args.latency) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "fake")
+        from src.base_categories import BASE_CATEGORIES
+        from src.llm_batcher import LLMBatcher
+        from src.llm_call import async_llm_call
+
+        categories = list(BASE_CATEGORIES)
+        messages = [f"ubi x laburo {i}" for i in range(args.burst)]
+
+        async def run() -> None:
+            batcher = LLMBatcher(args.window_ms / 1000, args.max_size)
+            for name, call in (
+                ("unbatched", async_llm_call),
+                ("batched", batcher.submit),
+            ):
+                before = server.requests
+                start = time.perf_counter()
+                results = await asyncio.gather(*(call(m, categories) for m in messages))
+                elapsed = time.perf_counter() - start
+                assert len(results) == len(messages)
+                print(
+                    f"{name:>9}: {len(messages)} msgs, {server.requests - before} "
+                    f"requests, {elapsed:.2f}s"
+                )
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
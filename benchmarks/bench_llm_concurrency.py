@@ -0,0 +1,58 @@
+"""Throughput of the blocking vs. async extraction path with N concurrent users.
+
+    python -m benchmarks.bench_llm_concurrency --users 20 --messages 5 --latency 0.3
+
+The blocking path calls ``llm_call`` straight from a coroutine, as the
+handlers used to, so every user waits behind the one in flight.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+
+async def run_users(call, users: int, messages: int) -> float:
+    async def user() -> None:
+        for i in range(messages):
+            await call(f"cafe en la facu {i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(users)))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    with FakeOpenAIServer(latency=args.latency) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "fake")
+        from src.base_categories import BASE_CATEGORIES
+        from src.llm_call import async_llm_call, llm_call
+
+        categories = list(BASE_CATEGORIES)
+
+        async def blocking(message: str):
+            return llm_call(message, categories)
+
+        async def non_blocking(message: str):
+            return await async_llm_call(message, categories)
+
+        total = args.users * args.messages
+        for name, call in (("blocking", blocking), ("async", non_blocking)):
+            elapsed = asyncio.run(run_users(call, args.users, args.messages))
+            print(
+                f"{name:>9}: {total} msgs from {args.users} users in {elapsed:.2f}s "
+                f"-> {total / elapsed:.1f} msg/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Peak Python memory and time of /report: in-memory vs. streaming CSV.
+
+    python -m benchmarks.bench_report --sizes 10000,100000,1000000
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Awaitable, Callable
+
+import aiosqlite
+
+from src.db import (
+    get_user_expenses_report,
+    init_db,
+    iter_user_expenses_report,
+    register_user,
+)
+from src.rows_to_csv_bytes import rows_to_csv_bytes, rows_to_csv_file
+
+
+async def populate(conn: aiosqlite.Connection, rows: int) -> None:
+    await register_user(conn, 1)
+    await conn.executemany(
+        """
+        INSERT INTO expenses (message_id, chat_id, user_id, date, amount_cents, category_name, currency, message)
+        VALUES (?, 1, 1, ?, ?, 'SUPERMERCADO', 'ARS', ?)
+        """,
+        (
+            (i, 1735732800 + i, i * 125, f"super coto compra numero {i}")
+            for i in range(rows)
+        ),
+    )
+    await conn.commit()
+
+
+async def in_memory(conn: aiosqlite.Connection) -> int:
+    bio = rows_to_csv_bytes(await get_user_expenses_report(conn, user_id=1))
+    return len(bio.getvalue())
+
+
+async def streaming(conn: aiosqlite.Connection) -> int:
+    with await rows_to_csv_file(iter_user_expenses_report(conn, user_id=1)) as f:
+        f.seek(0, os.SEEK_END)
+        return f.tell()
+
+
+async def measure(
+    conn: aiosqlite.Connection, build: Callable[[aiosqlite.Connection], Awaitable[int]]
+) -> str:
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = await build(conn)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return f"{elapsed:6.2f}s peak {peak / 2**20:7.1f} MiB ({size / 2**20:.1f} MiB csv)"
+
+
+async def run(rows: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = await aiosqlite.connect(os.path.join(tmp, "bench.db"))
+        await init_db(conn)
+        await populate(conn, rows)
+        print(f"{rows:>9,} rows  in-memory: {await measure(conn, in_memory)}")
+        print(f"{rows:>9,} rows  streaming: {await measure(conn, streaming)}")
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    args = parser.parse_args()
+    for rows in args.sizes.split(","):
+        asyncio.run(run(int(rows)))
+
+
+if __name__ == "__main__":
+    main()
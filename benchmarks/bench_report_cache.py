@@ -0,0 +1,66 @@
+"""Server-side cost of a repeat /report: regenerate vs. the versioned cache.
+
+    python -m benchmarks.bench_report_cache --sizes 1000,10000,100000
+
+Times what csv_command does before the upload: the data_version lookup,
+then either the streamed query + CSV encoding (miss) or a cache hit.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import aiosqlite
+
+from benchmarks.bench_report import populate
+from src.db import get_data_version, init_db, iter_user_expenses_report
+from src.report_cache import ReportCache
+from src.rows_to_csv_bytes import report_filename, rows_to_csv_file
+
+
+async def run(rows: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = await aiosqlite.connect(os.path.join(tmp, "bench.db"))
+        await init_db(conn)
+        await populate(conn, rows)
+        cache = ReportCache(max_bytes=2**30, max_item_bytes=2**30)
+
+        async def serve() -> int:
+            key = (1, "", await get_data_version(conn, 1))
+            cached = cache.get(key)
+            if cached is not None:
+                return len(cached.data)
+            with await rows_to_csv_file(iter_user_expenses_report(conn, 1)) as f:
+                data = f.read()
+            cache.put(key, data, report_filename())
+            return len(data)
+
+        start = time.perf_counter()
+        size = await serve()
+        miss = time.perf_counter() - start
+        hits = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await serve()
+            hits.append(time.perf_counter() - start)
+        print(
+            f"{rows:>9,} rows ({size / 2**20:5.1f} MiB): miss {miss * 1000:8.1f} ms, "
+            f"hit {statistics.median(hits) * 1000:6.3f} ms"
+        )
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    for rows in args.sizes.split(","):
+        asyncio.run(run(int(rows), args.repeat))
+
+
+if __name__ == "__main__":
+    main()
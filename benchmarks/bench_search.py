@@ -0,0 +1,111 @@
+"""Latency of /search (FTS5 index) vs. a LIKE scan of the user's rows with
+the same ranking, on a large table.
+
+    python -m benchmarks.bench_search --rows 1000000 --users 1000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Awaitable, Callable, List
+
+import aiosqlite
+
+from src.db import init_db, register_user, search_expenses
+from src.search_query import parse_search_args
+
+WORDS = [
+    "super", "coto", "cafe", "uber", "netflix", "regalo", "farmacia", "almuerzo",
+    "nafta", "alquiler", "gimnasio", "libreria", "kiosco", "panaderia", "verduleria",
+    "peluqueria", "cine", "teatro", "taxi", "subte", "colectivo", "luz", "gas",
+]  # fmt: skip
+QUERIES = ["netflix", "cafe", '"super coto"', "farmacia regalo", "cine pagina=2"]
+
+
+async def populate(conn: aiosqlite.Connection, rows: int, users: int) -> None:
+    rng = random.Random(1)
+    for user_id in range(1, users + 1):
+        await register_user(conn, user_id)
+    await conn.executemany(
+        """
+        INSERT INTO expenses (message_id, chat_id, user_id, date, amount_cents, category_name, currency, message)
+        VALUES (?, ?, ?, ?, ?, 'SUPERMERCADO', 'ARS', ?)
+        """,
+        (
+            (
+                i,
+                i % users + 1,
+                i % users + 1,
+                1735732800 + i,
+                rng.randint(100, 500000),
+                " ".join(rng.sample(WORDS, 3)) + f" {rng.randint(1, 5000)}",
+            )
+            for i in range(rows)
+        ),
+    )
+    await conn.commit()
+
+
+async def timings(fn: Callable[[], Awaitable[int]], repeat: int) -> str:
+    samples: List[float] = []
+    found = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = await fn()
+        samples.append(time.perf_counter() - start)
+    q = statistics.quantiles(samples, n=20, method="inclusive")
+    return f"p50 {q[9] * 1000:7.2f} ms  p95 {q[18] * 1000:7.2f} ms  ({found} rows)"
+
+
+async def run(rows: int, users: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = await aiosqlite.connect(os.path.join(tmp, "bench.db"))
+        await init_db(conn)
+        start = time.perf_counter()
+        await populate(conn, rows, users)
+        print(
+            f"{rows:,} rows / {users:,} users loaded in "
+            f"{time.perf_counter() - start:.1f}s (FTS kept by triggers)"
+        )
+        user_id = users // 2
+        for text in QUERIES:
+            query, page = parse_search_args(text)
+
+            async def fts() -> int:
+                hits = await search_expenses(conn, user_id, query, 11, (page - 1) * 10)
+                return len(hits)
+
+            async def like() -> int:
+                words = [w.strip('"') for w in text.split() if "=" not in w]
+                cur = await conn.execute(
+                    f"""
+                    SELECT id FROM expenses WHERE user_id = ?
+                    {"".join(" AND message LIKE ?" for _ in words)}
+                    ORDER BY length(message), date DESC, id DESC LIMIT 11 OFFSET ?
+                    """,
+                    (user_id, *[f"%{w}%" for w in words], (page - 1) * 10),
+                )
+                found = len(list(await cur.fetchall()))
+                await cur.close()
+                return found
+
+            print(f"{text:<18} fts  {await timings(fts, repeat)}")
+            print(f"{'':<18} like {await timings(like, repeat)}")
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.users, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Per-message CPU spent preparing the structured-output request.
+
+    python -m benchmarks.bench_spec_cache --messages 2000
+"""
+
+import argparse
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+from src.base_categories import BASE_CATEGORIES  # noqa: E402
+from src.llm_call import (  # noqa: E402
+    create_context,
+    get_extraction_spec,
+    make_expense_model,
+    text_format,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+    categories = list(BASE_CATEGORIES)
+
+    start = time.perf_counter()
+    for _ in range(args.messages):
+        model = make_expense_model(categories)
+        text_format(model)
+        create_context(categories)
+    uncached = time.perf_counter() - start
+
+    get_extraction_spec.cache_clear()
+    start = time.perf_counter()
+    for _ in range(args.messages):
+        get_extraction_spec(tuple(categories))
+    cached = time.perf_counter() - start
+
+    per_msg = 1e6 / args.messages
+    print(f"uncached: {uncached * per_msg:.1f} us/msg")
+    print(f"  cached: {cached * per_msg:.1f} us/msg")
+    print(get_extraction_spec.cache_info())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Local stand-in for the OpenAI Responses API used by the benchmarks.
+
+Answers ``POST /v1/responses`` after a configurable delay with an
+``output_text`` that satisfies the requested JSON schema, so the real
+``openai`` client (sync or async) can be pointed at it via
+``OPENAI_BASE_URL``. Arrays get one item per numbered line of the user
+message, matching the batched extraction prompt.
+"""
+
+import asyncio
+import json
+import re
+import threading
+import time
+from typing import Any, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+
+def sample_from_schema(
+    schema: Dict[str, Any], defs: Dict[str, Any], n_items: int = 1
+) -> Any:
+    if "$ref" in schema:
+        return sample_from_schema(defs[schema["$ref"].split("/")[-1]], defs, n_items)
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "anyOf" in schema:
+        return sample_from_schema(schema["anyOf"][0], defs, n_items)
+    kind = schema.get("type")
+    if kind == "object":
+        return {
+            name: sample_from_schema(sub, defs, n_items)
+            for name, sub in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        item = schema.get("items", {})
+        return [sample_from_schema(item, defs) for _ in range(n_items)]
+    if kind in ("number", "integer"):
+        return 100
+    if kind == "boolean":
+        return True
+    return "ARS"
+
+
+def make_app(latency: float) -> FastAPI:
+    app = FastAPI()
+    app.state.requests = 0
+
+    @app.post("/v1/responses")
+    async def responses(req: Request):
+        body = await req.json()
+        app.state.requests += 1
+        await asyncio.sleep(latency)
+        schema = body["text"]["format"]["schema"]
+        user_text = body["input"][-1]["content"]
+        n_items = len(re.findall(r"^\d+\. ", user_text, flags=re.M)) or 1
+        payload = sample_from_schema(schema, schema.get("$defs", {}), n_items)
+        return {
+            "id": f"resp_{app.state.requests}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": body.get("model", "fake"),
+            "status": "completed",
+            "parallel_tool_calls": False,
+            "tool_choice": "auto",
+            "tools": [],
+            "output": [
+                {
+                    "type": "message",
+                    "id": f"msg_{app.state.requests}",
+                    "role": "assistant",
+                    "status": "completed",
+                    "content": [
+                        {
+                            "type": "output_text",
+                            "text": json.dumps(payload),
+                            "annotations": [],
+                        }
+                    ],
+                }
+            ],
+            "usage": {
+                "input_tokens": 200,
+                "output_tokens": 20,
+                "total_tokens": 220,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens_details": {"reasoning_tokens": 0},
+            },
+        }
+
+    return app
+
+
+class FakeOpenAIServer:
+    """Runs the stub in a background thread; use as a context manager."""
+
+    def __init__(self, latency: float = 0.2, port: int = 8765):
+        self.app = make_app(latency)
+        self.port = port
+        self._server = uvicorn.Server(
+            uvicorn.Config(self.app, port=port, log_level="warning")
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    @property
+    def requests(self) -> int:
+        return self.app.state.requests
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join()
@@ -0,0 +1,92 @@
+"""Local stand-in for the Telegram Bot API used by the benchmarks.
+
+Answers ``POST /bot<token>/<method>`` after a configurable delay with the
+minimal result python-telegram-bot expects (getMe, getWebhookInfo,
+sendMessage, sendDocument, ...). Point the bot at it with
+``TELEGRAM_API_BASE_URL``. Bodies are parsed by hand so the stub does not
+need python-multipart.
+"""
+
+import asyncio
+import json
+import re
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from typing import Any, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+
+def _parse_body(content_type: str, raw: bytes) -> Dict[str, Any]:
+    text = raw.decode("utf-8", "replace")
+    if "json" in content_type:
+        return json.loads(text or "{}")
+    if "multipart" in content_type:
+        return dict(re.findall(r'name="(\w+)"\r\n\r\n(.*?)\r\n--', text, flags=re.S))
+    return dict(urllib.parse.parse_qsl(text))
+
+
+def make_app(latency: float) -> FastAPI:
+    app = FastAPI()
+    app.state.calls = Counter()
+    app.state.bytes = Counter()
+
+    @app.post("/bot{token}/{method}")
+    async def bot_api(token: str, method: str, req: Request):
+        raw = await req.body()
+        app.state.calls[method] += 1
+        app.state.bytes[method] += len(raw)
+        if latency:
+            await asyncio.sleep(latency)
+        data = _parse_body(req.headers.get("content-type", ""), raw)
+        result: Any = True
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "bot", "username": "bot"}
+        elif method == "getWebhookInfo":
+            result = {
+                "url": "",
+                "has_custom_certificate": False,
+                "pending_update_count": 0,
+            }
+        elif method.startswith("send"):
+            result = {
+                "message_id": sum(app.state.calls.values()),
+                "date": int(time.time()),
+                "chat": {"id": int(data.get("chat_id", 0)), "type": "private"},
+            }
+        return {"ok": True, "result": result}
+
+    return app
+
+
+class FakeTelegramServer:
+    """Runs the stub in a background thread; use as a context manager."""
+
+    def __init__(self, latency: float = 0.0, port: int = 8766):
+        self.app = make_app(latency)
+        self.port = port
+        self._server = uvicorn.Server(
+            uvicorn.Config(self.app, port=port, log_level="warning")
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def calls(self) -> Dict[str, int]:
+        return dict(self.app.state.calls)
+
+    def __enter__(self) -> "FakeTelegramServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join()
@@ -0,0 +1,398 @@
+"""End-to-end load test: replays a synthetic mix of Telegram updates into the
+webhook, with the OpenAI Responses API and the Bot API stubbed locally.
+
+    python -m benchmarks.loadtest --updates 1000 --users 50 --rate 50 --out after.json
+    python -m benchmarks.loadtest --compare before.json after.json
+
+The mix covers plain and multi-line expenses, edits, /delete, /report,
+/summary and the category commands, generated from --seed so two commits
+replay the same traffic. Latency is measured from the webhook POST until
+the update queue finished handling the update; the webhook's own response
+time is reported as `ack`. Results (throughput, p50/p95/p99 per update
+type, DB growth, stub call counts) are written as JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.fake_telegram import FakeTelegramServer
+
+ROOT = Path(__file__).resolve().parent.parent
+WEBHOOK_PATH = "/telegram/webhook"
+FIRST_USER_ID = 1000
+
+MIX = {
+    "message": 55,
+    "multiline": 8,
+    "edit": 10,
+    "delete": 5,
+    "report": 5,
+    "summary": 4,
+    "categories": 4,
+    "addcategory": 5,
+    "removecategory": 4,
+}
+# Mostly fast-path friendly amounts, plus free text that needs the LLM
+EXPENSE_TEXTS = [
+    "cafe {n}",
+    "{n} USD regalo cumple",
+    "uber al centro {n}",
+    "super {n},50",
+    "netflix {n}",
+    "ubi x laburo",
+    "almuerzo con amigos, pagué yo",
+    "farmacia {n} pesos",
+]
+EXTRA_CATEGORIES = ["NETFLIX", "MASCOTAS", "VIAJES", "LIBROS"]
+
+
+# -----------------------------------------------------------------------------
+# Synthetic traffic
+# -----------------------------------------------------------------------------
+def _message(user_id: int, message_id: int, text: str) -> Dict[str, Any]:
+    message: Dict[str, Any] = {
+        "message_id": message_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "load"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        command = text.split()[0]
+        message["entities"] = [
+            {"type": "bot_command", "offset": 0, "length": len(command)}
+        ]
+    return message
+
+
+def generate_updates(
+    n_updates: int, n_users: int, seed: int
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """(update type, update JSON) pairs; every user starts with /start."""
+    rng = random.Random(seed)
+    kinds, weights = zip(*MIX.items())
+    users = [FIRST_USER_ID + i for i in range(n_users)]
+    next_message_id = {u: 1 for u in users}
+    expenses: Dict[int, List[int]] = {u: [] for u in users}
+    updates: List[Tuple[str, Dict[str, Any]]] = []
+
+    def expense_text() -> str:
+        return rng.choice(EXPENSE_TEXTS).format(n=rng.randint(1, 5000))
+
+    def add(kind: str, user_id: int, text: str, **extra: Any) -> None:
+        mid = extra.pop("message_id", None) or next_message_id[user_id]
+        next_message_id[user_id] += 1
+        message = _message(user_id, mid, text)
+        message.update(extra.pop("message_extra", {}))
+        field = "edited_message" if kind == "edit" else "message"
+        updates.append((kind, {"update_id": len(updates) + 1, field: message}))
+
+    for user_id in users:
+        add("start", user_id, "/start")
+    while len(updates) < n_updates:
+        user_id = rng.choice(users)
+        kind = rng.choices(kinds, weights)[0]
+        if kind in ("edit", "delete") and not expenses[user_id]:
+            kind = "message"
+        if kind == "message":
+            expenses[user_id].append(next_message_id[user_id])
+            add(kind, user_id, expense_text())
+        elif kind == "multiline":
+            expenses[user_id].append(next_message_id[user_id])
+            lines = [expense_text() for _ in range(rng.randint(2, 4))]
+            add(kind, user_id, "\n".join(lines))
+        elif kind == "edit":
+            target = rng.choice(expenses[user_id])
+            add(
+                kind,
+                user_id,
+                expense_text(),
+                message_id=target,
+                message_extra={"edit_date": int(time.time())},
+            )
+        elif kind == "delete":
+            target = expenses[user_id].pop(rng.randrange(len(expenses[user_id])))
+            reply = _message(user_id, target, "x")
+            add(kind, user_id, "/delete", message_extra={"reply_to_message": reply})
+        elif kind == "report":
+            add(kind, user_id, "/report")
+        elif kind == "summary":
+            add(kind, user_id, "/summary")
+        elif kind == "categories":
+            add(kind, user_id, "/categories")
+        else:
+            add(kind, user_id, f"/{kind} {rng.choice(EXTRA_CATEGORIES)}")
+    return updates
+
+
+# -----------------------------------------------------------------------------
+# Measurement
+# -----------------------------------------------------------------------------
+def summarize(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    if len(ordered) > 1:
+        q = statistics.quantiles(ordered, n=100, method="inclusive")
+        p50, p95, p99 = q[49], q[94], q[98]
+    else:
+        p50 = p95 = p99 = ordered[0]
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": p50 * 1000,
+        "p95_ms": p95 * 1000,
+        "p99_ms": p99 * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def db_bytes(path: str) -> int:
+    return sum(
+        os.path.getsize(p)
+        for p in (path, f"{path}-wal", f"{path}-shm")
+        if os.path.exists(p)
+    )
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def replay(
+    main_module: Any,
+    updates: List[Tuple[str, Dict[str, Any]]],
+    rate: float,
+    concurrency: int,
+    db_path: str,
+) -> Dict[str, Any]:
+    M = main_module
+    posted: Dict[int, Tuple[str, float]] = {}
+    done: Dict[int, float] = {}
+    ack: Dict[str, List[float]] = {}
+    rejected = 0
+
+    async with M.lifespan(M.app):
+        queue = M.tg_app.bot_data[M.UPDATE_QUEUE]
+        inner = queue.handler
+
+        async def handler(update: Any) -> None:
+            try:
+                await inner(update)
+            finally:
+                done[update.update_id] = time.perf_counter()
+
+        queue.handler = handler
+        # Both sizes are of the checkpointed file, without migrations' WAL
+        pool = M.tg_app.bot_data[M.DB_POOL]
+        await pool.writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size_before = db_bytes(db_path)
+        transport = httpx.ASGITransport(app=M.app)
+        slots = asyncio.Semaphore(concurrency)
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://bot") as c:
+
+            async def post(kind: str, update: Dict[str, Any]) -> None:
+                nonlocal rejected
+                async with slots:
+                    start = time.perf_counter()
+                    r = await c.post(WEBHOOK_PATH, json=update)
+                    ack.setdefault(kind, []).append(time.perf_counter() - start)
+                if r.status_code == 200:
+                    posted[update["update_id"]] = (kind, start)
+                else:
+                    rejected += 1
+
+            started = time.perf_counter()
+            tasks = []
+            for i, (kind, update) in enumerate(updates):
+                if rate > 0:
+                    delay = started + i / rate - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(post(kind, update)))
+            await asyncio.gather(*tasks)
+            while len(done) < len(posted):
+                await asyncio.sleep(0.01)
+            elapsed = time.perf_counter() - started
+            health = (await c.get("/health")).json()
+
+        async with pool.reader() as conn:
+            cur = await conn.execute("SELECT COUNT(*) FROM expenses")
+            (n_expenses,) = await cur.fetchone()
+            await cur.close()
+        # The WAL is reported apart
+        size_with_wal = db_bytes(db_path)
+        await pool.writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size_after = db_bytes(db_path)
+
+    latency: Dict[str, List[float]] = {}
+    for update_id, (kind, start) in posted.items():
+        latency.setdefault(kind, []).append(done[update_id] - start)
+    all_latency = [s for samples in latency.values() for s in samples]
+    return {
+        "elapsed_s": elapsed,
+        "throughput_updates_per_s": len(posted) / elapsed,
+        "rejected": rejected,
+        "latency": {
+            "all": summarize(all_latency),
+            **{k: summarize(v) for k, v in sorted(latency.items())},
+        },
+        "ack": summarize([s for samples in ack.values() for s in samples]),
+        "db": {
+            "bytes_before": size_before,
+            "bytes_after": size_after,
+            "bytes_growth": size_after - size_before,
+            "bytes_with_wal": size_with_wal,
+            "expenses": n_expenses,
+            "bytes_per_expense": (
+                (size_after - size_before) / n_expenses if n_expenses else 0.0
+            ),
+        },
+        "health": health,
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    db_path = args.db or os.path.join(workdir, "bot.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    updates = generate_updates(args.updates, args.users, args.seed)
+
+    with FakeOpenAIServer(latency=args.openai_latency) as openai_stub:
+        with FakeTelegramServer(latency=args.telegram_latency) as telegram_stub:
+            users = ",".join(str(FIRST_USER_ID + i) for i in range(args.users))
+            os.environ.update(
+                TELEGRAM_BOT_TOKEN="123:loadtest",
+                TELEGRAM_API_BASE_URL=telegram_stub.base_url,
+                PUBLIC_URL="https://loadtest.invalid",
+                WEBHOOK_URL=WEBHOOK_PATH,
+                WHITELIST_IDS=users,
+                DB_PATH=db_path,
+                OPENAI_API_KEY="fake",
+                OPENAI_BASE_URL=openai_stub.base_url,
+            )
+            # main imports its siblings from src/ like the Docker image does
+            sys.path.insert(0, str(ROOT / "src"))
+            import main
+
+            logging.getLogger().setLevel(logging.WARNING)
+            logging.getLogger("httpx").setLevel(logging.WARNING)
+            result = asyncio.run(
+                replay(main, updates, args.rate, args.concurrency, db_path)
+            )
+            openai_requests = openai_stub.requests
+            telegram_calls = telegram_stub.calls
+
+    return {
+        "revision": git_revision(),
+        "timestamp": int(time.time()),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        **result,
+        "openai_requests": openai_requests,
+        "telegram_calls": telegram_calls,
+    }
+
+
+# -----------------------------------------------------------------------------
+# Output
+# -----------------------------------------------------------------------------
+def print_result(result: Dict[str, Any]) -> None:
+    print(
+        f"rev {result['revision']}: {result['latency']['all']['count']} updates in "
+        f"{result['elapsed_s']:.2f}s = {result['throughput_updates_per_s']:.1f}/s, "
+        f"{result['rejected']} rejected, {result['openai_requests']} OpenAI requests"
+    )
+    print(f"{'type':<15}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for kind, s in result["latency"].items():
+        print(
+            f"{kind:<15}{s['count']:>7}{s['p50_ms']:>10.1f}"
+            f"{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}"
+        )
+    ack = result["ack"]
+    print(
+        f"{'ack':<15}{ack['count']:>7}{ack['p50_ms']:>10.1f}{ack['p95_ms']:>10.1f}{ack['p99_ms']:>10.1f}"
+    )
+    db = result["db"]
+    print(
+        f"db: {db['bytes_before']:,} -> {db['bytes_after']:,} bytes, "
+        f"{db['expenses']} expenses, {db['bytes_per_expense']:.0f} bytes/expense"
+    )
+
+
+def compare(before_path: str, after_path: str) -> None:
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before['revision']} -> {after['revision']}")
+    if before["config"] != after["config"]:
+        print("warning: runs used different configs")
+    b, a = before["throughput_updates_per_s"], after["throughput_updates_per_s"]
+    print(f"throughput: {b:.1f} -> {a:.1f} updates/s ({(a - b) / b:+.1%})")
+    print(f"{'type':<15}{'p50 ms':>18}{'p95 ms':>18}{'p99 ms':>18}")
+    for kind, s in after["latency"].items():
+        old = before["latency"].get(kind)
+        if not old or not old.get("count") or not s.get("count"):
+            continue
+        cells = "".join(
+            f"{old[p]:>8.1f} ->{s[p]:>7.1f}" for p in ("p50_ms", "p95_ms", "p99_ms")
+        )
+        print(f"{kind:<15}{cells}")
+    gb, ga = before["db"]["bytes_per_expense"], after["db"]["bytes_per_expense"]
+    print(f"db bytes/expense: {gb:.0f} -> {ga:.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument(
+        "--rate", type=float, default=0, help="updates/s to offer (0 = all at once)"
+    )
+    parser.add_argument("--concurrency", type=int, default=64, help="in-flight POSTs")
+    parser.add_argument("--openai-latency", type=float, default=0.3)
+    parser.add_argument("--telegram-latency", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", default="", help="database file (default: temp)")
+    parser.add_argument("--out", default="loadtest.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    result = run(args)
+    print_result(result)
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Throughput vs. number of worker processes sharing one DB_PATH.
+
+    python -m benchmarks.loadtest_workers --workers 1 2 4 --updates 1000
+
+For each worker count, starts the app as a real multi-process server
+(gunicorn with UvicornWorker when installed, else `uvicorn --workers`) on a
+fresh database, POSTs the same synthetic update mix as benchmarks.loadtest
+over HTTP, and waits until the Bot API stub has received one reply per
+update. Also checks that the once-per-deployment calls (setMyCommands,
+setWebhook, deleteWebhook) happened exactly once whatever the worker count.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Set, Tuple
+
+import httpx
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.fake_telegram import FakeTelegramServer
+from benchmarks.loadtest import (
+    FIRST_USER_ID,
+    ROOT,
+    WEBHOOK_PATH,
+    generate_updates,
+    git_revision,
+    summarize,
+)
+
+REPLY_METHODS = ("sendMessage", "sendDocument")
+ONCE_METHODS = ("setMyCommands", "setWebhook", "deleteWebhook")
+
+
+def server_command(server: str, workers: int, port: int) -> List[str]:
+    if server == "gunicorn":
+        return [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "-k",
+            "uvicorn.workers.UvicornWorker",
+            "main:app",
+            "--bind",
+            f"127.0.0.1:{port}",
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ]
+    return [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "main:app",
+        "--port",
+        str(port),
+        "--workers",
+        str(workers),
+        "--log-level",
+        "warning",
+    ]
+
+
+def replies(telegram_stub: FakeTelegramServer) -> int:
+    calls = telegram_stub.calls
+    return sum(calls.get(m, 0) for m in REPLY_METHODS)
+
+
+async def wait_ready(client: httpx.AsyncClient, workers: int, timeout: float) -> int:
+    """
+    Poll /health until `workers` distinct processes answered (the kernel
+    may keep routing to the same one, so give up on that after `timeout`
+    once at least one is up). Returns the number seen.
+    """
+    pids: Set[int] = set()
+    deadline = time.monotonic() + timeout
+    while len(pids) < workers and (not pids or time.monotonic() < deadline):
+        try:
+            r = await client.get("/health")
+            pids.add(r.json()["worker"]["pid"])
+        except (httpx.HTTPError, KeyError, ValueError):
+            if time.monotonic() > deadline + 60:
+                raise RuntimeError("server did not come up")
+            await asyncio.sleep(0.2)
+    return len(pids)
+
+
+async def replay(
+    base_url: str,
+    workers: int,
+    updates: List[Tuple[str, Dict[str, Any]]],
+    concurrency: int,
+    telegram_stub: FakeTelegramServer,
+    idle_timeout: float,
+) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=30
+    ) as client:
+        seen = await wait_ready(client, workers, timeout=10)
+        replies_before = replies(telegram_stub)
+        semaphore = asyncio.Semaphore(concurrency)
+        acks: List[float] = []
+        rejected = 0
+
+        async def post(update: Dict[str, Any]) -> None:
+            nonlocal rejected
+            async with semaphore:
+                start = time.perf_counter()
+                r = await client.post(WEBHOOK_PATH, json=update)
+                acks.append(time.perf_counter() - start)
+                rejected += r.status_code != 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(post(u) for _, u in updates))
+        posted = time.perf_counter() - start
+
+        # Done when every update got its reply, or replies stopped coming.
+        done, last_change = 0, time.monotonic()
+        while done < len(updates) and time.monotonic() - last_change < idle_timeout:
+            await asyncio.sleep(0.05)
+            current = replies(telegram_stub) - replies_before
+            if current != done:
+                done, last_change = current, time.monotonic()
+        elapsed = time.perf_counter() - start
+        if done < len(updates):
+            elapsed -= idle_timeout
+
+    return {
+        "workers": workers,
+        "workers_seen": seen,
+        "updates": len(updates),
+        "replied": done,
+        "rejected": rejected,
+        "post_s": posted,
+        "elapsed_s": elapsed,
+        "throughput_updates_per_s": done / elapsed if elapsed else 0.0,
+        "ack": summarize(acks),
+    }
+
+
+def run_one(
+    args: argparse.Namespace,
+    workers: int,
+    updates: List[Tuple[str, Dict[str, Any]]],
+    telegram_stub: FakeTelegramServer,
+    env: Dict[str, str],
+) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="loadtest-workers-")
+    env = dict(env, DB_PATH=os.path.join(workdir, "bot.db"))
+    calls_before = telegram_stub.calls
+    proc = subprocess.Popen(
+        server_command(args.server, workers, args.port), cwd=ROOT, env=env
+    )
+    try:
+        result = asyncio.run(
+            replay(
+                f"http://127.0.0.1:{args.port}",
+                workers,
+                updates,
+                args.concurrency,
+                telegram_stub,
+                args.idle_timeout,
+            )
+        )
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=60)
+        shutil.rmtree(workdir, ignore_errors=True)
+    calls = telegram_stub.calls
+    result["once_calls"] = {
+        m: calls.get(m, 0) - calls_before.get(m, 0) for m in ONCE_METHODS
+    }
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=64, help="in-flight POSTs")
+    parser.add_argument("--openai-latency", type=float, default=0.3)
+    parser.add_argument("--telegram-latency", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=10,
+        help="stop waiting once no reply arrived for this many seconds",
+    )
+    parser.add_argument(
+        "--server",
+        choices=("gunicorn", "uvicorn"),
+        default="gunicorn" if shutil.which("gunicorn") else "uvicorn",
+    )
+    parser.add_argument("--out", default="loadtest_workers.json")
+    args = parser.parse_args()
+
+    updates = generate_updates(args.updates, args.users, args.seed)
+    results = []
+    with FakeOpenAIServer(latency=args.openai_latency) as openai_stub:
+        with FakeTelegramServer(latency=args.telegram_latency) as telegram_stub:
+            env = dict(
+                os.environ,
+                # main imports its siblings from src/ like the Docker image does
+                PYTHONPATH=os.pathsep.join([str(ROOT), str(ROOT / "src")]),
+                TELEGRAM_BOT_TOKEN="123:loadtest",
+                TELEGRAM_API_BASE_URL=telegram_stub.base_url,
+                PUBLIC_URL="https://loadtest.invalid",
+                WEBHOOK_URL=WEBHOOK_PATH,
+                WHITELIST_IDS=",".join(
+                    str(FIRST_USER_ID + i) for i in range(args.users)
+                ),
+                OPENAI_API_KEY="fake",
+                OPENAI_BASE_URL=openai_stub.base_url,
+            )
+            for workers in args.workers:
+                result = run_one(args, workers, updates, telegram_stub, env)
+                results.append(result)
+                print(
+                    f"{workers} workers: {result['replied']}/{result['updates']} "
+                    f"replied in {result['elapsed_s']:.2f}s = "
+                    f"{result['throughput_updates_per_s']:.1f}/s, "
+                    f"ack p50 {result['ack']['p50_ms']:.1f}ms "
+                    f"p99 {result['ack']['p99_ms']:.1f}ms, "
+                    f"{result['rejected']} rejected, once: {result['once_calls']}",
+                    flush=True,
+                )
+
+    base = results[0]["throughput_updates_per_s"]
+    for r in results[1:]:
+        if base:
+            print(
+                f"{r['workers']} vs {results[0]['workers']} workers: "
+                f"{r['throughput_updates_per_s'] / base:.2f}x"
+            )
+    with open(args.out, "w") as f:
+        json.dump(
+            {
+                "revision": git_revision(),
+                "timestamp": int(time.time()),
+                "config": {k: v for k, v in vars(args).items() if k != "out"},
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,16 @@
 import asyncio
+import html
 import logging
 import os
+import re
+import time
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
-from typing import List
+from typing import List, Tuple
 
-import aiosqlite
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from telegram import BotCommand, InputFile, Update
 from telegram.ext import (
     Application,
@@ -16,22 +19,51 @@ from telegram.ext import (
     MessageHandler,
     filters,
 )
+from telegram.error import BadRequest
+from telegram.request import HTTPXRequest
 
+from src import metrics
+from src.charts import chart_renderer
+from src.csv_import import IMPORT_MAX_BYTES, parse_import_csv
 from src.db import (
     add_expense,
+    add_expenses,
     add_global_category,
+    backfill_base_amounts,
+    claim_update,
+    get_change_counter,
+    get_data_version,
+    get_fx_rates,
+    get_monthly_base_total,
+    get_monthly_summary,
+    get_monthly_totals,
     get_user_categories,
-    get_user_expenses_report,
-    init_db,
+    import_expenses,
+    import_fx_rates,
     is_user_registered,
+    iter_user_expenses_report,
     link_user_category_by_name,
+    missing_import_categories,
     register_user,
     remove_expense_by_message_id,
+    replace_message_expenses,
+    search_expenses,
     unlink_user_category_by_name,
 )
-from src.llm_call import ExpenseExtraction, llm_call
-from src.rows_to_csv_bytes import rows_to_csv_bytes
+from src.db_pool import DBPool
+from src.fast_path import extract_expense, extract_expenses, fast_path_stats
+from src.fx_rates import BASE_CURRENCY, FX_RATES_PATH, fx_rates, read_rates_file
+from src.group_commit import enable_group_commit
+from src.llm_batcher import llm_batcher
+from src.llm_call import ExpenseExtraction, get_extraction_spec
+from src.report_cache import report_cache
+from src.report_filters import parse_report_args
+from src.rows_to_csv_bytes import report_filename, rows_to_csv_file
+from src.search_query import parse_search_args
+from src.update_queue import QueueFull, UpdateQueue
+from src.user_cache import user_cache
 from src.utils import to_int_if_whole
+from src.worker_lock import WorkerLock
 from user_interface_messages import HELP_MESSAGE, START_MESSAGE
 
 # -----------------------------------------------------------------------------
@@ -41,15 +73,65 @@ load_dotenv()
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 PUBLIC_URL = os.getenv("PUBLIC_URL", "")
 DB_PATH = os.getenv("DB_PATH", "")
+# Coalesce commits arriving within this many ms into one transaction (0 = off)
+DB_GROUP_COMMIT_MS = float(os.getenv("DB_GROUP_COMMIT_MS", "0"))
+# Read-only WAL connections for /report, categories and other lookups
+DB_READERS = int(os.getenv("DB_READERS", "3"))
+# Webhook updates are queued and processed by this many workers (per-chat order kept)
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "8"))
+# Queued updates before the webhook starts pushing back on Telegram
+UPDATE_QUEUE_MAX = int(os.getenv("UPDATE_QUEUE_MAX", "1000"))
+UPDATE_QUEUE_PUT_TIMEOUT = float(os.getenv("UPDATE_QUEUE_PUT_TIMEOUT", "5"))
+# How long handled update_ids are remembered to drop Telegram redeliveries
+PROCESSED_UPDATES_RETENTION_SECONDS = int(
+    os.getenv("PROCESSED_UPDATES_RETENTION_SECONDS", str(2 * 24 * 3600))
+)
 WHITELIST_IDS = [int(x) for x in os.getenv("WHITELIST_IDS", "").split(",") if x.strip()]
 WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
-DB_CONN = "db_conn"
+# Bot API root, e.g. a local telegram-bot-api server (default: api.telegram.org)
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "").rstrip("/")
+DB_POOL = "db_pool"
+UPDATE_QUEUE = "update_queue"
+WORKER_LOCK = "worker_lock"
+SEARCH_PAGE_SIZE = 10
+CHART_DEFAULT_MONTHS = 6
+CHART_MAX_MONTHS = 24
+# Minimum time between /import progress edits (Telegram rate-limits edits)
+IMPORT_PROGRESS_SECONDS = float(os.getenv("IMPORT_PROGRESS_SECONDS", "2"))
 ACCESS_DENIED = "Access Denied"
 
 # Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("telegram-boot")
 
+HANDLER_SECONDS = metrics.histogram(
+    "bot_handler_seconds", "Update processing time per handler", ("handler",)
+)
+HANDLER_ERRORS = metrics.counter(
+    "bot_handler_errors_total", "Exceptions raised by handlers", ("handler",)
+)
+TELEGRAM_SECONDS = metrics.histogram(
+    "bot_telegram_request_seconds", "Telegram Bot API latency", ("method",)
+)
+TELEGRAM_ERRORS = metrics.counter(
+    "bot_telegram_errors_total", "Telegram Bot API transport errors", ("method",)
+)
+metrics.register_stats("bot_user_cache", "User category cache", user_cache.stats)
+metrics.register_stats(
+    "bot_fast_path", "Extractions resolved before the LLM", fast_path_stats.stats
+)
+metrics.register_stats("bot_llm_batcher", "LLM request batching", llm_batcher.stats)
+metrics.register_stats(
+    "bot_chart_cache", "Rendered /chart images", chart_renderer.stats
+)
+metrics.register_stats("bot_report_cache", "Generated /report CSVs", report_cache.stats)
+metrics.register_stats("bot_fx_rates", "Exchange rate index", fx_rates.stats)
+metrics.register_stats(
+    "bot_llm_spec_cache",
+    "Extraction schema cache",
+    lambda: get_extraction_spec.cache_info()._asdict(),
+)
+
 assert TOKEN
 assert PUBLIC_URL
 assert DB_PATH
@@ -82,6 +164,41 @@ def is_whitelisted(update: Update, owner_id: List[int]) -> bool:
     return bool(update.effective_user and update.effective_user.id in owner_id)
 
 
+async def load_user_categories(
+    pool: DBPool, user_id: int, register: bool = False
+) -> List[str]:
+    """
+    The user's category names, from the in-process cache when possible.
+    With `register`, a first-time user is registered (which links the
+    default categories).
+    """
+    if user_cache.sync_due():
+        # Notices category changes committed by other worker processes
+        async with pool.reader() as conn:
+            user_cache.sync(await get_change_counter(conn, "user_categories"))
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+    generation = user_cache.generation()
+    async with pool.reader() as conn:
+        categories = await get_user_categories(conn=conn, user_id=user_id)
+    # Registered users always have categories, so only an empty list needs
+    # the registration round-trips.
+    if not categories and register:
+        async with pool.reader() as conn:
+            registered = await is_user_registered(conn, user_id)
+        if not registered:
+            await register_user(pool.writer, user_id)
+            generation = user_cache.generation()
+            async with pool.reader() as conn:
+                categories = await get_user_categories(conn=conn, user_id=user_id)
+    # Empty lists are not cached: they may belong to an unregistered user.
+    if categories:
+        user_cache.put(user_id, categories, generation)
+    return categories
+
+
+@metrics.timed(HANDLER_SECONDS, HANDLER_ERRORS)
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = update.message
     if not is_whitelisted(update, WHITELIST_IDS):
@@ -91,13 +208,14 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.effective_user or not update.effective_chat:
         return
 
-    conn = context.bot_data[DB_CONN]
-    if not await is_user_registered(conn, update.effective_user.id):
-        await register_user(conn, update.effective_user.id)
+    await load_user_categories(
+        context.bot_data[DB_POOL], update.effective_user.id, register=True
+    )
 
     await msg.reply_text(START_MESSAGE, parse_mode="HTML")
 
 
+@metrics.timed(HANDLER_SECONDS, HANDLER_ERRORS)
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = update.message
     if not msg or not msg.text:
@@ -108,6 +226,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await msg.reply_text(HELP_MESSAGE, parse_mode="HTML")
 
 
+@metrics.timed(HANDLER_SECONDS, HANDLER_ERRORS)
 async def unknown_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_whitelisted(update, WHITELIST_IDS):
         msg = ACCESS_DENIED
@@ -117,6 +236,60 @@ async def unknown_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(msg)
 
 
+def split_expense_lines(text: str) -> Tuple[List[str], List[str]]:
+    """
+    (expense lines, ignored lines) of a message. Only lines with a number
+    count as expenses. With fewer than two of them the message is a single
+    expense typed over several lines, e.g. "Cena con amigos\n3500", and
+    comes back whole as ([text], []).
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    expenses = [line for line in lines if re.search(r"\d", line)]
+    if len(expenses) < 2:
+        return [text], []
+    return expenses, [line for line in lines if not re.search(r"\d", line)]
+
+
+async def add_bulk_expenses(
+    pool: DBPool,
+    message_id: int,
+    chat_id: int,
+    user_id: int,
+    lines: List[str],
+    categories: List[str],
+    ignored: List[str],
+    edit: bool = False,
+) -> str:
+    """
+    Extract and store one expense per line; returns the reply text, which
+    lists the `ignored` lines plus any the LLM found no amount in. With
+    `edit`, the lines replace the message's stored expenses.
+    """
+    extracted = await extract_expenses(lines, categories=categories, pool=pool)
+    kept = [(e, line) for e, line in zip(extracted, lines) if e.value > 0]
+    ignored = ignored + [line for e, line in zip(extracted, lines) if e.value <= 0]
+    skipped = "".join(f"\n• {line}" for line in ignored)
+    if not kept:
+        return f"⚠️ No encontré montos en ninguna línea:{skipped}"
+    store = replace_message_expenses if edit else add_expenses
+    await store(
+        conn=pool.writer,
+        message_id=message_id,
+        chat_id=chat_id,
+        user_id=user_id,
+        date=int(datetime.now(timezone.utc).timestamp()),
+        expenses=[(e.value, e.category, e.currency, line) for e, line in kept],
+    )
+    detail = "\n".join(
+        f'• {to_int_if_whole(e.value)} en "{e.category}"' for e, _ in kept
+    )
+    reply = f"✅ {len(kept)} gastos registrados:\n{detail}"
+    if ignored:
+        reply += f"\n\n⚠️ Líneas ignoradas (sin monto):{skipped}"
+    return reply
+
+
+@metrics.timed(HANDLER_SECONDS, HANDLER_ERRORS)
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = update.message
     if not msg or not msg.text:
@@ -127,23 +300,34 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.effective_user or not update.effective_chat:
         return
 
-    conn = context.bot_data[DB_CONN]
-    if not await is_user_registered(conn, update.effective_user.id):
-        await register_user(conn, update.effective_user.id)
-
-    user_categories = await get_user_categories(
-        conn=context.bot_data[DB_CONN], user_id=update.effective_user.id
+    pool: DBPool = context.bot_data[DB_POOL]
+    user_categories = await load_user_categories(
+        pool, update.effective_user.id, register=True
     )
-    expense_extraction: ExpenseExtraction = llm_call(
-        msg.text, categories=user_categories
+    lines, ignored = split_expense_lines(msg.text)
+    if len(lines) > 1:
+        reply = await add_bulk_expenses(
+            pool=pool,
+            message_id=msg.message_id,
+            chat_id=update.effective_chat.id,
+            user_id=update.effective_user.id,
+            lines=lines,
+            categories=user_categories,
+            ignored=ignored,
+        )
+        await msg.reply_text(reply)
+        return
+
+    expense_extraction: ExpenseExtraction = await extract_expense(
+        msg.text, categories=user_categories, pool=pool
     )
 
     await add_expense(
-        conn=conn,
+        conn=pool.writer,
         message_id=msg.message_id,
         chat_id=update.effective_chat.id,
         user_id=update.effective_user.id,
-        date=datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        date=int(datetime.now(timezone.utc).timestamp()),
         value=expense_extraction.value,
         category=expense_extraction.category,
         currency=expense_extraction.currency,
@@ -155,6 +339,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+@metrics.timed(HANDLER_SECONDS, HANDLER_ERRORS)
 async def handle_message_edit(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = update.effective_message
     if not msg or not msg.text:
@@ -165,30 +350,43 @@ async def handle_message_edit(update: Update, context: ContextTypes.DEFAULT_TYPE
     if not update.effective_user or not update.effective_chat:
         return
 
-    await remove_expense_by_message_id(
-        conn=context.bot_data[DB_CONN],
-        message_id=msg.message_id,
-        user_id=update.effective_user.id,
-    )
+    pool: DBPool = context.bot_data[DB_POOL]
+    user_categories = await load_user_categories(pool, update.effective_user.id)
+    lines, ignored = split_expense_lines(msg.text)
+    if len(lines) > 1:
+        reply = await add_bulk_expenses(
+            pool=pool,
+            message_id=msg.message_id,
+            chat_id=update.effective_chat.id,
+            user_id=update.effective_user.id,
+            lines=lines,
+            categories=user_categories,
+            ignored=ignored,
+            edit=True,
+        )
+        await msg.reply_text(f"✅ Modificación exitosa. {reply}")
+        return
 
-    user_categories = await get_user_categories(
-        conn=context.bot_data[DB_CONN], user_id=update.effective_user.id
-    )
-    expense_extraction: ExpenseExtraction = llm_call(
-        msg.text, categories=user_categories
+    expense_extraction: ExpenseExtraction = await extract_expense(
+        msg.text, categories=user_categories, pool=pool
     )
 
-    conn = context.bot_data[DB_CONN]
-    await add_expense(
-        conn=conn,
+    # Upsert in place: a replayed or overlapping edit cannot duplicate or
+    # lose the expense.
+    await replace_message_expenses(
+        conn=pool.writer,
         message_id=msg.message_id,
         chat_id=update.effective_chat.id,
         user_id=update.effective_user.id,
-        date=datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
-        value=expense_extraction.value,
-        category=expense_extraction.category,
-        currency=expense_extraction.currency,
-        message=msg.text,
+        date=int(datetime.now(timezone.utc).timestamp()),
+        expenses=[
+            (
+                expense_extraction.value,
+                expense_extraction.category,
+                expense_extraction.currency,
+                msg.text,
+            )
+        ],
     )
 
     await msg.reply_text(
@@ -196,6 +394,7 @@ async def handle_message_edit(update: Update, context: ContextTypes.DEFAULT_TYPE
     )
 
 
+@metrics.timed(HANDLER_SECONDS, HANDLER_ERRORS)
 async def delete_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     cmd_msg = update.message
     if not cmd_msg:
@@ -219,11 +418,14 @@ async def delete_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     await remove_expense_by_message_id(
-        conn=context.bot_data[DB_CONN], message_id=target_msg_id, user_id=user_id
+        conn=context.bot_data[DB_POOL].writer,
+        message_id=target_msg_id,
+        user_id=user_id,
     )
     await cmd_msg.reply_text("🗑️ Gasto eliminado.")
 
 
+@metrics.timed(HANDLER_SECONDS, HANDLER_ERRORS)
 async def addcategory_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = update.message
     if not msg:
@@ -239,7 +441,7 @@ async def addcategory_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         await msg.reply_text("Uso: /addcategory <nombre>")
         return
 
-    conn = context.bot_data[DB_CONN]
+    conn = context.bot_data[DB_POOL].writer
     try:
         await add_global_category(conn, name)
         linked = await link_user_category_by_name(conn, update.effective_user.id, name)
@@ -251,6 +453,7 @@ async def addcategory_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         await msg.reply_text(f"⚠️ {e}")
 
 
+@metrics.timed(HANDLER_SECONDS, HANDLER_ERRORS)
 async def removecategory_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = update.message
     if not msg:
@@ -266,7 +469,7 @@ async def removecategory_command(update: Update, context: ContextTypes.DEFAULT_T
         await msg.reply_text("Uso: /removecategory <nombre>")
         return
 
-    conn = context.bot_data[DB_CONN]
+    conn = context.bot_data[DB_POOL].writer
     try:
         removed = await unlink_user_category_by_name(
             conn, update.effective_user.id, name
@@ -279,6 +482,7 @@ async def removecategory_command(update: Update, context: ContextTypes.DEFAULT_T
         await msg.reply_text(f"⚠️ {e}")
 
 
+@metrics.timed(HANDLER_SECONDS, HANDLER_ERRORS)
 async def categories_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = update.message
     if not msg:
@@ -289,13 +493,15 @@ async def categories_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if not update.effective_user:
         return
 
-    conn = context.bot_data[DB_CONN]
-    cats = await get_user_categories(conn, user_id=update.effective_user.id)
+    cats = await load_user_categories(
+        context.bot_data[DB_POOL], update.effective_user.id
+    )
     cats = sorted(cats, key=str.casefold)
     pretty = "\n".join(f"• {c}" for c in cats)
     await msg.reply_text(f"📂 Tus categorías:\n{pretty}")
 
 
+@metrics.timed(HANDLER_SECONDS, HANDLER_ERRORS)
 async def csv_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     msg = update.message
     if not msg or not msg.text:
@@ -306,20 +512,307 @@ async def csv_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     if not update.effective_user or not update.effective_chat:
         return
 
-    conn = context.bot_data[DB_CONN]
-    rows = await get_user_expenses_report(conn, user_id=update.effective_user.id)
-    bio = rows_to_csv_bytes(rows)
+    try:
+        filters = parse_report_args(msg.text.partition(" ")[2])
+    except ValueError as e:
+        await msg.reply_text(f"⚠️ {e}")
+        return
+
+    caption = "✅ Aquí tienes el registro de tus gastos en formato CSV 💸"
+    user_id = update.effective_user.id
+
+    # Version first: rows read after it are at least as new, so bytes are
+    # never cached under a version newer than their data.
+    async with context.bot_data[DB_POOL].reader() as conn:
+        version = await get_data_version(conn, user_id)
+        key = (user_id, filters.model_dump_json() if filters else "", version)
+        cached = report_cache.get(key)
+        if cached is None:
+            report = await rows_to_csv_file(
+                iter_user_expenses_report(conn, user_id=user_id, filters=filters),
+                base=filters is not None and filters.base,
+            )
+
+    if cached is not None:
+        if cached.file_id:
+            try:
+                await msg.reply_document(document=cached.file_id, caption=caption)
+                return
+            except BadRequest as e:
+                logger.warning("resending cached report by file_id failed: %s", e)
+        sent = await msg.reply_document(
+            document=InputFile(cached.data, filename=cached.filename),
+            caption=caption,
+        )
+    else:
+        filename = report_filename()
+        with report:
+            if report.seek(0, os.SEEK_END) <= report_cache.max_item_bytes:
+                report.seek(0)
+                report_cache.put(key, report.read(), filename)
+            report.seek(0)
+            sent = await msg.reply_document(
+                document=InputFile(report, filename=filename, read_file_handle=False),
+                caption=caption,
+            )
+    if sent.document:
+        report_cache.set_file_id(key, sent.document.file_id)
+
+
+@metrics.timed(HANDLER_SECONDS, HANDLER_ERRORS)
+async def summary_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    msg = update.message
+    if not msg:
+        return
+    if not is_whitelisted(update, WHITELIST_IDS):
+        await msg.reply_text(ACCESS_DENIED)
+        return
+    if not update.effective_user:
+        return
+
+    month = (context.args[0] if context.args else "").strip()
+    if not month:
+        month = datetime.now(timezone.utc).strftime("%Y-%m")
+    if not re.fullmatch(r"\d{4}-\d{2}", month):
+        await msg.reply_text("Uso: /summary [AAAA-MM]")
+        return
+
+    async with context.bot_data[DB_POOL].reader() as conn:
+        rows = await get_monthly_summary(conn, update.effective_user.id, month)
+        base_total, base_count, count = await get_monthly_base_total(
+            conn, update.effective_user.id, month
+        )
+    if not rows:
+        await msg.reply_text(f"📊 No hay gastos registrados en {month}.")
+        return
+
+    lines = [f"📊 Resumen {month}"]
+    for currency in dict.fromkeys(r[1] for r in rows):
+        in_currency = [r for r in rows if r[1] == currency]
+        total = sum(r[2] for r in in_currency)
+        n_currency = sum(r[3] for r in in_currency)
+        lines.append(
+            f"\n<b>{html.escape(currency)}: {to_int_if_whole(round(total, 2))}</b>"
+            f" ({n_currency} gastos)"
+        )
+        lines.extend(
+            f"• {html.escape(category)}: {to_int_if_whole(round(value, 2))} ({n})"
+            for category, _, value, n in in_currency
+        )
+    if any(r[1] != BASE_CURRENCY for r in rows):
+        missing = (
+            f", sin cotización: {count - base_count} gastos"
+            if base_count < count
+            else ""
+        )
+        lines.append(
+            f"\n<b>Total en {html.escape(BASE_CURRENCY)}: {to_int_if_whole(round(base_total, 2))}</b>"
+            f" ({base_count} gastos{missing})"
+        )
+    await msg.reply_text("\n".join(lines), parse_mode="HTML")
+
+
+@metrics.timed(HANDLER_SECONDS, HANDLER_ERRORS)
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    msg = update.message
+    if not msg or not msg.text:
+        return
+    if not is_whitelisted(update, WHITELIST_IDS):
+        await msg.reply_text(ACCESS_DENIED)
+        return
+    if not update.effective_user:
+        return
+
+    args = msg.text.partition(" ")[2]
+    try:
+        query, page = parse_search_args(args)
+    except ValueError as e:
+        await msg.reply_text(f"⚠️ {e}")
+        return
+
+    # One extra row tells whether there is a next page without a COUNT
+    async with context.bot_data[DB_POOL].reader() as conn:
+        rows = await search_expenses(
+            conn,
+            update.effective_user.id,
+            query,
+            limit=SEARCH_PAGE_SIZE + 1,
+            offset=(page - 1) * SEARCH_PAGE_SIZE,
+        )
+    if not rows:
+        await msg.reply_text("🔎 No encontré gastos que coincidan.")
+        return
+
+    lines = [f"🔎 Resultados (página {page}):"]
+    for row in rows[:SEARCH_PAGE_SIZE]:
+        lines.append(
+            f"• {row.date[:10]} — {to_int_if_whole(round(row.value, 2))} "
+            f'{row.currency} en "{html.escape(row.category)}"\n'
+            f"  <i>{html.escape(row.message)}</i>"
+        )
+    if len(rows) > SEARCH_PAGE_SIZE:
+        terms = re.sub(r"\s*p[aá]gina=\S*", "", args, flags=re.IGNORECASE).strip()
+        lines.append(
+            f"\nMás resultados: <code>/search {html.escape(terms)} pagina={page + 1}</code>"
+        )
+    await msg.reply_text("\n".join(lines), parse_mode="HTML")
+
+
+def last_months(count: int) -> List[str]:
+    """The last `count` 'YYYY-MM' months up to the current one, oldest first."""
+    now = datetime.now(timezone.utc)
+    index = now.year * 12 + now.month - 1
+    return [
+        f"{i // 12:04d}-{i % 12 + 1:02d}" for i in range(index - count + 1, index + 1)
+    ]
+
+
+@metrics.timed(HANDLER_SECONDS, HANDLER_ERRORS)
+async def chart_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    msg = update.message
+    if not msg:
+        return
+    if not is_whitelisted(update, WHITELIST_IDS):
+        await msg.reply_text(ACCESS_DENIED)
+        return
+    if not update.effective_user:
+        return
+
+    arg = (context.args[0] if context.args else "").strip()
+    if arg and not (arg.isdigit() and 1 <= int(arg) <= CHART_MAX_MONTHS):
+        await msg.reply_text(f"Uso: /chart [meses, 1 a {CHART_MAX_MONTHS}]")
+        return
+    months = last_months(int(arg) if arg else CHART_DEFAULT_MONTHS)
+    user_id = update.effective_user.id
+
+    # Version first: rows read after it are at least as new, so a render
+    # is never cached under a version newer than its data.
+    async with context.bot_data[DB_POOL].reader() as conn:
+        version = await get_data_version(conn, user_id)
+        key = (user_id, f"{months[0]}..{months[-1]}", version)
+        png = chart_renderer.get(key)
+        rows = (
+            await get_monthly_totals(conn, user_id, months[0], months[-1])
+            if png is None
+            else []
+        )
+    if png is None:
+        if not rows:
+            await msg.reply_text(
+                f"📈 No hay gastos registrados entre {months[0]} y {months[-1]}."
+            )
+            return
+        png = await chart_renderer.render(key, rows, months)
+
+    await msg.reply_photo(
+        photo=InputFile(png, filename="gastos.png"),
+        caption=f"📈 Gastos por categoría, {months[0]} a {months[-1]}",
+    )
+
+
+@metrics.timed(HANDLER_SECONDS, HANDLER_ERRORS)
+async def import_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /import as the caption of a CSV document, or as a reply to one. The
+    expenses belong to the document's message, so /delete replying to it
+    removes the whole import.
+    """
+    msg = update.message
+    if not msg:
+        return
+    if not is_whitelisted(update, WHITELIST_IDS):
+        await msg.reply_text(ACCESS_DENIED)
+        return
+    if not update.effective_user or not update.effective_chat:
+        return
+
+    source = msg if msg.document else msg.reply_to_message
+    if source is None or source.document is None:
+        await msg.reply_text(
+            "Usá /import como texto de un archivo CSV con el formato de /report, "
+            "o respondiendo a uno."
+        )
+        return
+    if (source.document.file_size or 0) > IMPORT_MAX_BYTES:
+        await msg.reply_text(f"⚠️ El archivo supera los {IMPORT_MAX_BYTES // 2**20} MB.")
+        return
+
+    pool: DBPool = context.bot_data[DB_POOL]
+    user_id = update.effective_user.id
+    await load_user_categories(pool, user_id, register=True)
+    tg_file = await source.document.get_file()
+    data = bytes(await tg_file.download_as_bytearray())
+    try:
+        rows = await asyncio.to_thread(parse_import_csv, data)
+    except ValueError as e:
+        await msg.reply_text(f"⚠️ {e}")
+        return
+    async with pool.reader() as conn:
+        missing = await missing_import_categories(conn, user_id, {r[2] for r in rows})
+    if missing:
+        await msg.reply_text(
+            "⚠️ Estas categorías no están en tu perfil: "
+            + ", ".join(f'"{c}"' for c in missing)
+            + ".\nAgregalas con /addcategory y volvé a importar."
+        )
+        return
+
+    status = await msg.reply_text(f"⏳ Importando {len(rows)} gastos…")
+    last_edit = time.monotonic()
 
-    await msg.reply_document(
-        document=InputFile(bio),
-        caption="✅ Aquí tienes el registro de tus gastos en formato CSV 💸",
+    async def progress(done: int, total: int) -> None:
+        nonlocal last_edit
+        if done == total or time.monotonic() - last_edit < IMPORT_PROGRESS_SECONDS:
+            return
+        last_edit = time.monotonic()
+        try:
+            await status.edit_text(f"⏳ Importando… {done}/{total}")
+        except BadRequest:
+            pass  # progress is best-effort
+
+    inserted = await import_expenses(
+        pool.writer,
+        user_id=user_id,
+        chat_id=update.effective_chat.id,
+        message_id=source.message_id,
+        rows=rows,
+        progress=progress,
+    )
+    skipped = len(rows) - inserted
+    await status.edit_text(
+        f"✅ {inserted} gastos importados"
+        + (f" ({skipped} ya estaban)" if skipped else "")
+        + ".\nPara deshacerlo, respondé al archivo con /delete."
     )
 
 
 # -----------------------------------------------------------------------------
 # Telegram app & webhook helper
 # -----------------------------------------------------------------------------
-tg_app = Application.builder().token(TOKEN).updater(None).build()
+class TimedRequest(HTTPXRequest):
+    """HTTPXRequest that records Bot API latency per method (sendMessage, ...)."""
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        start = time.perf_counter()
+        try:
+            return await super().do_request(url, method, request_data, **kwargs)
+        except Exception:
+            TELEGRAM_ERRORS.inc(api_method)
+            raise
+        finally:
+            TELEGRAM_SECONDS.observe(time.perf_counter() - start, api_method)
+
+
+tg_builder = Application.builder().token(TOKEN).updater(None)
+if TELEGRAM_API_BASE_URL:
+    tg_builder = tg_builder.base_url(f"{TELEGRAM_API_BASE_URL}/bot").base_file_url(
+        f"{TELEGRAM_API_BASE_URL}/file/bot"
+    )
+if metrics.METRICS_ENABLED:
+    # Same pool size PTB uses for its default bot request
+    tg_builder = tg_builder.request(TimedRequest(connection_pool_size=256))
+tg_app = tg_builder.build()
 tg_app.add_handler(CommandHandler("help", help_command))
 tg_app.add_handler(CommandHandler("start", start))
 tg_app.add_handler(CommandHandler("delete", delete_command))
@@ -327,6 +820,16 @@ tg_app.add_handler(CommandHandler("addcategory", addcategory_command))
 tg_app.add_handler(CommandHandler("removecategory", removecategory_command))
 tg_app.add_handler(CommandHandler("categories", categories_command))
 tg_app.add_handler(CommandHandler("report", csv_command))
+tg_app.add_handler(CommandHandler("summary", summary_command))
+tg_app.add_handler(CommandHandler("search", search_command))
+tg_app.add_handler(CommandHandler("chart", chart_command))
+tg_app.add_handler(CommandHandler("import", import_command))
+tg_app.add_handler(
+    MessageHandler(
+        filters.Document.ALL & filters.CaptionRegex(r"^/import(@\w+)?(\s|$)"),
+        import_command,
+    )
+)
 tg_app.add_handler(MessageHandler(filters.COMMAND, unknown_command))
 tg_app.add_handler(
     MessageHandler(
@@ -361,35 +864,86 @@ async def ensure_webhook(bot):
 # -----------------------------------------------------------------------------
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    db_conn = await aiosqlite.connect(DB_PATH)
-    await init_db(db_conn)
-    tg_app.bot_data[DB_CONN] = db_conn
+    # Several workers may share DB_PATH; only one registers commands/webhook.
+    worker_lock = WorkerLock(DB_PATH)
+    is_leader = worker_lock.join()
+    tg_app.bot_data[WORKER_LOCK] = worker_lock
+    db_pool = DBPool(DB_PATH, readers=DB_READERS)
+    with worker_lock.migrating():
+        await db_pool.open()
+        # Rates for days the file adds, then the expenses that were waiting
+        # on them; both are no-ops once one worker has done them.
+        if FX_RATES_PATH:
+            await import_fx_rates(db_pool.writer, read_rates_file(FX_RATES_PATH))
+        await backfill_base_amounts(db_pool.writer, BASE_CURRENCY)
+    async with db_pool.reader() as conn:
+        fx_rates.load(await get_fx_rates(conn))
+    if DB_GROUP_COMMIT_MS > 0:
+        group = enable_group_commit(db_pool.writer, DB_GROUP_COMMIT_MS)
+        metrics.register_stats(
+            "bot_db_group_commit",
+            "Writer group commit",
+            lambda: {"commits": group.commits, "writes": group.writes},
+        )
+    tg_app.bot_data[DB_POOL] = db_pool
+
+    async def claim(update: Update) -> bool:
+        return await claim_update(
+            db_pool.writer, update.update_id, PROCESSED_UPDATES_RETENTION_SECONDS
+        )
 
     await tg_app.initialize()
-    await tg_app.bot.set_my_commands(
-        [
-            BotCommand("help", "Ver ayuda"),
-            BotCommand("start", "Introducción"),
-            BotCommand("delete", "Borra el mensaje citado"),
-            BotCommand("report", "Descargar gastos en CSV"),
-            BotCommand("addcategory", "Agregar una categoría a tu perfil"),
-            BotCommand("removecategory", "Quitar una categoría de tu perfil"),
-            BotCommand("categories", "Listar tus categorías"),
-        ]
+    chart_renderer.start()
+    update_queue = UpdateQueue(
+        tg_app.process_update,
+        workers=UPDATE_WORKERS,
+        max_depth=UPDATE_QUEUE_MAX,
+        put_timeout=UPDATE_QUEUE_PUT_TIMEOUT,
+        claim=claim,
     )
+    update_queue.start()
+    tg_app.bot_data[UPDATE_QUEUE] = update_queue
+    metrics.register_stats("bot_db_pool", "SQLite reader pool", db_pool.stats)
+    metrics.register_stats(
+        "bot_update_queue", "Webhook update queue", update_queue.stats
+    )
+
+    if is_leader:
+        await tg_app.bot.set_my_commands(
+            [
+                BotCommand("help", "Ver ayuda"),
+                BotCommand("start", "Introducción"),
+                BotCommand("delete", "Borra el mensaje citado"),
+                BotCommand("report", "Descargar gastos en CSV"),
+                BotCommand("summary", "Resumen del mes por categoría"),
+                BotCommand("search", "Buscar gastos por texto"),
+                BotCommand("chart", "Gráfico de gastos por mes"),
+                BotCommand("import", "Importar gastos desde un CSV"),
+                BotCommand("addcategory", "Agregar una categoría a tu perfil"),
+                BotCommand("removecategory", "Quitar una categoría de tu perfil"),
+                BotCommand("categories", "Listar tus categorías"),
+            ]
+        )
 
-    # Do not block startup; try to set webhook in background (non-fatal).
-    asyncio.create_task(ensure_webhook(tg_app.bot))
+        # Do not block startup; try to set webhook in background (non-fatal).
+        asyncio.create_task(ensure_webhook(tg_app.bot))
+    else:
+        logger.info("Not the leader worker; skipping commands/webhook setup")
 
     yield
 
-    try:
-        await tg_app.bot.delete_webhook(drop_pending_updates=True)
-    except Exception as e:
-        logger.warning("delete_webhook failed (ignored): %s", e)
+    # Only the last worker to stop; a reload's new workers still need it.
+    if worker_lock.leave():
+        try:
+            await tg_app.bot.delete_webhook(drop_pending_updates=True)
+        except Exception as e:
+            logger.warning("delete_webhook failed (ignored): %s", e)
 
+    await update_queue.stop()
     await tg_app.shutdown()
-    await db_conn.close()
+    chart_renderer.close()
+    await db_pool.close()
+    worker_lock.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -399,7 +953,15 @@ app = FastAPI(lifespan=lifespan)
 async def telegram_webhook(req: Request):
     data = await req.json()
     update = Update.de_json(data, tg_app.bot)
-    await tg_app.process_update(update)
+    # Acknowledge as soon as the update is queued; workers do the LLM/DB work.
+    # A non-2xx makes Telegram redeliver later, which is the backpressure.
+    try:
+        await tg_app.bot_data[UPDATE_QUEUE].submit(update)
+    except QueueFull:
+        logger.warning(
+            "update queue full, asking Telegram to retry %s", update.update_id
+        )
+        return JSONResponse({"ok": False}, status_code=503)
     return {"ok": True}
 
 
@@ -411,7 +973,23 @@ async def telegram_webhook_get():
 
 @app.get("/health")
 async def health():
-    return {"ok": True}
+    return {
+        "ok": True,
+        "worker": {
+            "pid": os.getpid(),
+            "leader": tg_app.bot_data[WORKER_LOCK].is_leader,
+        },
+        "db_pool": tg_app.bot_data[DB_POOL].stats(),
+        "update_queue": tg_app.bot_data[UPDATE_QUEUE].stats(),
+        "user_cache": user_cache.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    if not metrics.METRICS_ENABLED:
+        return PlainTextResponse("metrics disabled\n", status_code=404)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 # uvicorn main:app --host 0.0.0.0 --port 8080
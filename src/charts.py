@@ -0,0 +1,166 @@
+"""
+/chart rendering: monthly spend by category as a PNG.
+
+matplotlib runs in a process pool (spawned, so workers never inherit the
+server's threads or sockets) and is only imported there. Workers get the
+rollup rows, not expenses, so what crosses the process boundary is a few
+hundred tuples at most. Images are cached by (user_id, period,
+data_version); users.data_version moves with every expense change, so a
+hit is always what a fresh render would produce.
+"""
+
+import asyncio
+import io
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src import metrics
+
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "1"))
+CHART_CACHE_MAX_ENTRIES = int(os.getenv("CHART_CACHE_MAX_ENTRIES", "256"))
+# Categories drawn per currency; the rest are stacked as one "OTRAS" band
+CHART_MAX_CATEGORIES = 8
+
+CHART_SECONDS = metrics.histogram(
+    "bot_chart_render_seconds", "PNG render time in the process pool"
+)
+
+# (month, category, currency, total)
+ChartRow = Tuple[str, str, str, float]
+CacheKey = Tuple[int, str, int]
+
+
+def render_monthly_chart(rows: Sequence[ChartRow], months: Sequence[str]) -> bytes:
+    """Stacked bars per month, one panel per currency. Runs in a worker."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    currencies = list(dict.fromkeys(r[2] for r in rows))
+    fig, axes = plt.subplots(
+        len(currencies), 1, figsize=(8, 3.5 * len(currencies)), squeeze=False
+    )
+    for ax, currency in zip(axes[:, 0], currencies):
+        totals: Dict[str, Dict[str, float]] = {}
+        for month, category, cur, total in rows:
+            if cur == currency:
+                totals.setdefault(category, {})[month] = total
+        ranked = sorted(totals, key=lambda c: -sum(totals[c].values()))
+        if len(ranked) > CHART_MAX_CATEGORIES:
+            other: Dict[str, float] = {}
+            for category in ranked[CHART_MAX_CATEGORIES - 1 :]:
+                for month, total in totals.pop(category).items():
+                    other[month] = other.get(month, 0.0) + total
+            ranked = ranked[: CHART_MAX_CATEGORIES - 1] + ["OTRAS"]
+            totals["OTRAS"] = other
+        bottom = [0.0] * len(months)
+        for category in ranked:
+            heights = [totals[category].get(m, 0.0) for m in months]
+            ax.bar(months, heights, bottom=bottom, label=category)
+            bottom = [b + h for b, h in zip(bottom, heights)]
+        ax.set_title(currency)
+        ax.tick_params(axis="x", labelrotation=45)
+        ax.legend(fontsize="small", loc="upper left", bbox_to_anchor=(1, 1))
+    fig.tight_layout()
+    out = io.BytesIO()
+    fig.savefig(out, format="png", dpi=100)
+    plt.close(fig)
+    return out.getvalue()
+
+
+def _warm_up() -> None:
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+
+
+class ChartRenderer:
+    """
+    Process pool plus an LRU of rendered PNGs. Concurrent requests for the
+    same key share one render.
+    """
+
+    def __init__(self, workers: int, max_entries: int):
+        self.workers = workers
+        self.max_entries = max_entries
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._cache: "OrderedDict[CacheKey, bytes]" = OrderedDict()
+        self._inflight: Dict[CacheKey, "asyncio.Future[bytes]"] = {}
+        self.hits = 0
+        self.renders = 0
+        self.evictions = 0
+
+    def start(self) -> None:
+        self._pool = ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        # Pay for the matplotlib import now rather than on the first /chart
+        self._pool.submit(_warm_up)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def get(self, key: CacheKey) -> Optional[bytes]:
+        png = self._cache.get(key)
+        if png is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+        return png
+
+    async def render(
+        self, key: CacheKey, rows: List[ChartRow], months: List[str]
+    ) -> bytes:
+        png = self.get(key)
+        if png is not None:
+            return png
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        assert self._pool is not None, "ChartRenderer.start() was not called"
+        loop = asyncio.get_running_loop()
+        fut: "asyncio.Future[bytes]" = loop.create_future()
+        self._inflight[key] = fut
+        start = time.perf_counter()
+        try:
+            png = await loop.run_in_executor(
+                self._pool, render_monthly_chart, rows, months
+            )
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved: there may be no other waiter
+            raise
+        finally:
+            del self._inflight[key]
+        CHART_SECONDS.observe(time.perf_counter() - start)
+        self.renders += 1
+        fut.set_result(png)
+        self._cache[key] = png
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+        return png
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "entries": len(self._cache),
+            "bytes": sum(len(png) for png in self._cache.values()),
+            "hits": self.hits,
+            "renders": self.renders,
+            "evictions": self.evictions,
+        }
+
+
+chart_renderer = ChartRenderer(CHART_WORKERS, CHART_CACHE_MAX_ENTRIES)
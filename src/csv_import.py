@@ -0,0 +1,143 @@
+"""
+/import: bulk load of expenses from a CSV in the /report layout
+(rows_to_csv_bytes.HEADER_LABELS), e.g. a spreadsheet's history.
+
+Rows skip the LLM entirely. Categories are checked once for the whole
+file, then rows go in with executemany, db.IMPORT_CHUNK_ROWS per commit.
+Every row carries the import message's id and its position as line_no,
+so re-running an import (a redelivered update, or the CLI after a crash)
+only adds the rows still missing, and /delete on that message undoes it.
+"""
+
+import csv
+import hashlib
+import io
+import os
+from datetime import datetime, timezone
+from typing import List
+
+from src.db import ImportRow
+from src.fx_rates import normalize_currency
+from src.utils import to_cents
+
+# Telegram bots can't download bigger files anyway
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(20 * 2**20)))
+
+
+def _parse_date(text: str) -> int:
+    """'YYYY-MM-DD[ HH:MM:SS]', UTC unless it carries an offset."""
+    try:
+        parsed = datetime.fromisoformat(text.strip())
+    except ValueError:
+        raise ValueError(f"fecha inválida '{text}' (AAAA-MM-DD [HH:MM:SS])") from None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def _parse_amount(text: str) -> int:
+    try:
+        return to_cents(float(text))
+    except ValueError:
+        raise ValueError(f"monto inválido '{text}'") from None
+
+
+def parse_import_csv(data: bytes) -> List[ImportRow]:
+    """
+    Rows of a /report-style CSV: Fecha, Monto, Categoría, Moneda, Mensaje.
+    Later columns (the report's base-currency amount) are ignored; that
+    amount is recomputed from the rates. Raises ValueError naming the line.
+    """
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("El archivo no es un CSV en UTF-8.") from None
+    rows: List[ImportRow] = []
+    for line_no, record in enumerate(csv.reader(io.StringIO(text)), start=1):
+        if not record or not any(cell.strip() for cell in record):
+            continue
+        if line_no == 1 and record[0].strip().lower() == "fecha":
+            continue
+        try:
+            if len(record) < 5:
+                raise ValueError("se esperan 5 columnas")
+            date, amount, category, currency, message = record[:5]
+            category = category.strip().upper()
+            if not category:
+                raise ValueError("falta la categoría")
+            rows.append(
+                (
+                    _parse_date(date),
+                    _parse_amount(amount),
+                    category,
+                    normalize_currency(currency),
+                    message.strip(),
+                )
+            )
+        except ValueError as e:
+            raise ValueError(f"Línea {line_no}: {e}") from None
+    if not rows:
+        raise ValueError("El archivo no tiene gastos.")
+    return rows
+
+
+def import_message_id(data: bytes) -> int:
+    """
+    Stand-in message_id for CLI imports: derived from the content, so
+    re-running the same file is a no-op, and negative, so it never
+    collides with a Telegram message.
+    """
+    return -int.from_bytes(hashlib.sha256(data).digest()[:6], "big")
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+    import time
+
+    import aiosqlite
+
+    from src.db import (
+        get_fx_rates,
+        import_expenses,
+        init_db,
+        missing_import_categories,
+    )
+    from src.fx_rates import fx_rates
+
+    async def _main(csv_path: str, db_path: str, user_id: int) -> None:
+        with open(csv_path, "rb") as f:
+            data = f.read()
+        rows = parse_import_csv(data)
+        conn = await aiosqlite.connect(db_path)
+        try:
+            await init_db(conn)
+            fx_rates.load(await get_fx_rates(conn))
+            missing = await missing_import_categories(
+                conn, user_id, {r[2] for r in rows}
+            )
+            if missing:
+                sys.exit(f"Categories not linked to user {user_id}: {missing}")
+            start = time.perf_counter()
+
+            async def progress(done: int, total: int) -> None:
+                print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True)
+
+            inserted = await import_expenses(
+                conn,
+                user_id=user_id,
+                chat_id=user_id,
+                message_id=import_message_id(data),
+                rows=rows,
+                progress=progress,
+            )
+            print(
+                f"\n{inserted} imported, {len(rows) - inserted} already present "
+                f"in {time.perf_counter() - start:.1f}s",
+                file=sys.stderr,
+            )
+        finally:
+            await conn.close()
+
+    # python -m src.csv_import expenses.csv /var/lib/bot/bot.db <user_id>
+    asyncio.run(_main(sys.argv[1], sys.argv[2], int(sys.argv[3])))
@@ -1,99 +1,117 @@
-from typing import List
+import asyncio
+import functools
+import json
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    cast,
+)
 
 import aiosqlite
 from pydantic import BaseModel
 
+from src import metrics
 from src.base_categories import BASE_CATEGORIES
+from src.fx_rates import RateRow, fx_rates, normalize_currency
+from src.group_commit import commit, end_failed_write
+from src.migrations import ROLLUP_BACKFILL, apply_migrations
+from src.user_cache import user_cache
+from src.utils import to_cents
+
+DB_SECONDS = metrics.histogram(
+    "bot_db_query_seconds", "src.db helper latency, commit included", ("helper",)
+)
+DB_ERRORS = metrics.counter(
+    "bot_db_errors_total", "src.db helper exceptions", ("helper",)
+)
+DB_BUSY_RETRIES = metrics.counter(
+    "bot_db_busy_retries_total",
+    "Writes retried after SQLITE_BUSY from another process",
+    ("helper",),
+)
+
+# Retries after the connection's own busy timeout already expired
+DB_BUSY_MAX_RETRIES = int(os.getenv("DB_BUSY_MAX_RETRIES", "3"))
+DB_BUSY_BACKOFF_SECONDS = float(os.getenv("DB_BUSY_BACKOFF_SECONDS", "0.05"))
+# Rows per commit in import_expenses
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "5000"))
+
+# An /import row, see csv_import.parse_import_csv:
+# (date epoch, amount_cents, category, currency, message)
+ImportRow = Tuple[int, int, str, str, str]
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+
+def retry_on_busy(fn: F) -> F:
+    """
+    Re-run a write helper that failed with "database is locked", with
+    jittered exponential backoff. Only retried when the connection has no
+    open transaction afterwards: the lock is taken by BEGIN IMMEDIATE
+    before the helper's first write, so nothing of it (or of a concurrent
+    helper sharing the writer) was applied.
+
+    Any other failure (including a ValueError raised after a statement
+    wrote nothing) ends the transaction BEGIN IMMEDIATE opened, so the
+    write lock is released for other processes right away.
+    """
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        conn: aiosqlite.Connection = kwargs["conn"] if "conn" in kwargs else args[0]
+        attempt = 0
+        while True:
+            try:
+                return await fn(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                busy = "locked" in str(e) or "busy" in str(e)
+                if not busy or conn.in_transaction or attempt >= DB_BUSY_MAX_RETRIES:
+                    await end_failed_write(conn)
+                    raise
+            except BaseException:
+                await end_failed_write(conn)
+                raise
+            DB_BUSY_RETRIES.inc(fn.__name__)
+            await asyncio.sleep(
+                DB_BUSY_BACKOFF_SECONDS * 2**attempt * random.uniform(0.5, 1.5)
+            )
+            attempt += 1
+
+    return cast(F, wrapper)
 
 
 # -----------------------------
 # Schema Initialization
 # -----------------------------
 async def init_db(conn: aiosqlite.Connection) -> None:
+    """Connection pragmas, then any schema migrations not yet applied."""
     await conn.execute("PRAGMA journal_mode=WAL;")
     await conn.execute("PRAGMA foreign_keys=ON;")
-
-    await conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            created_at TEXT DEFAULT (datetime('now'))
-        )
-        """
-    )
-
-    # Global category catalog
-    await conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS categories (
-            name TEXT PRIMARY KEY
-        )
-        """
-    )
-
-    await conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS user_categories (
-            user_id INTEGER NOT NULL,
-            category_name TEXT NOT NULL,
-            PRIMARY KEY (user_id, category_name),
-            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
-            FOREIGN KEY (category_name) REFERENCES categories(name) ON DELETE CASCADE
-        )
-        """
-    )
-
-    await conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS expenses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            message_id INTEGER NOT NULL,
-            chat_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            date TEXT NOT NULL,
-            value REAL NOT NULL,
-            category_name TEXT NOT NULL,
-            currency TEXT NOT NULL,
-            message TEXT NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
-            FOREIGN KEY (category_name) REFERENCES categories(name) ON DELETE RESTRICT
-        )
-        """
-    )
-
-    # Indexes
-    await conn.execute(
-        "CREATE INDEX IF NOT EXISTS idx_categories_name ON categories(name)"
-    )
-    await conn.execute(
-        "CREATE INDEX IF NOT EXISTS idx_uc_user ON user_categories(user_id)"
-    )
-    await conn.execute(
-        "CREATE INDEX IF NOT EXISTS idx_uc_cat ON user_categories(category_name)"
-    )
-    await conn.execute(
-        "CREATE INDEX IF NOT EXISTS idx_expenses_user ON expenses(user_id, id)"
-    )
-    await conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses(date)")
-    await conn.execute(
-        "CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses(category_name)"
-    )
-
-    # Seed the global catalog with your defaults (once)
-    await conn.executemany(
-        "INSERT OR IGNORE INTO categories(name) VALUES (?)",
-        [(n,) for n in BASE_CATEGORIES],
-    )
-
-    await conn.commit()
+    await apply_migrations(conn)
 
 
 # -----------------------------
 # User registration
 # -----------------------------
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+@retry_on_busy
 async def register_user(conn: aiosqlite.Connection, user_id: int) -> None:
     """Create the user and link default categories to them."""
-    await conn.execute("INSERT INTO users (user_id) VALUES (?)", (user_id,))
+    # OR IGNORE: another worker may register the same user concurrently
+    await conn.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
 
     # Link the default categories for this user
     await conn.executemany(
@@ -101,9 +119,11 @@ async def register_user(conn: aiosqlite.Connection, user_id: int) -> None:
         [(user_id, n.strip()) for n in BASE_CATEGORIES if n.strip()],
     )
 
-    await conn.commit()
+    await commit(conn)
+    user_cache.invalidate(user_id)
 
 
+@metrics.timed(DB_SECONDS, DB_ERRORS)
 async def is_user_registered(conn: aiosqlite.Connection, user_id: int) -> bool:
     cur = await conn.execute(
         "SELECT 1 FROM users WHERE user_id = ? LIMIT 1",
@@ -117,6 +137,8 @@ async def is_user_registered(conn: aiosqlite.Connection, user_id: int) -> bool:
 # -----------------------------
 # Category
 # -----------------------------
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+@retry_on_busy
 async def add_global_category(conn: aiosqlite.Connection, name: str) -> bool:
     """Add a category to the global catalog. Returns True if created, False if it already existed."""
     name = name.strip()
@@ -127,10 +149,12 @@ async def add_global_category(conn: aiosqlite.Connection, name: str) -> bool:
     )
     created = cur.rowcount > 0
     await cur.close()
-    await conn.commit()
+    await commit(conn)
     return created
 
 
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+@retry_on_busy
 async def link_user_category_by_name(
     conn: aiosqlite.Connection, user_id: int, name: str
 ) -> bool:
@@ -150,12 +174,15 @@ async def link_user_category_by_name(
         "INSERT OR IGNORE INTO user_categories (user_id, category_name) VALUES (?, ?)",
         (user_id, name),
     )
-    await conn.commit()
+    await commit(conn)
+    user_cache.invalidate(user_id)
     linked = cur.rowcount > 0
     await cur.close()
     return linked
 
 
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+@retry_on_busy
 async def unlink_user_category_by_name(
     conn: aiosqlite.Connection, user_id: int, name: str
 ) -> bool:
@@ -171,10 +198,12 @@ async def unlink_user_category_by_name(
     )
     removed = cur.rowcount > 0
     await cur.close()
-    await conn.commit()
+    await commit(conn)
+    user_cache.invalidate(user_id)
     return removed
 
 
+@metrics.timed(DB_SECONDS, DB_ERRORS)
 async def get_user_categories(conn: aiosqlite.Connection, user_id: int) -> List[str]:
     cur = await conn.execute(
         """
@@ -190,6 +219,17 @@ async def get_user_categories(conn: aiosqlite.Connection, user_id: int) -> List[
     return [r[0] for r in rows]
 
 
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+async def get_change_counter(conn: aiosqlite.Connection, name: str) -> int:
+    """Current value of a change_counters row (bumped by triggers)."""
+    cur = await conn.execute(
+        "SELECT value FROM change_counters WHERE name = ?", (name,)
+    )
+    row = await cur.fetchone()
+    await cur.close()
+    return row[0] if row else 0
+
+
 # -----------------------------
 # Expenses
 # -----------------------------
@@ -201,51 +241,262 @@ class ExpenseRow(BaseModel):
     category: str
     currency: str
     message: str
+    value_base: Optional[float] = None  # in fx_rates.BASE_CURRENCY, if a rate exists
+
+
+class ReportFilter(BaseModel):
+    date_from: Optional[str] = None  # inclusive, "YYYY-MM-DD HH:MM:SS"
+    date_to: Optional[str] = None  # exclusive
+    category: Optional[str] = None
+    currency: Optional[str] = None
+    base: bool = False  # add the amount in fx_rates.BASE_CURRENCY as a last column
+
+
+def to_epoch(date: str) -> int:
+    """'YYYY-MM-DD HH:MM:SS' (UTC) -> epoch seconds."""
+    parsed = datetime.strptime(date, "%Y-%m-%d %H:%M:%S")
+    return int(parsed.replace(tzinfo=timezone.utc).timestamp())
+
+
+def build_report_query(
+    user_id: int, filters: Optional[ReportFilter] = None
+) -> Tuple[str, List[Any]]:
+    """
+    Report SELECT for a user. Served by idx_expenses_user_date, or by
+    idx_expenses_user_cat_date when filtering by category; both also give
+    the ORDER BY for free.
+    """
+    where = ["e.user_id = ?"]
+    params: List[Any] = [user_id]
+    base = ""
+    if filters is not None:
+        if filters.base:
+            base = ", e.amount_base_cents / 100.0"
+        if filters.category:
+            where.append("e.category_name = ?")
+            params.append(filters.category)
+        if filters.date_from:
+            where.append("e.date >= ?")
+            params.append(to_epoch(filters.date_from))
+        if filters.date_to:
+            where.append("e.date < ?")
+            params.append(to_epoch(filters.date_to))
+        if filters.currency:
+            where.append("e.currency = ?")
+            params.append(filters.currency)
+    sql = f"""
+        SELECT strftime('%Y-%m-%d %H:%M:%S', e.date, 'unixepoch'), e.amount_cents / 100.0,
+            e.category_name AS category, e.currency, e.message{base}
+        FROM expenses e
+        WHERE {" AND ".join(where)}
+        ORDER BY e.date DESC, e.id DESC
+        """
+    return sql, params
 
 
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+@retry_on_busy
 async def add_expense(
     conn: aiosqlite.Connection,
     message_id: int,
     chat_id: int,
     user_id: int,
-    date: str,
+    date: int,
     value: float,
     category: str,
     currency: str,
     message: str,
 ) -> None:
+    """
+    `date` is epoch seconds; `value` is stored as integer cents, along with
+    its amount in the base currency at that day's rate (NULL if none yet).
+    """
     if not category:
         raise ValueError("Category name cannot be empty.")
+    currency = normalize_currency(currency)
+    cents = to_cents(value)
 
-    # Ensure category exists globally
-    cur = await conn.execute("SELECT 1 FROM categories WHERE name = ?", (category,))
-    exists = await cur.fetchone()
-    await cur.close()
-    if not exists:
-        raise ValueError(f"Category '{category}' does not exist in catalog.")
-
-    # Ensure the user is linked to this category
+    # Validate and insert in one statement: the row is only produced when the
+    # user is linked to the category (which, by FK, exists in the catalog).
+    # With several worker processes an edit can be handled before its
+    # original message; the newer edit's row then wins.
     cur = await conn.execute(
-        "SELECT 1 FROM user_categories WHERE user_id = ? AND category_name = ?",
-        (user_id, category),
+        f"""
+        INSERT INTO expenses (message_id, chat_id, user_id, date, amount_cents, category_name, currency, message, amount_base_cents)
+        SELECT ?, ?, uc.user_id, ?, ?, uc.category_name, ?, ?, ?
+        FROM user_categories uc
+        WHERE uc.user_id = ? AND uc.category_name = ? AND {_MESSAGE_NOT_STORED}
+        """,
+        (
+            message_id,
+            chat_id,
+            date,
+            cents,
+            currency,
+            message,
+            fx_rates.to_base_cents(cents, currency, date),
+            user_id,
+            category,
+            user_id,
+            chat_id,
+            message_id,
+        ),
     )
-    link = await cur.fetchone()
+    inserted = cur.rowcount > 0
     await cur.close()
-    if not link:
+    if not inserted and not await _message_stored(conn, user_id, chat_id, message_id):
         raise ValueError(
             f"Category '{category}' is not linked to user {user_id}. Call link_user_category_by_name()."
         )
+    # Also when nothing was inserted: ends the BEGIN IMMEDIATE transaction
+    await commit(conn)
+
+
+# Params: user_id, chat_id, message_id
+_MESSAGE_NOT_STORED = """
+    NOT EXISTS (
+        SELECT 1 FROM expenses e
+        WHERE e.user_id = ? AND e.chat_id = ? AND e.message_id = ?
+    )
+"""
+
+
+async def _message_stored(
+    conn: aiosqlite.Connection, user_id: int, chat_id: int, message_id: int
+) -> bool:
+    cur = await conn.execute(
+        f"SELECT NOT {_MESSAGE_NOT_STORED}", (user_id, chat_id, message_id)
+    )
+    row = await cur.fetchone()
+    await cur.close()
+    return bool(row and row[0])
+
+
+async def _insert_message_lines(
+    conn: aiosqlite.Connection,
+    message_id: int,
+    chat_id: int,
+    user_id: int,
+    date: int,
+    expenses: List[Tuple[float, str, str, str]],
+    upsert: bool,
+) -> None:
+    """
+    Write the lines of one message as a single statement, so it is
+    all-or-nothing without savepoints, which other coroutines sharing the
+    writer could otherwise interleave with. A category the user is not
+    linked to joins as NULL and aborts the statement on NOT NULL.
+
+    Without `upsert`, nothing is written if the message already has lines:
+    its edit was handled first (by another worker process) and is newer.
+    """
+    rows = ", ".join(["(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"] * len(expenses))
+    on_conflict = (
+        """
+        ON CONFLICT (user_id, chat_id, message_id, line_no) DO UPDATE SET
+            amount_cents = excluded.amount_cents,
+            category_name = excluded.category_name,
+            currency = excluded.currency,
+            message = excluded.message,
+            amount_base_cents = excluded.amount_base_cents
+        """
+        if upsert
+        else ""
+    )
+    where = "true" if upsert else _MESSAGE_NOT_STORED
+    params: List[Any] = []
+    for line_no, (value, category, currency, message) in enumerate(expenses):
+        currency = normalize_currency(currency)
+        cents = to_cents(value)
+        params += [
+            message_id,
+            chat_id,
+            user_id,
+            date,
+            cents,
+            category,
+            currency,
+            message,
+            line_no,
+            fx_rates.to_base_cents(cents, currency, date),
+        ]
+    try:
+        await conn.execute(
+            f"""
+            INSERT INTO expenses (message_id, chat_id, user_id, date, amount_cents, category_name, currency, message, line_no, amount_base_cents)
+            SELECT v.column1, v.column2, v.column3, v.column4, v.column5,
+                uc.category_name, v.column7, v.column8, v.column9, v.column10
+            FROM (VALUES {rows}) AS v
+            LEFT JOIN user_categories uc
+                ON uc.user_id = v.column3 AND uc.category_name = v.column6
+            WHERE {where}
+            {on_conflict}
+            """,
+            params if upsert else params + [user_id, chat_id, message_id],
+        )
+    except sqlite3.IntegrityError as e:
+        if "expenses.category_name" not in str(e):
+            raise
+        categories = sorted({c for _, c, _, _ in expenses})
+        raise ValueError(
+            f"Some of the categories {categories} are not linked to user {user_id}. Call link_user_category_by_name()."
+        ) from None
+
 
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+@retry_on_busy
+async def add_expenses(
+    conn: aiosqlite.Connection,
+    message_id: int,
+    chat_id: int,
+    user_id: int,
+    date: int,
+    expenses: List[Tuple[float, str, str, str]],
+) -> None:
+    """
+    Insert several expenses from one message atomically.
+    Each item is (value, category, currency, message); all share message_id,
+    so edits and /delete act on the whole group. Items are numbered by
+    position (line_no).
+    """
+    await _insert_message_lines(
+        conn, message_id, chat_id, user_id, date, expenses, upsert=False
+    )
+    await commit(conn)
+
+
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+@retry_on_busy
+async def replace_message_expenses(
+    conn: aiosqlite.Connection,
+    message_id: int,
+    chat_id: int,
+    user_id: int,
+    date: int,
+    expenses: List[Tuple[float, str, str, str]],
+) -> None:
+    """
+    Make the stored expenses of an edited message match `expenses`: lines
+    are upserted on (user_id, chat_id, message_id, line_no), keeping their
+    original date, then lines the edit removed are deleted. Both statements
+    go out in the same commit. Replaying the same edit is a no-op; a
+    rejected edit leaves the previous version intact.
+    """
+    await _insert_message_lines(
+        conn, message_id, chat_id, user_id, date, expenses, upsert=True
+    )
     await conn.execute(
         """
-        INSERT INTO expenses (message_id, chat_id, user_id, date, value, category_name, currency, message)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        DELETE FROM expenses
+        WHERE user_id = ? AND chat_id = ? AND message_id = ? AND line_no >= ?
         """,
-        (message_id, chat_id, user_id, date, value, category, currency, message),
+        (user_id, chat_id, message_id, len(expenses)),
     )
-    await conn.commit()
+    await commit(conn)
 
 
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+@retry_on_busy
 async def remove_expense_by_message_id(
     conn: aiosqlite.Connection,
     message_id: int,
@@ -255,25 +506,499 @@ async def remove_expense_by_message_id(
         "DELETE FROM expenses WHERE message_id = ? AND user_id = ?",
         (message_id, user_id),
     )
-    await conn.commit()
+    await commit(conn)
     return cursor.rowcount > 0  # True if a row was deleted
 
 
+@metrics.timed(DB_SECONDS, DB_ERRORS)
 async def get_user_expenses_report(
-    conn: aiosqlite.Connection, user_id: int
+    conn: aiosqlite.Connection, user_id: int, filters: Optional[ReportFilter] = None
 ) -> List[ExpenseRow]:
-    cursor = await conn.execute(
+    cursor = await conn.execute(*build_report_query(user_id, filters))
+    rows = await cursor.fetchall()
+    await cursor.close()
+    return [
+        ExpenseRow(
+            date=r[0],
+            value=r[1],
+            category=r[2],
+            currency=r[3],
+            message=r[4],
+            value_base=r[5] if len(r) > 5 else None,
+        )
+        for r in rows
+    ]
+
+
+async def iter_user_expenses_report(
+    conn: aiosqlite.Connection,
+    user_id: int,
+    filters: Optional[ReportFilter] = None,
+    chunk_size: int = 1000,
+) -> AsyncIterator[List[Tuple[Any, ...]]]:
+    """
+    Same rows as get_user_expenses_report, as plain tuples in the ExpenseRow
+    field order, yielded `chunk_size` at a time instead of all at once.
+    """
+    cursor = await conn.execute(*build_report_query(user_id, filters))
+    try:
+        while True:
+            rows = await cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            # Plain tuples: the connection sets no row_factory
+            yield cast(List[Tuple[Any, ...]], rows)
+    finally:
+        await cursor.close()
+
+
+# -----------------------------
+# CSV import
+# -----------------------------
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+async def missing_import_categories(
+    conn: aiosqlite.Connection, user_id: int, categories: Iterable[str]
+) -> List[str]:
+    """
+    Of `categories`, the ones not linked to the user (linked ones exist in
+    the catalog by FK), checked in one query however many rows use them.
+    """
+    cur = await conn.execute(
         """
-        SELECT e.date, e.value, e.category_name AS category, e.currency, e.message
-        FROM expenses e
-        WHERE e.user_id = ?
-        ORDER BY e.id DESC
+        SELECT j.value FROM json_each(?) j
+        WHERE NOT EXISTS (
+            SELECT 1 FROM user_categories uc
+            WHERE uc.user_id = ? AND uc.category_name = j.value
+        )
+        ORDER BY j.value
         """,
-        (user_id,),
+        (json.dumps(sorted(set(categories))), user_id),
     )
-    rows = await cursor.fetchall()
-    await cursor.close()
+    rows = await cur.fetchall()
+    await cur.close()
+    return [r[0] for r in rows]
+
+
+# Concurrent imports share the writer connection, hence its staging table
+_IMPORT_LOCK = asyncio.Lock()
+
+
+@retry_on_busy
+async def _import_chunk(
+    conn: aiosqlite.Connection, params: List[Tuple[Any, ...]]
+) -> int:
+    """
+    Stage the chunk with executemany, then move it into expenses with one
+    INSERT ... SELECT. Inserting row by row would make every row its own
+    statement, and FTS5 flushes its pending index at each statement
+    boundary inside the trigger: ~5x slower overall.
+    """
+    await conn.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS import_rows (
+            message_id, chat_id, user_id, date, amount_cents, category_name,
+            currency, message, line_no, amount_base_cents
+        )
+        """
+    )
+    await conn.execute("DELETE FROM temp.import_rows")
+    await conn.executemany(
+        "INSERT INTO temp.import_rows VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", params
+    )
+    cur = await conn.execute(
+        """
+        INSERT INTO expenses (message_id, chat_id, user_id, date, amount_cents, category_name, currency, message, line_no, amount_base_cents)
+        SELECT * FROM temp.import_rows WHERE true
+        ON CONFLICT (user_id, chat_id, message_id, line_no) DO NOTHING
+        """
+    )
+    inserted = cur.rowcount
+    await cur.close()
+    await commit(conn)
+    return inserted
+
+
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+async def import_expenses(
+    conn: aiosqlite.Connection,
+    user_id: int,
+    chat_id: int,
+    message_id: int,
+    rows: Sequence[ImportRow],
+    chunk_rows: int = IMPORT_CHUNK_ROWS,
+    progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+) -> int:
+    """
+    Insert parsed CSV rows (csv_import.parse_import_csv) as expenses of one
+    message, row index as line_no, committing every `chunk_rows`. Rows
+    already stored under that message are skipped, so an interrupted
+    import can simply be run again. Categories must have been checked with
+    missing_import_categories. `progress(done, total)` is awaited after
+    each chunk. Returns the number of rows inserted.
+    """
+    inserted = 0
+    for start in range(0, len(rows), chunk_rows):
+        params = [
+            (
+                message_id,
+                chat_id,
+                user_id,
+                date,
+                cents,
+                category,
+                currency,
+                message,
+                line_no,
+                fx_rates.to_base_cents(cents, currency, date),
+            )
+            for line_no, (date, cents, category, currency, message) in enumerate(
+                rows[start : start + chunk_rows], start=start
+            )
+        ]
+        async with _IMPORT_LOCK:
+            inserted += await _import_chunk(conn, params)
+        if progress is not None:
+            await progress(min(start + chunk_rows, len(rows)), len(rows))
+    return inserted
+
+
+# -----------------------------
+# Extraction cache
+# -----------------------------
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+async def get_cached_extraction(
+    conn: aiosqlite.Connection,
+    message_key: str,
+    categories_hash: str,
+    ttl_seconds: int,
+) -> Optional[Tuple[float, str, str]]:
+    """Return (value, category, currency) if cached and not older than ttl_seconds."""
+    cur = await conn.execute(
+        """
+        SELECT value, category_name, currency
+        FROM extraction_cache
+        WHERE message_key = ? AND categories_hash = ? AND created_at > ?
+        """,
+        (message_key, categories_hash, int(time.time()) - ttl_seconds),
+    )
+    row = await cur.fetchone()
+    await cur.close()
+    return (row[0], row[1], row[2]) if row else None
+
+
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+@retry_on_busy
+async def put_cached_extraction(
+    conn: aiosqlite.Connection,
+    message_key: str,
+    categories_hash: str,
+    value: float,
+    category: str,
+    currency: str,
+) -> None:
+    """Store an extraction. Old entries go in evict_extraction_cache."""
+    await conn.execute(
+        """
+        INSERT OR REPLACE INTO extraction_cache
+            (message_key, categories_hash, value, category_name, currency, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (message_key, categories_hash, value, category, currency, int(time.time())),
+    )
+    await commit(conn)
+
+
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+@retry_on_busy
+async def evict_extraction_cache(
+    conn: aiosqlite.Connection, ttl_seconds: int, max_rows: int
+) -> int:
+    """
+    Delete entries older than ttl_seconds and the oldest beyond max_rows
+    (entries sharing the cutoff second go too). Both steps are range scans
+    of idx_extraction_cache_created. Returns the number of rows deleted.
+    """
+    cutoff = int(time.time()) - ttl_seconds
+    cur = await conn.execute(
+        "SELECT created_at FROM extraction_cache ORDER BY created_at DESC LIMIT 1 OFFSET ?",
+        (max_rows,),
+    )
+    row = await cur.fetchone()
+    await cur.close()
+    if row is not None:
+        cutoff = max(cutoff, row[0])
+    cur = await conn.execute(
+        "DELETE FROM extraction_cache WHERE created_at <= ?", (cutoff,)
+    )
+    deleted = cur.rowcount
+    await cur.close()
+    await commit(conn)
+    return deleted
+
+
+# -----------------------------
+# Processed updates
+# -----------------------------
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+@retry_on_busy
+async def claim_update(
+    conn: aiosqlite.Connection, update_id: int, retention_seconds: int
+) -> bool:
+    """
+    Record update_id as processed. Returns False if it already was (a
+    Telegram redelivery). Entries older than retention_seconds are pruned.
+    """
+    now = int(time.time())
+    cur = await conn.execute(
+        "INSERT OR IGNORE INTO processed_updates (update_id, received_at) VALUES (?, ?)",
+        (update_id, now),
+    )
+    claimed = cur.rowcount > 0
+    await cur.close()
+    await conn.execute(
+        "DELETE FROM processed_updates WHERE received_at <= ?",
+        (now - retention_seconds,),
+    )
+    await commit(conn)
+    return claimed
+
+
+# -----------------------------
+# Full-text search
+# -----------------------------
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+async def search_expenses(
+    conn: aiosqlite.Connection, user_id: int, query: str, limit: int, offset: int = 0
+) -> List[ExpenseRow]:
+    """
+    The user's expenses whose message matches the FTS5 `query` (see
+    search_query.parse_search_args). The owner token narrows the match to
+    this user inside the index.
+
+    Ranked shortest message first, then newest. Expense messages are a few
+    words that rarely repeat, so this is the order bm25 gives (its length
+    normalization); bm25() itself scans every user's postings of each term
+    for its IDF, which grows with the whole table instead of this user's
+    matches.
+    """
+    cur = await conn.execute(
+        """
+        SELECT strftime('%Y-%m-%d %H:%M:%S', e.date, 'unixepoch'), e.amount_cents / 100.0,
+            e.category_name, e.currency, e.message
+        FROM expenses_fts
+        JOIN expenses e ON e.id = expenses_fts.rowid
+        WHERE expenses_fts MATCH ? AND e.user_id = ?
+        ORDER BY length(e.message), e.date DESC, e.id DESC
+        LIMIT ? OFFSET ?
+        """,
+        (f"message : ({query}) AND owner : u{int(user_id)}", user_id, limit, offset),
+    )
+    rows = await cur.fetchall()
+    await cur.close()
     return [
         ExpenseRow(date=r[0], value=r[1], category=r[2], currency=r[3], message=r[4])
         for r in rows
     ]
+
+
+# -----------------------------
+# Monthly totals
+# -----------------------------
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+async def get_monthly_summary(
+    conn: aiosqlite.Connection, user_id: int, month: str
+) -> List[Tuple[str, str, float, int]]:
+    """(category, currency, total, count) for a 'YYYY-MM' month, from the rollup."""
+    cur = await conn.execute(
+        """
+        SELECT category_name, currency, total_cents / 100.0, count
+        FROM expense_monthly_totals
+        WHERE user_id = ? AND month = ?
+        ORDER BY currency, total_cents DESC
+        """,
+        (user_id, month),
+    )
+    rows = await cur.fetchall()
+    await cur.close()
+    return [(r[0], r[1], r[2], r[3]) for r in rows]
+
+
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+async def get_monthly_base_total(
+    conn: aiosqlite.Connection, user_id: int, month: str
+) -> Tuple[float, int, int]:
+    """
+    (total in the base currency, expenses it covers, all expenses) for a
+    'YYYY-MM' month: one aggregate over the rollup, no conversions.
+    """
+    cur = await conn.execute(
+        """
+        SELECT COALESCE(SUM(total_base_cents), 0) / 100.0,
+            COALESCE(SUM(base_count), 0), COALESCE(SUM(count), 0)
+        FROM expense_monthly_totals
+        WHERE user_id = ? AND month = ?
+        """,
+        (user_id, month),
+    )
+    row = await cur.fetchone()
+    await cur.close()
+    return (row[0], row[1], row[2]) if row else (0.0, 0, 0)
+
+
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+async def get_monthly_totals(
+    conn: aiosqlite.Connection, user_id: int, month_from: str, month_to: str
+) -> List[Tuple[str, str, str, float]]:
+    """
+    (month, category, currency, total) for 'YYYY-MM' months in
+    [month_from, month_to], from the rollup (a range of its primary key).
+    """
+    cur = await conn.execute(
+        """
+        SELECT month, category_name, currency, total_cents / 100.0
+        FROM expense_monthly_totals
+        WHERE user_id = ? AND month BETWEEN ? AND ?
+        ORDER BY month, currency, total_cents DESC
+        """,
+        (user_id, month_from, month_to),
+    )
+    rows = await cur.fetchall()
+    await cur.close()
+    return [(r[0], r[1], r[2], r[3]) for r in rows]
+
+
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+async def get_data_version(conn: aiosqlite.Connection, user_id: int) -> int:
+    """users.data_version: changes whenever any of the user's expenses does."""
+    cur = await conn.execute(
+        "SELECT data_version FROM users WHERE user_id = ?", (user_id,)
+    )
+    row = await cur.fetchone()
+    await cur.close()
+    return row[0] if row else 0
+
+
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+@retry_on_busy
+async def rebuild_monthly_totals(conn: aiosqlite.Connection) -> None:
+    """Recompute the whole rollup from the expenses table."""
+    await conn.execute("DELETE FROM expense_monthly_totals")
+    await conn.execute(ROLLUP_BACKFILL)
+    await commit(conn)
+
+
+async def verify_monthly_totals(
+    conn: aiosqlite.Connection,
+) -> List[Tuple[int, str, str, str]]:
+    """Keys (user_id, month, category, currency) where the rollup disagrees with expenses."""
+    cur = await conn.execute(
+        """
+        WITH raw AS (
+            SELECT user_id, strftime('%Y-%m', date, 'unixepoch') AS month, category_name,
+                currency, SUM(amount_cents) AS total_cents, COUNT(*) AS count,
+                COALESCE(SUM(amount_base_cents), 0) AS total_base_cents,
+                COUNT(amount_base_cents) AS base_count
+            FROM expenses
+            GROUP BY 1, 2, 3, 4
+        )
+        SELECT r.user_id, r.month, r.category_name, r.currency
+        FROM raw r
+        LEFT JOIN expense_monthly_totals t USING (user_id, month, category_name, currency)
+        WHERE t.count IS NULL OR t.count != r.count OR t.total_cents != r.total_cents
+            OR t.total_base_cents != r.total_base_cents OR t.base_count != r.base_count
+        UNION
+        SELECT t.user_id, t.month, t.category_name, t.currency
+        FROM expense_monthly_totals t
+        LEFT JOIN raw r USING (user_id, month, category_name, currency)
+        WHERE r.count IS NULL
+        """
+    )
+    rows = await cur.fetchall()
+    await cur.close()
+    return [(r[0], r[1], r[2], r[3]) for r in rows]
+
+
+# -----------------------------
+# Exchange rates
+# -----------------------------
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+@retry_on_busy
+async def import_fx_rates(conn: aiosqlite.Connection, rows: List[RateRow]) -> int:
+    """Upsert (currency, date, rate) rows; returns how many were new or changed."""
+    before = conn.total_changes
+    await conn.executemany(
+        """
+        INSERT INTO fx_rates (currency, date, rate) VALUES (?, ?, ?)
+        ON CONFLICT (currency, date) DO UPDATE SET rate = excluded.rate
+        WHERE rate != excluded.rate
+        """,
+        rows,
+    )
+    await commit(conn)
+    return conn.total_changes - before
+
+
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+async def get_fx_rates(conn: aiosqlite.Connection) -> List[RateRow]:
+    cur = await conn.execute("SELECT currency, date, rate FROM fx_rates")
+    rows = await cur.fetchall()
+    await cur.close()
+    return [(r[0], r[1], r[2]) for r in rows]
+
+
+@metrics.timed(DB_SECONDS, DB_ERRORS)
+@retry_on_busy
+async def backfill_base_amounts(
+    conn: aiosqlite.Connection, base: str, reset: bool = False
+) -> int:
+    """
+    Fill amount_base_cents for expenses stored before a rate covered their
+    day, from the latest fx_rates row on or before it. Rows still without
+    a rate are left untouched, so a run with nothing new to do writes
+    nothing. `reset` recomputes every row (after changing the base
+    currency or correcting past rates).
+    """
+    if reset:
+        await conn.execute(
+            "UPDATE expenses SET amount_base_cents = NULL WHERE amount_base_cents IS NOT NULL"
+        )
+    rate = """
+        SELECT r.rate FROM fx_rates r
+        WHERE r.currency = expenses.currency
+            AND r.date <= date(expenses.date, 'unixepoch')
+        ORDER BY r.date DESC LIMIT 1
+    """
+    cur = await conn.execute(
+        f"""
+        UPDATE expenses
+        SET amount_base_cents = CASE WHEN currency = ? THEN amount_cents
+            ELSE CAST(round(amount_cents * ({rate})) AS INTEGER) END
+        WHERE amount_base_cents IS NULL
+            AND (currency = ? OR EXISTS ({rate}))
+        """,
+        (base, base),
+    )
+    updated = cur.rowcount
+    await cur.close()
+    await commit(conn)
+    return updated
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+
+    async def _main(action: str, path: str) -> None:
+        conn = await aiosqlite.connect(path)
+        try:
+            if action == "rebuild":
+                await rebuild_monthly_totals(conn)
+            mismatches = await verify_monthly_totals(conn)
+            print(f"{len(mismatches)} mismatching rollup rows")
+            for row in mismatches:
+                print(row)
+        finally:
+            await conn.close()
+
+    # python -m src.db verify|rebuild /var/lib/bot/bot.db
+    asyncio.run(_main(sys.argv[1], sys.argv[2]))
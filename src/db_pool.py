@@ -0,0 +1,83 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+import aiosqlite
+
+from src.db import init_db
+
+# How long a connection waits for another process's lock before SQLITE_BUSY
+DB_BUSY_TIMEOUT_MS = float(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+
+
+class DBPool:
+    """
+    One writer connection plus `readers` read-only connections on the same
+    WAL database. Writes go through `writer`; reads borrow a connection with
+    `async with pool.reader() as conn`, so long reports never queue behind
+    inserts on the writer's thread.
+
+    Several processes may open pools on the same file. The writer starts
+    its transactions with BEGIN IMMEDIATE, so it takes the write lock (and
+    waits up to DB_BUSY_TIMEOUT_MS for it) before its first statement rather
+    than failing to upgrade a read snapshot another process already wrote
+    past.
+    """
+
+    def __init__(self, path: str, readers: int = 3):
+        self.path = path
+        self.size = readers
+        self.writer: aiosqlite.Connection
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle: Optional["asyncio.Queue[aiosqlite.Connection]"] = None
+        self.acquired = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    async def open(self) -> None:
+        timeout = DB_BUSY_TIMEOUT_MS / 1000
+        self.writer = await aiosqlite.connect(
+            self.path, timeout=timeout, isolation_level="IMMEDIATE"
+        )
+        await init_db(self.writer)  # also switches the file to WAL
+
+        self._idle = asyncio.Queue()
+        uri = f"{Path(self.path).absolute().as_uri()}?mode=ro"
+        for _ in range(self.size):
+            conn = await aiosqlite.connect(uri, uri=True, timeout=timeout)
+            self._readers.append(conn)
+            self._idle.put_nowait(conn)
+
+    async def close(self) -> None:
+        for conn in self._readers:
+            await conn.close()
+        self._readers.clear()
+        await self.writer.close()
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        assert self._idle is not None, "DBPool.open() was not awaited"
+        start = time.perf_counter()
+        conn = await self._idle.get()
+        waited = time.perf_counter() - start
+        self.acquired += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "readers": self.size,
+            "readers_idle": self._idle.qsize() if self._idle else 0,
+            "acquired": self.acquired,
+            "wait_seconds_avg": (
+                self.wait_seconds_total / self.acquired if self.acquired else 0.0
+            ),
+            "wait_seconds_max": self.wait_seconds_max,
+        }
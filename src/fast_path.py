@@ -0,0 +1,322 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+import unicodedata
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence, cast
+
+from src.db import (
+    evict_extraction_cache,
+    get_cached_extraction,
+    put_cached_extraction,
+)
+from src.db_pool import DBPool
+from src.fx_rates import CURRENCY_ALIASES, DEFAULT_CURRENCY
+from src.llm_batcher import batched_llm_call
+from src.llm_call import ExpenseExtraction, async_llm_call_many
+
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "1") == "1"
+EXTRACTION_CACHE_TTL_SECONDS = int(
+    os.getenv("EXTRACTION_CACHE_TTL_SECONDS", str(30 * 24 * 3600))
+)
+EXTRACTION_CACHE_MAX_ROWS = int(os.getenv("EXTRACTION_CACHE_MAX_ROWS", "10000"))
+# Expired and excess entries are evicted on the first cache write and then
+# once every this many, not on each one
+EXTRACTION_CACHE_EVICT_EVERY = int(os.getenv("EXTRACTION_CACHE_EVICT_EVERY", "100"))
+
+# Normalized keyword -> normalized category name. Only used when the user
+# actually has that category.
+CATEGORY_KEYWORDS: Dict[str, str] = {
+    "cafe": "SALIR A COMER",
+    "almuerzo": "SALIR A COMER",
+    "cena": "SALIR A COMER",
+    "restaurante": "SALIR A COMER",
+    "resto": "SALIR A COMER",
+    "mc": "SALIR A COMER",
+    "rappi": "COMIDA A DOMICILIO",
+    "pedidosya": "COMIDA A DOMICILIO",
+    "delivery": "COMIDA A DOMICILIO",
+    "super": "SUPERMERCADO",
+    "coto": "SUPERMERCADO",
+    "carrefour": "SUPERMERCADO",
+    "jumbo": "SUPERMERCADO",
+    "sube": "TRANSPORTE PUBLICO",
+    "colectivo": "TRANSPORTE PUBLICO",
+    "bondi": "TRANSPORTE PUBLICO",
+    "subte": "TRANSPORTE PUBLICO",
+    "tren": "TRANSPORTE PUBLICO",
+    "uber": "TAXI",
+    "ubi": "TAXI",
+    "cabify": "TAXI",
+    "didi": "TAXI",
+    "luz": "ELECTRICIDAD",
+    "edenor": "ELECTRICIDAD",
+    "edesur": "ELECTRICIDAD",
+    "metrogas": "GAS",
+    "wifi": "INTERNET",
+    "celular": "TELEFONO",
+    "chatgpt": "CHATBOT",
+    "gym": "GIMNASIO",
+    "farmacia": "SALUD",
+    "medico": "SALUD",
+    "regalo": "REGALOS",
+    "zapatillas": "ROPA",
+    "vuelo": "VIAJES",
+    "hotel": "VIAJES",
+}
+
+_NUMBER = re.compile(
+    r"^(?P<pre>u\$s|us\$|\$|€)?"
+    r"(?P<num>\d{1,3}(?:[.,]\d{3})+(?:[.,]\d{1,2})?|\d+(?:[.,]\d{1,2})?)"
+    r"(?P<post>usd|ars|eur|€|\$)?$"
+)
+_TOKEN_STRIP = "¡!¿?()[]\"'"
+# Shortest singular a plural category name may match: 'regalo' for REGALOS,
+# 'otro' for OTROS, but not 'ga' for GAS
+_MIN_SINGULAR_LEN = 4
+
+
+def normalize(text: str) -> str:
+    """Lowercase and drop accents: 'Café' -> 'cafe'."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def parse_amount(num: str) -> float:
+    """Parse '799,99', '20.5', '1.500' or '1.500,50' into a float."""
+    if "." in num and "," in num:
+        decimal_sep = "." if num.rfind(".") > num.rfind(",") else ","
+        thousands_sep = "," if decimal_sep == "." else "."
+        return float(num.replace(thousands_sep, "").replace(decimal_sep, "."))
+    for sep in ".,":
+        if sep in num:
+            # A single separator followed by exactly three digits is a
+            # thousands separator ('1.500'); otherwise it is decimal.
+            if num.count(sep) > 1 or len(num) - num.rfind(sep) - 1 == 3:
+                return float(num.replace(sep, ""))
+            return float(num.replace(sep, "."))
+    return float(num)
+
+
+def fast_parse_expense(
+    message: str, categories: Sequence[str]
+) -> Optional[ExpenseExtraction]:
+    """
+    Extract the expense without the LLM when the message is unambiguous:
+    exactly one amount, at most one currency and exactly one matching
+    category. Returns None when confidence is low.
+    """
+    by_normalized = {normalize(c).upper(): c for c in categories}
+    amounts: List[float] = []
+    currencies = set()
+    matched = set()
+
+    words = [w.strip(_TOKEN_STRIP) for w in normalize(message).split()]
+    text = " ".join(words)
+    for word in words:
+        m = _NUMBER.match(word)
+        if m:
+            amounts.append(parse_amount(m.group("num")))
+            for affix in (m.group("pre"), m.group("post")):
+                if affix:
+                    currencies.add(CURRENCY_ALIASES[affix])
+            continue
+        if word in CURRENCY_ALIASES:
+            currencies.add(CURRENCY_ALIASES[word])
+        keyword_category = CATEGORY_KEYWORDS.get(word)
+        if keyword_category in by_normalized:
+            matched.add(by_normalized[keyword_category])
+
+    padded = f" {text} "
+    for norm_name, category in by_normalized.items():
+        name = norm_name.lower()
+        singular = name[:-1] if name.endswith("s") else ""
+        if f" {name} " in padded or (
+            len(singular) >= _MIN_SINGULAR_LEN and f" {singular} " in padded
+        ):
+            matched.add(category)
+
+    if len(amounts) != 1 or amounts[0] <= 0:
+        return None
+    if len(currencies) > 1 or len(matched) != 1:
+        return None
+    return ExpenseExtraction(
+        value=amounts[0],
+        category=matched.pop(),
+        currency=currencies.pop() if currencies else DEFAULT_CURRENCY,
+    )
+
+
+def message_cache_key(message: str) -> str:
+    return " ".join(normalize(message).split())
+
+
+def categories_hash(categories: Sequence[str]) -> str:
+    return hashlib.sha1("\n".join(sorted(categories)).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class FastPathStats:
+    hits: int = 0
+    cache_hits: int = 0
+    misses: int = 0
+    cache_writes: int = 0
+    fast_seconds: float = 0.0
+    cache_seconds: float = 0.0
+    llm_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.cache_hits + self.misses
+        return (self.hits + self.cache_hits) / total if total else 0.0
+
+    @property
+    def seconds_saved(self) -> float:
+        """Estimated from the mean latency of the LLM calls actually made."""
+        if not self.misses:
+            return 0.0
+        avg_llm = self.llm_seconds / self.misses
+        spent = self.fast_seconds + self.cache_seconds
+        return max(0.0, (self.hits + self.cache_hits) * avg_llm - spent)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            **asdict(self),
+            "hit_rate": self.hit_rate,
+            "seconds_saved": self.seconds_saved,
+        }
+
+
+fast_path_stats = FastPathStats()
+
+
+async def _extract_locally(
+    message: str,
+    categories: Sequence[str],
+    pool: Optional[DBPool],
+) -> Optional[ExpenseExtraction]:
+    if FAST_PATH_ENABLED:
+        start = time.perf_counter()
+        parsed = fast_parse_expense(message, categories)
+        fast_path_stats.fast_seconds += time.perf_counter() - start
+        if parsed is not None:
+            fast_path_stats.hits += 1
+            return parsed
+
+    if pool is not None:
+        start = time.perf_counter()
+        async with pool.reader() as conn:
+            cached = await get_cached_extraction(
+                conn,
+                message_cache_key(message),
+                categories_hash(categories),
+                EXTRACTION_CACHE_TTL_SECONDS,
+            )
+        fast_path_stats.cache_seconds += time.perf_counter() - start
+        if cached is not None:
+            fast_path_stats.cache_hits += 1
+            value, category, currency = cached
+            return ExpenseExtraction(value=value, category=category, currency=currency)
+    return None
+
+
+async def _remember(
+    pool: DBPool,
+    message: str,
+    categories: Sequence[str],
+    result: ExpenseExtraction,
+) -> None:
+    await put_cached_extraction(
+        pool.writer,
+        message_cache_key(message),
+        categories_hash(categories),
+        value=result.value,
+        category=result.category,
+        currency=result.currency,
+    )
+    fast_path_stats.cache_writes += 1
+    if (fast_path_stats.cache_writes - 1) % EXTRACTION_CACHE_EVICT_EVERY == 0:
+        await evict_extraction_cache(
+            pool.writer,
+            ttl_seconds=EXTRACTION_CACHE_TTL_SECONDS,
+            max_rows=EXTRACTION_CACHE_MAX_ROWS,
+        )
+
+
+async def extract_expense(
+    message: str,
+    categories: Sequence[str],
+    pool: Optional[DBPool] = None,
+) -> ExpenseExtraction:
+    """
+    Fast path first, then the persistent extraction cache (when a pool
+    is given), and the LLM only when neither has an answer.
+    """
+    local = await _extract_locally(message, categories, pool)
+    if local is not None:
+        return local
+
+    start = time.perf_counter()
+    result = await batched_llm_call(message, categories)
+    fast_path_stats.misses += 1
+    fast_path_stats.llm_seconds += time.perf_counter() - start
+
+    if pool is not None:
+        await _remember(pool, message, categories, result)
+    return result
+
+
+async def extract_expenses(
+    messages: Sequence[str],
+    categories: Sequence[str],
+    pool: Optional[DBPool] = None,
+) -> List[ExpenseExtraction]:
+    """
+    Like extract_expense for several messages at once: whatever the fast
+    path and cache cannot answer goes to the LLM in a single request.
+    """
+    results: List[Optional[ExpenseExtraction]] = [
+        await _extract_locally(m, categories, pool) for m in messages
+    ]
+    pending = [i for i, r in enumerate(results) if r is None]
+    if not pending:
+        return cast(List[ExpenseExtraction], results)
+
+    start = time.perf_counter()
+    if len(pending) == 1:
+        extracted = [await batched_llm_call(messages[pending[0]], categories)]
+    else:
+        try:
+            extracted = await async_llm_call_many(
+                [messages[i] for i in pending], categories
+            )
+        except ValueError:
+            extracted = list(
+                await asyncio.gather(
+                    *(batched_llm_call(messages[i], categories) for i in pending)
+                )
+            )
+    fast_path_stats.misses += len(pending)
+    fast_path_stats.llm_seconds += time.perf_counter() - start
+
+    for i, result in zip(pending, extracted):
+        results[i] = result
+        if pool is not None:
+            await _remember(pool, messages[i], categories, result)
+    return cast(List[ExpenseExtraction], results)
+
+
+if __name__ == "__main__":
+
+    from src.base_categories import BASE_CATEGORIES
+
+    for message in [
+        "netflix 799,99",
+        "cafe en la facu 150",
+        "20.5 USD regalo",
+        "super coto 1.500,50",
+        "ubi x laburo",
+    ]:
+        print(f"{message!r}: {fast_parse_expense(message, BASE_CATEGORIES)}")
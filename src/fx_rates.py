@@ -0,0 +1,156 @@
+"""
+Exchange rates into BASE_CURRENCY, so amounts in different currencies can
+be summed in SQL.
+
+Rates come from a local CSV (FX_RATES_PATH) with `date,currency,rate`
+rows, where rate is BASE_CURRENCY units per 1 unit of currency on that
+day. Startup imports the file into the fx_rates table and loads that
+table into an in-memory index, which add_expense uses to store each
+expense's amount_base_cents at insert time. The rate for a day is the
+latest one published on or before it.
+"""
+
+import csv
+import functools
+import math
+import os
+import unicodedata
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_CURRENCY = "ARS"
+BASE_CURRENCY = os.getenv("BASE_CURRENCY", DEFAULT_CURRENCY).strip().upper()
+FX_RATES_PATH = os.getenv("FX_RATES_PATH", "")
+
+CURRENCY_ALIASES: Dict[str, str] = {
+    "ars": "ARS",
+    "peso": "ARS",
+    "pesos": "ARS",
+    "$": "ARS",
+    "usd": "USD",
+    "u$s": "USD",
+    "us$": "USD",
+    "dolar": "USD",
+    "dolares": "USD",
+    "eur": "EUR",
+    "euro": "EUR",
+    "euros": "EUR",
+    "€": "EUR",
+    "brl": "BRL",
+    "reales": "BRL",
+}
+
+# (currency, 'YYYY-MM-DD', rate)
+RateRow = Tuple[str, str, float]
+
+
+@functools.lru_cache(maxsize=256)
+def normalize_currency(text: str) -> str:
+    """Free-text currency (LLM or user) to a code: 'dólares' -> 'USD'."""
+    folded = "".join(
+        c
+        for c in unicodedata.normalize("NFKD", text.strip().lower())
+        if not unicodedata.combining(c)
+    )
+    return CURRENCY_ALIASES.get(folded, folded.upper() or DEFAULT_CURRENCY)
+
+
+def read_rates_file(path: str) -> List[RateRow]:
+    """Rows of a `date,currency,rate` CSV (header optional)."""
+    rows: List[RateRow] = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for line_no, record in enumerate(csv.reader(f), start=1):
+            if not record or record[0].strip().lower() == "date":
+                continue
+            try:
+                day = date.fromisoformat(record[0].strip()).isoformat()
+                rate = float(record[2])
+            except (IndexError, ValueError):
+                raise ValueError(f"{path}:{line_no}: expected date,currency,rate")
+            if rate <= 0:
+                raise ValueError(f"{path}:{line_no}: rate must be positive")
+            rows.append((normalize_currency(record[1]), day, rate))
+    return rows
+
+
+class FxRates:
+    """
+    (currency, day) -> rate, forward-filled daily between a currency's
+    first and last published dates so every lookup is one dict access.
+    Days after the last published date use the latest rate; days before
+    the first have none.
+    """
+
+    def __init__(self, base: str):
+        self.base = base
+        self._rates: Dict[Tuple[str, str], float] = {}
+        self._latest: Dict[str, Tuple[str, float]] = {}
+
+    def load(self, rows: Iterable[RateRow]) -> None:
+        by_currency: Dict[str, List[Tuple[str, float]]] = {}
+        for currency, day, rate in rows:
+            by_currency.setdefault(currency, []).append((day, rate))
+        rates: Dict[Tuple[str, str], float] = {}
+        latest: Dict[str, Tuple[str, float]] = {}
+        for currency, published in by_currency.items():
+            published.sort()
+            for (day, rate), following in zip(published, published[1:] + [None]):
+                current = date.fromisoformat(day)
+                until = date.fromisoformat(following[0]) if following else current
+                while True:
+                    rates[(currency, current.isoformat())] = rate
+                    current += timedelta(days=1)
+                    if current >= until:
+                        break
+            latest[currency] = published[-1]
+        self._rates, self._latest = rates, latest
+
+    def rate(self, currency: str, day: str) -> Optional[float]:
+        if currency == self.base:
+            return 1.0
+        rate = self._rates.get((currency, day))
+        if rate is None:
+            latest = self._latest.get(currency)
+            if latest is not None and day > latest[0]:
+                return latest[1]
+        return rate
+
+    def to_base_cents(self, cents: int, currency: str, epoch: int) -> Optional[int]:
+        """`cents` of `currency` on the UTC day of `epoch`, in base cents."""
+        day = datetime.fromtimestamp(epoch, timezone.utc).date().isoformat()
+        rate = self.rate(currency, day)
+        if rate is None:
+            return None
+        # Half away from zero, like SQLite's round() in backfill_base_amounts
+        return int(math.copysign(math.floor(abs(cents * rate) + 0.5), cents))
+
+    def stats(self) -> Dict[str, float]:
+        return {"currencies": len(self._latest), "days": len(self._rates)}
+
+
+fx_rates = FxRates(BASE_CURRENCY)
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+
+    import aiosqlite
+
+    from src.db import backfill_base_amounts, import_fx_rates, init_db
+
+    async def _main(args: List[str]) -> None:
+        reset = args[0] == "renormalize"
+        conn = await aiosqlite.connect(args[-1])
+        try:
+            await init_db(conn)
+            if args[0] == "load":
+                print(f"{await import_fx_rates(conn, read_rates_file(args[1]))} rates")
+            updated = await backfill_base_amounts(conn, BASE_CURRENCY, reset=reset)
+            print(f"{updated} expenses normalized to {BASE_CURRENCY}")
+        finally:
+            await conn.close()
+
+    # python -m src.fx_rates load rates.csv /var/lib/bot/bot.db
+    # python -m src.fx_rates renormalize /var/lib/bot/bot.db  (after changing BASE_CURRENCY)
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+import aiosqlite
+
+from src import metrics
+
+COMMIT_SECONDS = metrics.histogram(
+    "bot_db_commit_seconds",
+    "Time a writer waits for its commit (group: window + shared fsync)",
+    ("mode",),
+)
+
+
+class GroupCommit:
+    """
+    Coalesces commits on one connection: writers that call `commit()` within
+    `max_latency_ms` of each other share a single COMMIT (and fsync). Each
+    caller returns only after the commit that covers its writes succeeded.
+
+    Works because every helper writes through the same connection, so their
+    statements already live in the same open transaction until COMMIT.
+    """
+
+    def __init__(
+        self, conn: aiosqlite.Connection, max_latency_ms: float, max_batch: int = 256
+    ):
+        self.conn = conn
+        self.max_latency = max_latency_ms / 1000
+        self.max_batch = max_batch
+        self.commits = 0
+        self.writes = 0
+        self._waiters: List["asyncio.Future[None]"] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def commit(self) -> None:
+        loop = asyncio.get_running_loop()
+        fut: "asyncio.Future[None]" = loop.create_future()
+        self._waiters.append(fut)
+        if len(self._waiters) >= self.max_batch:
+            self._flush_soon()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_latency, self._flush_soon)
+        await fut
+
+    def _flush_soon(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        waiters, self._waiters = self._waiters, []
+        if waiters:
+            asyncio.create_task(self._flush(waiters))
+
+    async def _flush(self, waiters: List["asyncio.Future[None]"]) -> None:
+        try:
+            await self.conn.commit()
+        except Exception as e:
+            for fut in waiters:
+                fut.set_exception(e)
+            return
+        self.commits += 1
+        self.writes += len(waiters)
+        for fut in waiters:
+            fut.set_result(None)
+
+
+_group_commits: Dict[aiosqlite.Connection, GroupCommit] = {}
+
+
+def enable_group_commit(
+    conn: aiosqlite.Connection, max_latency_ms: float, max_batch: int = 256
+) -> GroupCommit:
+    group = GroupCommit(conn, max_latency_ms, max_batch)
+    _group_commits[conn] = group
+    return group
+
+
+def disable_group_commit(conn: aiosqlite.Connection) -> None:
+    _group_commits.pop(conn, None)
+
+
+async def commit(conn: aiosqlite.Connection) -> None:
+    """Commit now, or join the pending group commit if one is enabled."""
+    start = time.perf_counter()
+    group = _group_commits.get(conn)
+    if group is None:
+        await conn.commit()
+        COMMIT_SECONDS.observe(time.perf_counter() - start, "direct")
+    else:
+        await group.commit()
+        COMMIT_SECONDS.observe(time.perf_counter() - start, "group")
+
+
+async def end_failed_write(conn: aiosqlite.Connection) -> None:
+    """
+    Close the transaction a failed write left open, so the write lock isn't
+    held (blocking other processes) until some later write commits. SQLite
+    already undid the failing statement. Without group commit the
+    transaction only holds the caller's earlier statements, which are
+    rolled back; with it, it may also hold other writers' changes waiting
+    for the shared COMMIT, so it is committed along with them instead.
+    """
+    if not conn.in_transaction:
+        return
+    group = _group_commits.get(conn)
+    if group is None:
+        await conn.rollback()
+    else:
+        await group.commit()
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List, Sequence, Tuple, Union
+
+from src.llm_call import ExpenseExtraction, async_llm_call, async_llm_call_many
+
+LLM_BATCH_WINDOW_MS = int(os.getenv("LLM_BATCH_WINDOW_MS", "0"))  # 0 disables
+LLM_BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", "10"))
+
+logger = logging.getLogger(__name__)
+
+_Pending = List[Tuple[str, "asyncio.Future[ExpenseExtraction]"]]
+
+
+def _settle(
+    fut: "asyncio.Future[ExpenseExtraction]",
+    outcome: Union[ExpenseExtraction, BaseException],
+) -> None:
+    """Resolve a submitter's future, unless it was cancelled meanwhile."""
+    if fut.done():
+        return
+    if isinstance(outcome, BaseException):
+        fut.set_exception(outcome)
+    else:
+        fut.set_result(outcome)
+
+
+class LLMBatcher:
+    """
+    Collects extractions that arrive within `window_seconds` (up to
+    `max_size`) for the same category set and resolves them with a single
+    structured request. Falls back to one call per message if the batch
+    request fails or returns the wrong number of items.
+    """
+
+    def __init__(self, window_seconds: float, max_size: int):
+        self.window_seconds = window_seconds
+        self.max_size = max_size
+        self.requests = 0
+        self.messages = 0
+        self._pending: Dict[Tuple[str, ...], _Pending] = {}
+        self._timers: Dict[Tuple[str, ...], asyncio.TimerHandle] = {}
+
+    async def submit(
+        self, message: str, categories: Sequence[str]
+    ) -> ExpenseExtraction:
+        loop = asyncio.get_running_loop()
+        key = tuple(categories)
+        fut: "asyncio.Future[ExpenseExtraction]" = loop.create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((message, fut))
+        if len(batch) >= self.max_size:
+            self._flush(key)
+        elif len(batch) == 1:
+            self._timers[key] = loop.call_later(self.window_seconds, self._flush, key)
+        return await fut
+
+    def _flush(self, key: Tuple[str, ...]) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        if batch:
+            asyncio.create_task(self._run(key, batch))
+
+    async def _run(self, key: Tuple[str, ...], batch: _Pending) -> None:
+        messages = [m for m, _ in batch]
+        self.requests += 1
+        self.messages += len(messages)
+        try:
+            if len(messages) == 1:
+                results = [await async_llm_call(messages[0], key)]
+            else:
+                results = await async_llm_call_many(messages, key)
+        except Exception as e:
+            if len(messages) == 1:
+                _settle(batch[0][1], e)
+                return
+            logger.warning("Batch of %d failed, retrying one by one: %s", len(batch), e)
+            self.requests += len(messages)
+            singles = await asyncio.gather(
+                *(async_llm_call(m, key) for m in messages), return_exceptions=True
+            )
+            for (_, fut), single in zip(batch, singles):
+                _settle(fut, single)
+            return
+        for (_, fut), result in zip(batch, results):
+            _settle(fut, result)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "messages": self.messages,
+            "pending": sum(len(batch) for batch in self._pending.values()),
+        }
+
+
+llm_batcher = LLMBatcher(LLM_BATCH_WINDOW_MS / 1000, LLM_BATCH_MAX_SIZE)
+
+
+async def batched_llm_call(
+    message: str, categories: Sequence[str]
+) -> ExpenseExtraction:
+    """async_llm_call, micro-batched when LLM_BATCH_WINDOW_MS > 0."""
+    if LLM_BATCH_WINDOW_MS > 0:
+        return await llm_batcher.submit(message, categories)
+    return await async_llm_call(message, categories)
@@ -1,12 +1,40 @@
+import asyncio
 import os
-from typing import List, Literal, cast
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Literal, NamedTuple, Sequence, Tuple
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from pydantic import BaseModel, Field, create_model
 
+from src import metrics
+
 load_dotenv()
+LLM_MODEL = "gpt-4.1-mini"  # "gpt-5-mini",
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+LLM_SPEC_CACHE_SIZE = int(os.getenv("LLM_SPEC_CACHE_SIZE", "256"))
+
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Shared async client: one connection pool for every handler on the event loop.
+async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Bounds in-flight requests so a burst of messages cannot exhaust the pool
+# or the OpenAI rate limit; extra callers wait their turn.
+_llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+LLM_SECONDS = metrics.histogram(
+    "bot_llm_request_seconds", "OpenAI request latency", ("call",)
+)
+LLM_WAIT_SECONDS = metrics.histogram(
+    "bot_llm_slot_wait_seconds", "Time waiting for an LLM concurrency slot"
+)
+LLM_ERRORS = metrics.counter(
+    "bot_llm_errors_total", "Failed OpenAI requests", ("call",)
+)
+LLM_TOKENS = metrics.counter(
+    "bot_llm_tokens_total", "Tokens reported by OpenAI usage", ("kind",)
+)
 
 
 class ExpenseExtraction(BaseModel):
@@ -38,23 +66,173 @@ def create_context(categories: List[str]) -> str:
     """
 
 
-def llm_call(message: str, categories: List[str]) -> ExpenseExtraction:
-    RuntimeModel = make_expense_model(categories)
-    context = create_context(categories)
-    response = client.responses.parse(
-        model="gpt-4.1-mini",  # "gpt-5-mini",
-        input=[
-            {"role": "system", "content": context},
-            {"role": "user", "content": message},
-        ],
-        text_format=RuntimeModel,
+def make_expense_batch_model(RuntimeModel: type[BaseModel]) -> type[BaseModel]:
+    return create_model(
+        "ExpenseExtractionBatch",
+        items=(
+            List[RuntimeModel],  # type: ignore[valid-type]
+            Field(description="Un gasto por mensaje, en el mismo orden"),
+        ),
+        __base__=BaseModel,
+    )
+
+
+def create_batch_context(categories: List[str]) -> str:
+    return (
+        create_context(categories)
+        + """Vas a recibir varios mensajes numerados, cada uno es un gasto distinto.
+    Devolvé exactamente un elemento en "items" por mensaje, en el mismo orden.
+    """
+    )
+
+
+def _strict(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Structured Outputs' strict mode: every object lists all its properties
+    as required and allows no others. Fields with a default stay in the
+    schema, the model just always fills them in.
+    """
+    if schema.get("type") == "object":
+        schema["additionalProperties"] = False
+        schema["required"] = list(schema.get("properties", {}))
+    for value in schema.values():
+        for sub in value if isinstance(value, list) else [value]:
+            if isinstance(sub, dict):
+                _strict(sub)
+    return schema
+
+
+def text_format(model: type[BaseModel]) -> Dict[str, Any]:
+    """`text.format` for a Responses API request answered as `model`."""
+    return {
+        "type": "json_schema",
+        "strict": True,
+        "name": model.__name__,
+        "schema": _strict(model.model_json_schema()),
+    }
+
+
+class ExtractionSpec(NamedTuple):
+    """Everything llm_call needs for one category set, built once."""
+
+    model: type[BaseModel]
+    text_format: Dict[str, Any]  # strict JSON schema sent as `text.format`
+    context: str
+    batch_model: type[BaseModel]
+    batch_text_format: Dict[str, Any]
+    batch_context: str
+
+
+@lru_cache(maxsize=LLM_SPEC_CACHE_SIZE)
+def get_extraction_spec(categories: Tuple[str, ...]) -> ExtractionSpec:
+    """
+    Cached per category set; `get_extraction_spec.cache_info()` exposes the
+    hit/miss counters.
+    """
+    RuntimeModel = make_expense_model(list(categories))
+    BatchModel = make_expense_batch_model(RuntimeModel)
+    return ExtractionSpec(
+        model=RuntimeModel,
+        text_format=text_format(RuntimeModel),
+        context=create_context(list(categories)),
+        batch_model=BatchModel,
+        batch_text_format=text_format(BatchModel),
+        batch_context=create_batch_context(list(categories)),
+    )
+
+
+def _build_input(spec: ExtractionSpec, message: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": spec.context},
+        {"role": "user", "content": message},
+    ]
+
+
+def _parse_output(spec: ExtractionSpec, output_text: str) -> ExpenseExtraction:
+    expense_extraction = spec.model.model_validate_json(output_text)
+    return ExpenseExtraction(**expense_extraction.model_dump())
+
+
+def _record_usage(response: Any) -> None:
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        LLM_TOKENS.inc("input", amount=usage.input_tokens)
+        LLM_TOKENS.inc("output", amount=usage.output_tokens)
+
+
+async def _create(call: str, **kwargs: Any) -> Any:
+    """responses.create behind the concurrency slot, with latency/usage metrics."""
+    start = time.perf_counter()
+    async with _llm_semaphore:
+        LLM_WAIT_SECONDS.observe(time.perf_counter() - start)
+        start = time.perf_counter()
+        try:
+            response = await async_client.responses.create(
+                timeout=LLM_TIMEOUT_SECONDS, **kwargs
+            )
+        except Exception:
+            LLM_ERRORS.inc(call)
+            raise
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - start, call)
+    _record_usage(response)
+    return response
+
+
+def llm_call(message: str, categories: Sequence[str]) -> ExpenseExtraction:
+    spec = get_extraction_spec(tuple(categories))
+    start = time.perf_counter()
+    try:
+        response = client.responses.create(  # type: ignore[call-overload]
+            model=LLM_MODEL,
+            input=_build_input(spec, message),
+            text={"format": spec.text_format},
+        )
+    except Exception:
+        LLM_ERRORS.inc("sync")
+        raise
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - start, "sync")
+    _record_usage(response)
+    return _parse_output(spec, response.output_text)
+
+
+async def async_llm_call(message: str, categories: Sequence[str]) -> ExpenseExtraction:
+    """Non-blocking llm_call: waits for a concurrency slot, then for the API
+    with a per-call timeout (raises openai.APITimeoutError when exceeded)."""
+    spec = get_extraction_spec(tuple(categories))
+    response = await _create(
+        "single",
+        model=LLM_MODEL,
+        input=_build_input(spec, message),
+        text={"format": spec.text_format},
     )
+    return _parse_output(spec, response.output_text)
 
-    expense_extraction = response.output_parsed
-    assert isinstance(expense_extraction, RuntimeModel)
 
-    parsed = ExpenseExtraction(**expense_extraction.model_dump())
-    return cast(ExpenseExtraction, parsed)
+async def async_llm_call_many(
+    messages: Sequence[str], categories: Sequence[str]
+) -> List[ExpenseExtraction]:
+    """
+    Extract several messages with one request. Raises ValueError if the
+    model does not return exactly one item per message.
+    """
+    spec = get_extraction_spec(tuple(categories))
+    numbered = "\n".join(f"{i}. {m}" for i, m in enumerate(messages, start=1))
+    response = await _create(
+        "many",
+        model=LLM_MODEL,
+        input=[
+            {"role": "system", "content": spec.batch_context},
+            {"role": "user", "content": numbered},
+        ],
+        text={"format": spec.batch_text_format},
+    )
+    batch = spec.batch_model.model_validate_json(response.output_text)
+    items = getattr(batch, "items")
+    if len(items) != len(messages):
+        raise ValueError(f"Expected {len(messages)} extractions, got {len(items)}.")
+    return [ExpenseExtraction(**item.model_dump()) for item in items]
 
 
 if __name__ == "__main__":
@@ -70,5 +248,6 @@ if __name__ == "__main__":
         "comida afuera mc",
     ]
     for message in messages:
-        result = llm_call(message, BASE_CATEGORIES)  # type: ignore
+        result = llm_call(message, BASE_CATEGORIES)
         print(f"Message: {message}\nResult: {result}\n")
+    print(get_extraction_spec.cache_info())
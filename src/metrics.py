@@ -0,0 +1,194 @@
+"""
+Minimal Prometheus text-format metrics, without extra dependencies.
+
+Counters and histograms live in the module that records them; stats()
+dicts that already exist (pool, queues, caches) are exported as gauges
+through register_stats. With METRICS_ENABLED=0, `timed` returns the
+function unchanged and inc/observe return on the first check.
+"""
+
+import functools
+import os
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Tuple, TypeVar, cast
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Seconds; covers SQLite point queries (~1ms) up to slow LLM calls
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        if not METRICS_ENABLED:
+            return
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(
+                f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+            )
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket (+Inf last)], sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    def collect(self) -> List[str]:
+        name = self.name
+        lines = [f"# HELP {name} {self.help}", f"# TYPE {name} histogram"]
+        for labels, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(
+                    f"{name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            lines.append(
+                f"{name}_sum{_labels(self.labelnames, labels)} {_number(total[0])}"
+            )
+            lines.append(f"{name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: List[Any] = []
+        self.stats: Dict[str, Tuple[str, Callable[[], Mapping[str, Any]]]] = {}
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines += metric.collect()
+        for prefix, (help, fn) in self.stats.items():
+            for key, value in fn().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines += [
+                    f"# HELP {name} {help} ({key})",
+                    f"# TYPE {name} gauge",
+                    f"{name} {_number(value)}",
+                ]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+    metric = Counter(name, help, labelnames)
+    REGISTRY.metrics.append(metric)
+    return metric
+
+
+def histogram(
+    name: str,
+    help: str,
+    labelnames: Tuple[str, ...] = (),
+    buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+) -> Histogram:
+    metric = Histogram(name, help, labelnames, buckets)
+    REGISTRY.metrics.append(metric)
+    return metric
+
+
+def register_stats(prefix: str, help: str, fn: Callable[[], Mapping[str, Any]]) -> None:
+    """Export the numeric values of fn() as gauges named `{prefix}_{key}`."""
+    REGISTRY.stats[prefix] = (help, fn)
+
+
+def timed(seconds: Histogram, errors: Counter) -> Callable[[F], F]:
+    """
+    Record an async function's latency in `seconds` and its exceptions in
+    `errors`, both labelled with the function's name.
+    """
+
+    def decorator(fn: F) -> F:
+        if not METRICS_ENABLED:
+            return fn
+        label = fn.__name__
+
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                errors.inc(label)
+                raise
+            finally:
+                seconds.observe(time.perf_counter() - start, label)
+
+        return cast(F, wrapper)
+
+    return decorator
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,581 @@
+from typing import Awaitable, Callable, List, NamedTuple
+
+import aiosqlite
+
+from src.base_categories import BASE_CATEGORIES
+from src.fx_rates import normalize_currency
+
+# date: epoch seconds (UTC); amount_cents: integer minor units of `currency`
+EXPENSES_TABLE = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        message_id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        date INTEGER NOT NULL,
+        amount_cents INTEGER NOT NULL,
+        category_name TEXT NOT NULL,
+        currency TEXT NOT NULL,
+        message TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+        FOREIGN KEY (category_name) REFERENCES categories(name) ON DELETE RESTRICT
+    )
+"""
+
+ROLLUP_BACKFILL = """
+    INSERT INTO expense_monthly_totals
+        (user_id, month, category_name, currency, total_cents, count,
+         total_base_cents, base_count)
+    SELECT user_id, strftime('%Y-%m', date, 'unixepoch'), category_name, currency,
+        SUM(amount_cents), COUNT(*), COALESCE(SUM(amount_base_cents), 0),
+        COUNT(amount_base_cents)
+    FROM expenses
+    GROUP BY 1, 2, 3, 4
+"""
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[aiosqlite.Connection], Awaitable[None]]
+
+
+async def _columns(conn: aiosqlite.Connection, table: str) -> List[str]:
+    cur = await conn.execute(f"PRAGMA table_info({table})")
+    rows = await cur.fetchall()
+    await cur.close()
+    return [r[1] for r in rows]
+
+
+# -----------------------------
+# Steps
+# -----------------------------
+# Steps must stay safe on databases created before versioning existed
+# (user_version 0 but tables present), hence IF NOT EXISTS and the
+# column checks.
+async def _base_schema(conn: aiosqlite.Connection) -> None:
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            created_at TEXT DEFAULT (datetime('now'))
+        )
+        """
+    )
+
+    # Global category catalog
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS categories (
+            name TEXT PRIMARY KEY
+        )
+        """
+    )
+
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_categories (
+            user_id INTEGER NOT NULL,
+            category_name TEXT NOT NULL,
+            PRIMARY KEY (user_id, category_name),
+            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+            FOREIGN KEY (category_name) REFERENCES categories(name) ON DELETE CASCADE
+        )
+        """
+    )
+
+    await conn.execute(EXPENSES_TABLE.format(name="expenses"))
+
+    await conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_categories_name ON categories(name)"
+    )
+    await conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_uc_user ON user_categories(user_id)"
+    )
+    await conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_uc_cat ON user_categories(category_name)"
+    )
+
+    # Seed the global catalog with your defaults (once)
+    await conn.executemany(
+        "INSERT OR IGNORE INTO categories(name) VALUES (?)",
+        [(n,) for n in BASE_CATEGORIES],
+    )
+
+
+async def _numeric_expenses(conn: aiosqlite.Connection) -> None:
+    """
+    Rebuild a legacy expenses table (TEXT date, REAL value) into epoch
+    seconds and integer cents, keeping ids. A legacy monthly rollup is
+    dropped; the rollup step recreates it in the new units.
+    """
+    if "value" not in await _columns(conn, "expenses"):
+        return
+    await conn.execute(EXPENSES_TABLE.format(name="expenses_numeric"))
+    await conn.execute(
+        """
+        INSERT INTO expenses_numeric
+            (id, message_id, chat_id, user_id, date, amount_cents, category_name, currency, message)
+        SELECT id, message_id, chat_id, user_id, CAST(strftime('%s', date) AS INTEGER),
+            CAST(round(value * 100) AS INTEGER), category_name, currency, message
+        FROM expenses
+        """
+    )
+    await conn.execute("DROP TABLE expenses")  # also drops its indexes and triggers
+    await conn.execute("ALTER TABLE expenses_numeric RENAME TO expenses")
+    await conn.execute("DROP TABLE IF EXISTS expense_monthly_totals")
+
+
+async def _expenses_indexes(conn: aiosqlite.Connection) -> None:
+    await conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_expenses_user ON expenses(user_id, id)"
+    )
+    await conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses(category_name)"
+    )
+    # Report filters: per-user date ranges, optionally within one category.
+    # Replaces the global date-only index, which no query could use.
+    await conn.execute("DROP INDEX IF EXISTS idx_expenses_date")
+    await conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_expenses_user_date ON expenses(user_id, date)"
+    )
+    await conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_expenses_user_cat_date ON expenses(user_id, category_name, date)"
+    )
+
+
+async def _extraction_cache(conn: aiosqlite.Connection) -> None:
+    # LLM extraction results keyed by normalized message text + category set
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS extraction_cache (
+            message_key TEXT NOT NULL,
+            categories_hash TEXT NOT NULL,
+            value REAL NOT NULL,
+            category_name TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            PRIMARY KEY (message_key, categories_hash)
+        ) WITHOUT ROWID
+        """
+    )
+    await conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_extraction_cache_created ON extraction_cache(created_at)"
+    )
+
+
+async def _monthly_totals(conn: aiosqlite.Connection) -> None:
+    # Per-user monthly totals, kept in sync with expenses by triggers so every
+    # insert/delete (and edit) updates them in the same transaction.
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS expense_monthly_totals (
+            user_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            category_name TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            total_cents INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, month, category_name, currency)
+        ) WITHOUT ROWID
+        """
+    )
+    await conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_insert
+        AFTER INSERT ON expenses
+        BEGIN
+            INSERT INTO expense_monthly_totals
+                (user_id, month, category_name, currency, total_cents, count)
+            VALUES (
+                NEW.user_id, strftime('%Y-%m', NEW.date, 'unixepoch'),
+                NEW.category_name, NEW.currency, NEW.amount_cents, 1
+            )
+            ON CONFLICT (user_id, month, category_name, currency)
+            DO UPDATE SET total_cents = total_cents + excluded.total_cents, count = count + 1;
+        END
+        """
+    )
+    await conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_delete
+        AFTER DELETE ON expenses
+        BEGIN
+            UPDATE expense_monthly_totals
+            SET total_cents = total_cents - OLD.amount_cents, count = count - 1
+            WHERE user_id = OLD.user_id AND month = strftime('%Y-%m', OLD.date, 'unixepoch')
+                AND category_name = OLD.category_name AND currency = OLD.currency;
+            DELETE FROM expense_monthly_totals
+            WHERE user_id = OLD.user_id AND month = strftime('%Y-%m', OLD.date, 'unixepoch')
+                AND category_name = OLD.category_name AND currency = OLD.currency
+                AND count <= 0;
+        END
+        """
+    )
+    await conn.execute("DELETE FROM expense_monthly_totals")
+    # Frozen: ROLLUP_BACKFILL has grown columns this step doesn't create yet
+    await conn.execute(
+        """
+        INSERT INTO expense_monthly_totals
+            (user_id, month, category_name, currency, total_cents, count)
+        SELECT user_id, strftime('%Y-%m', date, 'unixepoch'), category_name, currency,
+            SUM(amount_cents), COUNT(*)
+        FROM expenses
+        GROUP BY 1, 2, 3, 4
+        """
+    )
+
+
+async def _processed_updates(conn: aiosqlite.Connection) -> None:
+    # Telegram update_ids already handled, so redeliveries are dropped
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS processed_updates (
+            update_id INTEGER PRIMARY KEY,
+            received_at INTEGER NOT NULL
+        )
+        """
+    )
+    await conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_processed_updates_received ON processed_updates(received_at)"
+    )
+
+
+async def _expenses_line_no(conn: aiosqlite.Connection) -> None:
+    """
+    Number the expenses of a message (one per line) and make
+    (user_id, chat_id, message_id, line_no) unique, so an edit can upsert
+    its lines in place. Existing multi-line messages are numbered by id.
+    """
+    if "line_no" not in await _columns(conn, "expenses"):
+        await conn.execute(
+            "ALTER TABLE expenses ADD COLUMN line_no INTEGER NOT NULL DEFAULT 0"
+        )
+    await conn.execute(
+        """
+        UPDATE expenses SET line_no = numbered.rn
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY user_id, chat_id, message_id ORDER BY id
+            ) - 1 AS rn
+            FROM expenses
+        ) AS numbered
+        WHERE expenses.id = numbered.id AND expenses.line_no != numbered.rn
+        """
+    )
+    await conn.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_expenses_message_line
+        ON expenses(user_id, chat_id, message_id, line_no)
+        """
+    )
+    # Edits update rows in place; move the amount between rollup keys.
+    await conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_update
+        AFTER UPDATE OF user_id, date, amount_cents, category_name, currency ON expenses
+        BEGIN
+            UPDATE expense_monthly_totals
+            SET total_cents = total_cents - OLD.amount_cents, count = count - 1
+            WHERE user_id = OLD.user_id AND month = strftime('%Y-%m', OLD.date, 'unixepoch')
+                AND category_name = OLD.category_name AND currency = OLD.currency;
+            DELETE FROM expense_monthly_totals
+            WHERE user_id = OLD.user_id AND month = strftime('%Y-%m', OLD.date, 'unixepoch')
+                AND category_name = OLD.category_name AND currency = OLD.currency
+                AND count <= 0;
+            INSERT INTO expense_monthly_totals
+                (user_id, month, category_name, currency, total_cents, count)
+            VALUES (
+                NEW.user_id, strftime('%Y-%m', NEW.date, 'unixepoch'),
+                NEW.category_name, NEW.currency, NEW.amount_cents, 1
+            )
+            ON CONFLICT (user_id, month, category_name, currency)
+            DO UPDATE SET total_cents = total_cents + excluded.total_cents, count = count + 1;
+        END
+        """
+    )
+
+
+async def _change_counters(conn: aiosqlite.Connection) -> None:
+    """
+    A counter bumped on every user_categories change, so processes sharing
+    the file can tell when their cached category lists are stale.
+    """
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS change_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        """
+    )
+    await conn.execute(
+        "INSERT OR IGNORE INTO change_counters (name, value) VALUES ('user_categories', 0)"
+    )
+    for event in ("INSERT", "DELETE"):
+        await conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_user_categories_{event.lower()}_counter
+            AFTER {event} ON user_categories
+            BEGIN
+                UPDATE change_counters SET value = value + 1
+                WHERE name = 'user_categories';
+            END
+            """
+        )
+
+
+async def _expenses_fts(conn: aiosqlite.Connection) -> None:
+    """
+    Full-text index over expenses.message for /search. Contentless: rows
+    are read back from expenses by rowid (= expenses.id). The owner column
+    holds a `u<user_id>` token so a query can be restricted to one user
+    inside the index instead of filtering every user's matches.
+    """
+    await conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS expenses_fts USING fts5(
+            message, owner, content='', tokenize='unicode61 remove_diacritics 2'
+        )
+        """
+    )
+    # A contentless 'delete' must be given the exact values indexed
+    await conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_fts_insert AFTER INSERT ON expenses
+        BEGIN
+            INSERT INTO expenses_fts (rowid, message, owner)
+            VALUES (NEW.id, NEW.message, 'u' || NEW.user_id);
+        END
+        """
+    )
+    await conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_fts_delete AFTER DELETE ON expenses
+        BEGIN
+            INSERT INTO expenses_fts (expenses_fts, rowid, message, owner)
+            VALUES ('delete', OLD.id, OLD.message, 'u' || OLD.user_id);
+        END
+        """
+    )
+    await conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_fts_update
+        AFTER UPDATE OF message, user_id ON expenses
+        BEGIN
+            INSERT INTO expenses_fts (expenses_fts, rowid, message, owner)
+            VALUES ('delete', OLD.id, OLD.message, 'u' || OLD.user_id);
+            INSERT INTO expenses_fts (rowid, message, owner)
+            VALUES (NEW.id, NEW.message, 'u' || NEW.user_id);
+        END
+        """
+    )
+    await conn.execute("INSERT INTO expenses_fts (expenses_fts) VALUES ('delete-all')")
+    await conn.execute(
+        """
+        INSERT INTO expenses_fts (rowid, message, owner)
+        SELECT id, message, 'u' || user_id FROM expenses
+        """
+    )
+
+
+async def _users_data_version(conn: aiosqlite.Connection) -> None:
+    """
+    users.data_version: bumped by triggers whenever one of the user's
+    expenses is inserted, updated or deleted, so derived artifacts (chart
+    images) can be cached under it and never outlive the data.
+    """
+    if "data_version" not in await _columns(conn, "users"):
+        await conn.execute(
+            "ALTER TABLE users ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0"
+        )
+    for event, row in (("INSERT", "NEW"), ("DELETE", "OLD"), ("UPDATE", "NEW")):
+        await conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_expenses_{event.lower()}_data_version
+            AFTER {event} ON expenses
+            BEGIN
+                UPDATE users SET data_version = data_version + 1
+                WHERE user_id = {row}.user_id;
+            END
+            """
+        )
+
+
+async def _base_currency_amounts(conn: aiosqlite.Connection) -> None:
+    """
+    Exchange rates and each expense's amount in the base currency
+    (src.fx_rates), carried into the monthly rollup so base-currency totals
+    are a plain SUM. amount_base_cents stays NULL while no rate covers the
+    expense's day; base_count tells those rows apart from zero.
+    """
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS fx_rates (
+            currency TEXT NOT NULL,
+            date TEXT NOT NULL,
+            rate REAL NOT NULL,
+            PRIMARY KEY (currency, date)
+        ) WITHOUT ROWID
+        """
+    )
+    # Rates are keyed by code, so free-text currencies ('dólares') become codes
+    cur = await conn.execute("SELECT DISTINCT currency FROM expenses")
+    stored = [r[0] for r in await cur.fetchall()]
+    await cur.close()
+    for currency in stored:
+        if normalize_currency(currency) != currency:
+            await conn.execute(
+                "UPDATE expenses SET currency = ? WHERE currency = ?",
+                (normalize_currency(currency), currency),
+            )
+    if "amount_base_cents" not in await _columns(conn, "expenses"):
+        await conn.execute("ALTER TABLE expenses ADD COLUMN amount_base_cents INTEGER")
+    # Rows still waiting for a rate, for the startup backfill
+    await conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_expenses_base_missing
+        ON expenses(currency) WHERE amount_base_cents IS NULL
+        """
+    )
+    rollup_columns = await _columns(conn, "expense_monthly_totals")
+    for column in ("total_base_cents", "base_count"):
+        if column not in rollup_columns:
+            await conn.execute(
+                f"ALTER TABLE expense_monthly_totals "
+                f"ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"
+            )
+
+    add_new = """
+        INSERT INTO expense_monthly_totals
+            (user_id, month, category_name, currency, total_cents, count,
+             total_base_cents, base_count)
+        VALUES (
+            NEW.user_id, strftime('%Y-%m', NEW.date, 'unixepoch'),
+            NEW.category_name, NEW.currency, NEW.amount_cents, 1,
+            COALESCE(NEW.amount_base_cents, 0), NEW.amount_base_cents IS NOT NULL
+        )
+        ON CONFLICT (user_id, month, category_name, currency)
+        DO UPDATE SET total_cents = total_cents + excluded.total_cents,
+            count = count + 1,
+            total_base_cents = total_base_cents + excluded.total_base_cents,
+            base_count = base_count + excluded.base_count;
+    """
+    remove_old = """
+        UPDATE expense_monthly_totals
+        SET total_cents = total_cents - OLD.amount_cents, count = count - 1,
+            total_base_cents = total_base_cents - COALESCE(OLD.amount_base_cents, 0),
+            base_count = base_count - (OLD.amount_base_cents IS NOT NULL)
+        WHERE user_id = OLD.user_id AND month = strftime('%Y-%m', OLD.date, 'unixepoch')
+            AND category_name = OLD.category_name AND currency = OLD.currency;
+        DELETE FROM expense_monthly_totals
+        WHERE user_id = OLD.user_id AND month = strftime('%Y-%m', OLD.date, 'unixepoch')
+            AND category_name = OLD.category_name AND currency = OLD.currency
+            AND count <= 0;
+    """
+    for name, event, body in (
+        ("insert", "INSERT", add_new),
+        ("delete", "DELETE", remove_old),
+        (
+            "update",
+            "UPDATE OF user_id, date, amount_cents, amount_base_cents, "
+            "category_name, currency",
+            remove_old + add_new,
+        ),
+    ):
+        await conn.execute(f"DROP TRIGGER IF EXISTS trg_expenses_rollup_{name}")
+        await conn.execute(
+            f"""
+            CREATE TRIGGER trg_expenses_rollup_{name}
+            AFTER {event} ON expenses
+            BEGIN
+                {body}
+            END
+            """
+        )
+    await conn.execute("DELETE FROM expense_monthly_totals")
+    await conn.execute(ROLLUP_BACKFILL)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "base schema and category catalog", _base_schema),
+    Migration(2, "expenses: epoch dates and integer cents", _numeric_expenses),
+    Migration(3, "expenses: per-user report indexes", _expenses_indexes),
+    Migration(4, "extraction cache", _extraction_cache),
+    Migration(5, "monthly totals rollup", _monthly_totals),
+    Migration(6, "processed updates ledger", _processed_updates),
+    Migration(7, "expenses: line numbers, unique per message line", _expenses_line_no),
+    Migration(8, "user_categories change counter", _change_counters),
+    Migration(9, "expenses: full-text index on message", _expenses_fts),
+    Migration(10, "users: data version bumped on expense changes", _users_data_version),
+    Migration(11, "fx rates and base-currency amounts", _base_currency_amounts),
+]
+
+
+# -----------------------------
+# Engine
+# -----------------------------
+async def get_schema_version(conn: aiosqlite.Connection) -> int:
+    cur = await conn.execute("PRAGMA user_version")
+    row = await cur.fetchone()
+    await cur.close()
+    return row[0] if row else 0
+
+
+async def pending_migrations(conn: aiosqlite.Connection) -> List[Migration]:
+    current = await get_schema_version(conn)
+    return [m for m in MIGRATIONS if m.version > current]
+
+
+async def apply_migrations(
+    conn: aiosqlite.Connection, dry_run: bool = False
+) -> List[Migration]:
+    """
+    Apply pending steps in order, each in its own transaction together with
+    the `PRAGMA user_version` bump, so a failed step leaves the database at
+    the previous version. Returns the steps this call applied (with
+    dry_run, the pending ones without applying them).
+
+    Each step takes the write lock (BEGIN IMMEDIATE) and re-reads the
+    version under it, so workers starting together on one file apply every
+    step once: the others wait for the lock and then skip it.
+    """
+    pending = await pending_migrations(conn)
+    if dry_run:
+        return pending
+    applied: List[Migration] = []
+    for migration in pending:
+        await conn.execute("BEGIN IMMEDIATE")
+        try:
+            if await get_schema_version(conn) >= migration.version:
+                await conn.rollback()
+                continue
+            await migration.apply(conn)
+            await conn.execute(f"PRAGMA user_version = {migration.version}")
+        except BaseException:
+            await conn.rollback()
+            raise
+        await conn.commit()
+        applied.append(migration)
+    return applied
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+
+    async def _main(path: str, dry_run: bool) -> None:
+        conn = await aiosqlite.connect(path)
+        try:
+            await conn.execute("PRAGMA foreign_keys=ON;")
+            print(f"schema version {await get_schema_version(conn)}")
+            for m in await apply_migrations(conn, dry_run=dry_run):
+                print(
+                    f"{'pending' if dry_run else 'applied'} {m.version}: {m.description}"
+                )
+        finally:
+            await conn.close()
+
+    # python -m src.migrations [--dry-run] /var/lib/bot/bot.db
+    args = [a for a in sys.argv[1:] if a != "--dry-run"]
+    asyncio.run(_main(args[0], dry_run="--dry-run" in sys.argv))
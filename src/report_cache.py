@@ -0,0 +1,80 @@
+import os
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(64 * 2**20)))
+# Bigger reports are streamed every time rather than evicting everything else
+REPORT_CACHE_MAX_ITEM_BYTES = int(
+    os.getenv("REPORT_CACHE_MAX_ITEM_BYTES", str(8 * 2**20))
+)
+
+# (user_id, filters, users.data_version)
+ReportKey = Tuple[int, str, int]
+
+
+class CachedReport(NamedTuple):
+    data: bytes
+    filename: str
+    # Telegram's id for the uploaded document, once sent: resending by id
+    # skips the upload
+    file_id: Optional[str] = None
+
+
+class ReportCache:
+    """
+    LRU of generated /report CSVs under a total byte budget. The key holds
+    the user's data_version, which triggers bump on any change to their
+    expenses, so an entry never serves stale rows and is never invalidated
+    explicitly; superseded versions just age out.
+    """
+
+    def __init__(self, max_bytes: int, max_item_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = min(max_item_bytes, max_bytes)
+        self._entries: "OrderedDict[ReportKey, CachedReport]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: ReportKey) -> Optional[CachedReport]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: ReportKey, data: bytes, filename: str) -> None:
+        if len(data) > self.max_item_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old.data)
+        self._entries[key] = CachedReport(data, filename)
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.data)
+            self.evictions += 1
+
+    def set_file_id(self, key: ReportKey, file_id: str) -> None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries[key] = entry._replace(file_id=file_id)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+report_cache = ReportCache(REPORT_CACHE_MAX_BYTES, REPORT_CACHE_MAX_ITEM_BYTES)
@@ -0,0 +1,65 @@
+import re
+import shlex
+from datetime import date, timedelta
+from typing import Optional
+
+from src.db import ReportFilter
+from src.fx_rates import normalize_currency
+
+REPORT_USAGE = (
+    "Uso: /report [AAAA-MM] [desde=AAAA-MM-DD] [hasta=AAAA-MM-DD] "
+    '[categoria="NOMBRE"] [moneda=USD] [base=1]'
+)
+
+_MONTH = re.compile(r"^(\d{4})-(\d{2})$")
+
+
+def _day_start(day: date) -> str:
+    return f"{day.isoformat()} 00:00:00"
+
+
+def _parse_day(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Fecha inválida: {value}. {REPORT_USAGE}")
+
+
+def parse_report_args(text: str) -> Optional[ReportFilter]:
+    """
+    Parse the arguments of /report, e.g.
+    '2025-03 categoria="SALIR A COMER" moneda=usd'. Returns None when there
+    are no filters. Raises ValueError with a user-facing message.
+    """
+    try:
+        tokens = shlex.split(text)
+    except ValueError:
+        raise ValueError(REPORT_USAGE)
+    if not tokens:
+        return None
+
+    filters = ReportFilter()
+    for token in tokens:
+        key, sep, value = token.partition("=")
+        month = _MONTH.match(token)
+        if month and not sep:
+            year, mon = int(month.group(1)), int(month.group(2))
+            if not 1 <= mon <= 12:
+                raise ValueError(f"Mes inválido: {token}. {REPORT_USAGE}")
+            first = date(year, mon, 1)
+            following = date(year + mon // 12, mon % 12 + 1, 1)
+            filters.date_from = _day_start(first)
+            filters.date_to = _day_start(following)
+        elif key.lower() == "desde" and value:
+            filters.date_from = _day_start(_parse_day(value))
+        elif key.lower() == "hasta" and value:
+            filters.date_to = _day_start(_parse_day(value) + timedelta(days=1))
+        elif key.lower() in ("categoria", "categoría") and value:
+            filters.category = value.strip().upper()
+        elif key.lower() == "moneda" and value:
+            filters.currency = normalize_currency(value)
+        elif key.lower() == "base" and value in ("0", "1"):
+            filters.base = value == "1"
+        else:
+            raise ValueError(f"No entiendo «{token}». {REPORT_USAGE}")
+    return filters
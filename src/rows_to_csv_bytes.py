@@ -1,31 +1,65 @@
 import csv
 import io
+import tempfile
 from datetime import datetime, timezone
-from typing import List
+from typing import IO, Any, AsyncIterable, List, Sequence, Tuple
 
 from src.db import ExpenseRow
+from src.fx_rates import BASE_CURRENCY
 
+# This list must match the fields in ExpenseRow. value_base is left out
+# unless the report asks for it (report_header(base=True)).
+HEADER_LABELS = ["Fecha", "Monto", "Categoría", "Moneda", "Mensaje"]
+# Reports bigger than this spill from memory to a temporary file on disk
+SPOOL_MAX_BYTES = 1024 * 1024
 
-def rows_to_csv_bytes(rows: List[ExpenseRow]) -> io.BytesIO:
+
+def report_header(base: bool = False) -> List[str]:
+    return HEADER_LABELS + [f"Monto {BASE_CURRENCY}"] if base else HEADER_LABELS
+
+
+def report_filename() -> str:
+    return f"expenses_{datetime.now(timezone.utc).date().isoformat()}.csv"
+
+
+def rows_to_csv_bytes(rows: List[ExpenseRow], base: bool = False) -> io.BytesIO:
     sio = io.StringIO(newline="")
 
-    columns = list(ExpenseRow.model_fields.keys())
+    columns = list(ExpenseRow.model_fields.keys())[: len(report_header(base))]
 
-    writer = csv.DictWriter(sio, fieldnames=columns)
+    writer = csv.DictWriter(sio, fieldnames=columns, extrasaction="ignore")
 
-    header_labels = [
-        "Fecha",
-        "Monto",
-        "Categoría",
-        "Moneda",
-        "Mensaje",
-    ]  # This list must match the fields in ExpenseRow
-    sio.write(",".join(header_labels) + "\n")
+    sio.write(",".join(report_header(base)) + "\n")
 
     for r in rows:
         writer.writerow(r.model_dump())
 
     # Wrap text in BytesIO and give it a filename
     bio = io.BytesIO(sio.getvalue().encode("utf-8"))
-    bio.name = f"expenses_{datetime.now(timezone.utc).date().isoformat()}.csv"
+    bio.name = report_filename()
     return bio
+
+
+async def rows_to_csv_file(
+    chunks: AsyncIterable[Sequence[Tuple[Any, ...]]],
+    base: bool = False,
+) -> IO[bytes]:
+    """
+    Streaming variant of rows_to_csv_bytes: encodes each chunk of row tuples
+    straight into a spooled temp file, so memory stays flat with the number
+    of rows. The file is returned rewound; the caller closes it.
+    """
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+b")
+    sio = io.StringIO(newline="")
+    writer = csv.writer(sio)
+    sio.write(",".join(report_header(base)) + "\n")
+
+    async for chunk in chunks:
+        writer.writerows(chunk)
+        out.write(sio.getvalue().encode("utf-8"))
+        sio.seek(0)
+        sio.truncate()
+    out.write(sio.getvalue().encode("utf-8"))
+
+    out.seek(0)
+    return out  # type: ignore[return-value]
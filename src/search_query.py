@@ -0,0 +1,37 @@
+import re
+import shlex
+from typing import Tuple
+
+SEARCH_USAGE = 'Uso: /search <texto> ["frase exacta"] [pagina=N]'
+
+_WORD = re.compile(r"\w+")
+
+
+def parse_search_args(text: str) -> Tuple[str, int]:
+    """
+    Parse the arguments of /search, e.g. 'netflix "super chino" pagina=2',
+    into an FTS5 query over the words (all must match; quoted text must
+    match as a phrase) and a 1-based page. User text only reaches FTS5 as
+    quoted words, so its query syntax cannot be injected. Raises
+    ValueError with a user-facing message.
+    """
+    try:
+        tokens = shlex.split(text)
+    except ValueError:
+        raise ValueError(SEARCH_USAGE)
+
+    phrases = []
+    page = 1
+    for token in tokens:
+        key, sep, value = token.partition("=")
+        if sep and key.lower() in ("pagina", "página"):
+            if not value.isdigit() or int(value) < 1:
+                raise ValueError(f"Página inválida: {value}. {SEARCH_USAGE}")
+            page = int(value)
+            continue
+        words = _WORD.findall(token)
+        if words:
+            phrases.append('"' + " ".join(words) + '"')
+    if not phrases:
+        raise ValueError(SEARCH_USAGE)
+    return " AND ".join(phrases), page
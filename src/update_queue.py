@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """No room for the update within the allowed wait; the caller should retry later."""
+
+
+class UpdateQueue:
+    """
+    Decouples the webhook from update processing. `submit` enqueues and
+    returns; `workers` tasks drain one shard each. Updates are sharded by
+    chat id, so messages from the same chat are handled one at a time and
+    in arrival order, while different chats run concurrently.
+
+    An optional `claim` coroutine runs first and returns False for updates
+    that were already handled (e.g. Telegram redeliveries); those are
+    dropped before the handler, and so before any LLM call.
+
+    Each shard holds at most `max_depth / workers` updates. When a shard is
+    full `submit` waits up to `put_timeout` seconds and then raises
+    QueueFull, so the webhook can answer non-2xx and Telegram redelivers
+    later instead of us buffering without bound.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Update], Awaitable[None]],
+        workers: int = 8,
+        max_depth: int = 1000,
+        put_timeout: float = 5.0,
+        claim: Optional[Callable[[Update], Awaitable[bool]]] = None,
+    ):
+        self.handler = handler
+        self.claim = claim
+        self.workers = max(1, workers)
+        self.max_depth = max_depth
+        self.put_timeout = put_timeout
+        self._shards: List["asyncio.Queue[Tuple[float, Update]]"] = []
+        self._tasks: List["asyncio.Task[None]"] = []
+        self.enqueued = 0
+        self.dequeued = 0
+        self.processed = 0
+        self.failed = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.depth_max = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def start(self) -> None:
+        per_shard = max(1, -(-self.max_depth // self.workers))
+        self._shards = [asyncio.Queue(maxsize=per_shard) for _ in range(self.workers)]
+        self._tasks = [
+            asyncio.create_task(self._run(shard), name=f"update-worker-{i}")
+            for i, shard in enumerate(self._shards)
+        ]
+
+    async def stop(self, timeout: Optional[float] = 10.0) -> None:
+        """Let workers finish what is queued (up to `timeout`), then cancel them."""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(shard.join() for shard in self._shards)), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("update queue: %d updates dropped at shutdown", self.depth)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    @property
+    def depth(self) -> int:
+        return sum(shard.qsize() for shard in self._shards)
+
+    async def submit(self, update: Update) -> None:
+        chat = update.effective_chat
+        shard = self._shards[(chat.id if chat else 0) % self.workers]
+        try:
+            await asyncio.wait_for(
+                shard.put((time.perf_counter(), update)), self.put_timeout
+            )
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise QueueFull() from None
+        self.enqueued += 1
+        self.depth_max = max(self.depth_max, self.depth)
+
+    async def _run(self, shard: "asyncio.Queue[Tuple[float, Update]]") -> None:
+        while True:
+            queued_at, update = await shard.get()
+            waited = time.perf_counter() - queued_at
+            self.dequeued += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            try:
+                if self.claim is not None and not await self.claim(update):
+                    self.duplicates += 1
+                    continue
+                await self.handler(update)
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("update %s failed", update.update_id)
+            finally:
+                shard.task_done()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "workers": self.workers,
+            "depth": self.depth,
+            "depth_max": self.depth_max,
+            "capacity": self.max_depth,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "wait_seconds_avg": (
+                self.wait_seconds_total / self.dequeued if self.dequeued else 0.0
+            ),
+            "wait_seconds_max": self.wait_seconds_max,
+        }
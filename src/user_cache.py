@@ -0,0 +1,100 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+USER_CACHE_MAX_USERS = int(os.getenv("USER_CACHE_MAX_USERS", "10000"))
+# Backstop on staleness; cross-process changes are caught by `sync`
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+# How often the cache compares the shared change counter (one PK read)
+USER_CACHE_SYNC_SECONDS = float(os.getenv("USER_CACHE_SYNC_SECONDS", "1"))
+
+
+class UserCache:
+    """
+    LRU of registered users and their category names. db's writers
+    (register_user, link/unlink_user_category_by_name) invalidate the user
+    after committing, so a hit is what a fresh query would return.
+
+    Loads take a `generation()` token first and `put` drops the result if
+    any invalidation happened meanwhile, so a slow load cannot overwrite a
+    newer change with the list it read before it.
+
+    Other worker processes on the same database cannot call `invalidate`
+    here. Their commits bump the `user_categories` change counter instead;
+    callers pass its value to `sync` at most every `sync_seconds`, and any
+    change since the last one clears the cache.
+    """
+
+    def __init__(self, max_users: int, ttl_seconds: float, sync_seconds: float = 1.0):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self.sync_seconds = sync_seconds
+        self._entries: "OrderedDict[int, Tuple[float, Tuple[str, ...]]]" = OrderedDict()
+        self._generation = 0
+        self._counter: Optional[int] = None
+        self._synced_at = float("-inf")
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.sync_clears = 0
+
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, user_id: int) -> Optional[List[str]]:
+        entry = self._entries.get(user_id)
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return list(entry[1])
+
+    def put(self, user_id: int, categories: List[str], generation: int) -> None:
+        if generation != self._generation or self.max_users <= 0:
+            return
+        self._entries[user_id] = (time.monotonic(), tuple(categories))
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: int) -> None:
+        self._generation += 1
+        self.invalidations += 1
+        self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+    def sync_due(self) -> bool:
+        return time.monotonic() - self._synced_at >= self.sync_seconds
+
+    def sync(self, counter: int) -> None:
+        """Clear everything if the shared change counter moved."""
+        self._synced_at = time.monotonic()
+        if self._counter is not None and counter != self._counter:
+            self.clear()
+            self.sync_clears += 1
+        self._counter = counter
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._entries),
+            "max_users": self.max_users,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "sync_clears": self.sync_clears,
+        }
+
+
+user_cache = UserCache(
+    USER_CACHE_MAX_USERS, USER_CACHE_TTL_SECONDS, USER_CACHE_SYNC_SECONDS
+)
@@ -21,6 +21,15 @@ HELP_MESSAGE: Final[str] = (
     "• /help — muestra esta ayuda\n"
     "• /start — introducción rápida\n"
     "• /report — descarga tus gastos en CSV\n"
+    "  Filtros opcionales: <code>/report 2025-03</code>, <code>desde=2025-01-01 hasta=2025-03-31</code>,\n"
+    '  <code>categoria="SALIR A COMER"</code>, <code>moneda=USD</code>,\n'
+    "  <code>base=1</code> (agrega el monto convertido a la moneda base)\n"
+    "• /summary <code>[AAAA-MM]</code> — totales del mes por categoría\n"
+    "• /chart <code>[meses]</code> — gráfico de gastos por categoría (últimos 6 meses)\n"
+    "• /search <code>&lt;texto&gt;</code> — busca gastos por su mensaje\n"
+    '  Frases entre comillas: <code>/search "super chino"</code>; más resultados con <code>pagina=2</code>\n'
+    "• /import — carga gastos desde un CSV con el formato de /report\n"
+    "  Enviá el archivo con <code>/import</code> como texto, o respondé al archivo con /import\n"
     "• /delete — elimina un gasto\n"
     "• /addcategory <code>&lt;nombre&gt;</code> — agrega una categoría\n"
     "• /removecategory <code>&lt;nombre&gt;</code> — quita una categoría de tu perfil\n"
@@ -29,7 +38,10 @@ HELP_MESSAGE: Final[str] = (
     "• <b>Registrar un gasto:</b> simplemente escribí el texto del gasto.\n"
     "  Ejemplo:\n"
     "  <i>almuerzo en restaurante 2500</i>\n"
-    "  (Se registra un gasto por mensaje. El bot detecta monto, moneda y categoría automáticamente.)\n\n"
+    "  (El bot detecta monto, moneda y categoría automáticamente.)\n\n"
+    "• <b>Cargar varios gastos:</b> escribí un gasto por línea en el mismo mensaje.\n"
+    "  Las líneas sin monto se ignoran; si solo una tiene monto, el mensaje es un único gasto.\n"
+    "  Editar o borrar ese mensaje afecta a todos sus gastos.\n\n"
     "• <b>Modificar un gasto:</b> editá el mensaje original del gasto.\n"
     "  El registro anterior se elimina y se vuelve a crear actualizado.\n\n"
     "• <b>Eliminar un gasto:</b> respondé al mensaje del gasto con /delete.\n"
@@ -1,4 +1,12 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+
 def to_int_if_whole(x: float) -> float | int:
     if x.is_integer():
         return int(x)
     return x
+
+
+def to_cents(x: float) -> int:
+    """Exact minor units: 799.99 -> 79999 (no float truncation)."""
+    return int((Decimal(str(x)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
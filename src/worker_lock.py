@@ -0,0 +1,86 @@
+import fcntl
+import os
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+class WorkerLock:
+    """
+    Coordinates the worker processes serving one DB_PATH (gunicorn or
+    `uvicorn --workers`) through flock(2) on files next to it:
+
+    - `<db>.leader.lock`: the first worker to take it exclusively is the
+      leader and runs the once-per-deployment side effects (set_my_commands,
+      ensure_webhook). It holds it until it exits; the kernel drops it if
+      the process dies, so a respawned worker becomes leader again.
+    - `<db>.workers.lock`: every worker holds it shared. On shutdown a
+      worker that can take it exclusively is the last one running and may
+      delete the webhook; a reload that already started new workers leaves
+      it in place.
+    - `<db>.migrate.lock`: held exclusively around schema setup, so workers
+      wait for a long migration instead of hitting the busy timeout.
+
+    Locks are released with the process, so a crash never leaves them stale.
+    """
+
+    def __init__(self, db_path: str):
+        self.leader_path = f"{db_path}.leader.lock"
+        self.workers_path = f"{db_path}.workers.lock"
+        self.migrate_path = f"{db_path}.migrate.lock"
+        self._leader_fd: Optional[int] = None
+        self._workers_fd: Optional[int] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader_fd is not None
+
+    def join(self) -> bool:
+        """Register this worker; returns True if it became the leader."""
+        # Blocks while a last worker from a previous run is still shutting
+        # down, so our ensure_webhook runs after its delete_webhook.
+        self._workers_fd = os.open(self.workers_path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._workers_fd, fcntl.LOCK_SH)
+
+        fd = os.open(self.leader_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._leader_fd = fd
+        return True
+
+    @contextmanager
+    def migrating(self) -> Iterator[None]:
+        fd = os.open(self.migrate_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def leave(self) -> bool:
+        """
+        Give up leadership and membership; returns True if no other worker
+        is running. The last worker keeps the members lock exclusively
+        until `close`, holding back new workers until its cleanup is done.
+        """
+        if self._leader_fd is not None:
+            os.close(self._leader_fd)
+            self._leader_fd = None
+        if self._workers_fd is None:
+            return False
+        fcntl.flock(self._workers_fd, fcntl.LOCK_UN)
+        try:
+            fcntl.flock(self._workers_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def close(self) -> None:
+        for fd in (self._leader_fd, self._workers_fd):
+            if fd is not None:
+                os.close(fd)
+        self._leader_fd = self._workers_fd = None
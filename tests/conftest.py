@@ -0,0 +1,15 @@
+import asyncio
+import os
+from typing import Any, Callable, Coroutine
+
+import pytest
+
+# src.llm_call builds its OpenAI clients at import, which needs a key; the
+# tests only talk to benchmarks.fake_openai
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+
+@pytest.fixture
+def run() -> Callable[[Coroutine[Any, Any, Any]], Any]:
+    """Run a coroutine to completion on a fresh event loop."""
+    return asyncio.run
@@ -0,0 +1,84 @@
+"""Eviction of the persistent extraction cache."""
+
+import time
+
+from src import fast_path
+from src.db import evict_extraction_cache, put_cached_extraction
+from src.db_pool import DBPool
+from src.llm_call import ExpenseExtraction
+
+TTL = 3600
+
+
+async def cache_size(pool: DBPool) -> int:
+    async with pool.reader() as conn:
+        cur = await conn.execute("SELECT count(*) FROM extraction_cache")
+        row = await cur.fetchone()
+        await cur.close()
+    assert row is not None
+    return row[0]
+
+
+def test_evicts_expired_then_oldest_beyond_max_rows(run, tmp_path):
+    async def main():
+        pool = DBPool(str(tmp_path / "bot.db"), readers=1)
+        await pool.open()
+        try:
+            conn = pool.writer
+            for i in range(10):
+                await put_cached_extraction(conn, f"m{i}", "h", i, "GAS", "ARS")
+            now = int(time.time())
+            # m0..m2 expired, m3..m9 one second apart, oldest first
+            await conn.executemany(
+                "UPDATE extraction_cache SET created_at = ? WHERE message_key = ?",
+                [(now - TTL - 1, f"m{i}") for i in range(3)]
+                + [(now - 10 + i, f"m{i}") for i in range(3, 10)],
+            )
+            await conn.commit()
+            deleted = await evict_extraction_cache(conn, TTL, max_rows=5)
+            cur = await conn.execute(
+                "SELECT message_key FROM extraction_cache ORDER BY created_at"
+            )
+            keys = [r[0] for r in await cur.fetchall()]
+            await cur.close()
+            plans = []
+            for query in (
+                "SELECT created_at FROM extraction_cache ORDER BY created_at DESC LIMIT 1 OFFSET 5",
+                "DELETE FROM extraction_cache WHERE created_at <= 0",
+            ):
+                cur = await conn.execute(f"EXPLAIN QUERY PLAN {query}")
+                plans.append(" ".join(r[3] for r in await cur.fetchall()))
+                await cur.close()
+            return deleted, keys, plans
+        finally:
+            await pool.close()
+
+    deleted, keys, plans = run(main())
+    assert deleted == 5
+    assert keys == ["m5", "m6", "m7", "m8", "m9"]
+    assert all("idx_extraction_cache_created" in plan for plan in plans), plans
+
+
+def test_remember_evicts_once_every_n_writes(run, tmp_path, monkeypatch):
+    monkeypatch.setattr(fast_path, "EXTRACTION_CACHE_MAX_ROWS", 2)
+    monkeypatch.setattr(fast_path, "EXTRACTION_CACHE_EVICT_EVERY", 4)
+    monkeypatch.setattr(fast_path, "fast_path_stats", fast_path.FastPathStats())
+    result = ExpenseExtraction(value=1, category="GAS", currency="ARS")
+
+    async def main():
+        pool = DBPool(str(tmp_path / "bot.db"), readers=1)
+        await pool.open()
+        try:
+            sizes = []
+            for i in range(6):
+                await fast_path._remember(pool, f"gas {i}", ["GAS"], result)
+                sizes.append(await cache_size(pool))
+            return sizes
+        finally:
+            await pool.close()
+
+    # Evicts on the 1st and 5th writes; in between the cache may grow
+    sizes = run(main())
+    assert sizes[:4] == [1, 2, 3, 4]
+    assert sizes[4] <= 2
+    assert sizes[5] == sizes[4] + 1
@@ -0,0 +1,61 @@
+"""Parsing expenses without the LLM."""
+
+import pytest
+
+from src.base_categories import BASE_CATEGORIES
+from src.fast_path import fast_parse_expense, parse_amount
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("150", 150.0),
+        ("20.5", 20.5),
+        ("799,99", 799.99),
+        ("1.500", 1500.0),
+        ("1,500", 1500.0),
+        ("1.500,50", 1500.5),
+        ("1,500.50", 1500.5),
+        ("1.000.000", 1000000.0),
+    ],
+)
+def test_parse_amount(text, expected):
+    assert parse_amount(text) == expected
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        ("cafe en la facu 150", (150.0, "SALIR A COMER", "ARS")),
+        ("20.5 USD regalo", (20.5, "REGALOS", "USD")),
+        ("super coto 1.500,50", (1500.5, "SUPERMERCADO", "ARS")),
+        ("u$s30 uber", (30.0, "TAXI", "USD")),
+        ("Teléfono 3000", (3000.0, "TELÉFONO", "ARS")),
+        ("gas 5000", (5000.0, "GAS", "ARS")),
+        ("otro 100", (100.0, "OTROS", "ARS")),
+    ],
+)
+def test_fast_parse_expense(message, expected):
+    parsed = fast_parse_expense(message, BASE_CATEGORIES)
+    assert parsed is not None
+    assert (parsed.value, parsed.category, parsed.currency) == expected
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "ubi x laburo",  # no amount
+        "netflix 799,99",  # no category
+        "cafe 150 y uber 300",  # two amounts
+        "super 100 usd eur",  # two currencies
+        "cafe en el super 150",  # two categories
+        "ga 500",  # too short to be the singular of GAS
+        "uber 0",
+    ],
+)
+def test_fast_parse_expense_leaves_ambiguous_messages_to_the_llm(message):
+    assert fast_parse_expense(message, BASE_CATEGORIES) is None
+
+
+def test_keywords_only_match_the_users_categories():
+    assert fast_parse_expense("cafe 150", ["SUPERMERCADO", "TAXI"]) is None
@@ -0,0 +1,192 @@
+"""Redelivered updates and overlapping edits must not duplicate expenses."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, List, Tuple
+
+import aiosqlite
+import pytest
+from telegram import Update
+
+from src import migrations
+from src.db import (
+    add_expense,
+    add_expenses,
+    claim_update,
+    init_db,
+    register_user,
+    replace_message_expenses,
+    verify_monthly_totals,
+)
+from src.db_pool import DBPool
+from src.update_queue import UpdateQueue
+
+DATE = 1735689600  # 2025-01-01
+RETENTION = 3600
+
+Lines = List[Tuple[float, str, str, str]]
+
+
+def message_update(update_id: int) -> Update:
+    return Update.de_json(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": 1,
+                "date": 0,
+                "chat": {"id": 1, "type": "private"},
+                "text": "cafe 150",
+            },
+        },
+        None,
+    )
+
+
+async def message_lines(conn: aiosqlite.Connection, message_id: int) -> List[Any]:
+    cur = await conn.execute(
+        "SELECT line_no, amount_cents FROM expenses WHERE message_id = ? ORDER BY line_no",
+        (message_id,),
+    )
+    rows = await cur.fetchall()
+    await cur.close()
+    return [tuple(r) for r in rows]
+
+
+@pytest.fixture
+def with_writer(run, tmp_path) -> Callable[..., Any]:
+    """Run `body(writer)` against a fresh pool with user 1 registered."""
+
+    def go(body: Callable[[aiosqlite.Connection], Awaitable[Any]]) -> Any:
+        async def main() -> Any:
+            pool = DBPool(str(tmp_path / "bot.db"), readers=1)
+            await pool.open()
+            try:
+                await register_user(pool.writer, 1)
+                return await body(pool.writer)
+            finally:
+                await pool.close()
+
+        return run(main())
+
+    return go
+
+
+def test_concurrent_claims_one_wins(with_writer):
+    async def body(conn):
+        return await asyncio.gather(
+            *(claim_update(conn, 42, RETENTION) for _ in range(20))
+        )
+
+    assert with_writer(body).count(True) == 1
+
+
+def test_redelivered_update_handled_once(with_writer):
+    handled: List[int] = []
+
+    async def body(conn):
+        async def handler(update: Update) -> None:
+            handled.append(update.update_id)
+
+        async def claim(update: Update) -> bool:
+            return await claim_update(conn, update.update_id, RETENTION)
+
+        queue = UpdateQueue(handler, workers=4, claim=claim)
+        queue.start()
+        for _ in range(5):
+            await queue.submit(message_update(7))
+        await queue.stop()
+        return queue.duplicates
+
+    assert with_writer(body) == 4
+    assert handled == [7]
+
+
+EDITS: List[Lines] = [
+    [(5, "AGUA", "ARS", "a")],
+    [(5, "AGUA", "ARS", "a"), (6, "GAS", "USD", "b"), (7, "GAS", "ARS", "c")],
+    [(8, "GAS", "ARS", "a"), (9, "AGUA", "ARS", "b")],
+]
+
+
+def test_concurrent_edits_keep_one_row_per_line(with_writer):
+    async def body(conn):
+        await add_expenses(
+            conn, 10, 1, 1, DATE, [(1, "AGUA", "ARS", "a"), (2, "GAS", "ARS", "b")]
+        )
+        await asyncio.gather(
+            *(replace_message_expenses(conn, 10, 1, 1, DATE, v) for v in EDITS * 10)
+        )
+        return await message_lines(conn, 10), await verify_monthly_totals(conn)
+
+    lines, mismatches = with_writer(body)
+    assert len(lines) in (1, 2, 3)
+    assert [n for n, _ in lines] == list(range(len(lines)))
+    assert mismatches == []
+
+
+def test_replayed_edit_is_a_noop(with_writer):
+    async def body(conn):
+        await add_expenses(conn, 10, 1, 1, DATE, [(1, "AGUA", "ARS", "a")])
+        await replace_message_expenses(conn, 10, 1, 1, DATE, EDITS[2])
+        before = await message_lines(conn, 10)
+        await replace_message_expenses(conn, 10, 1, 1, DATE, EDITS[2])
+        return before, await message_lines(conn, 10), await verify_monthly_totals(conn)
+
+    before, after, mismatches = with_writer(body)
+    assert before == after == [(0, 800), (1, 900)]
+    assert mismatches == []
+
+
+def test_redelivered_message_keeps_stored_row(with_writer):
+    # A second insert of a stored message (a redelivery, or the original
+    # arriving after its edit in another worker) keeps the stored row.
+    async def body(conn):
+        await add_expense(conn, 20, 1, 1, DATE, 3, "AGUA", "ARS", "x")
+        await add_expense(conn, 20, 1, 1, DATE, 5, "AGUA", "ARS", "x")
+        return await message_lines(conn, 20), conn.in_transaction
+
+    lines, in_transaction = with_writer(body)
+    assert lines == [(0, 300)]
+    assert not in_transaction
+
+
+def test_rejected_writes_end_their_transaction(with_writer):
+    async def body(conn):
+        with pytest.raises(ValueError):
+            await add_expense(conn, 30, 1, 1, DATE, 3, "NO LINKED", "ARS", "x")
+        after_single = conn.in_transaction
+        with pytest.raises(ValueError):
+            await add_expenses(conn, 31, 1, 1, DATE, [(3, "NO LINKED", "ARS", "x")])
+        return after_single, conn.in_transaction
+
+    assert with_writer(body) == (False, False)
+
+
+def test_upgrade_numbers_existing_lines(run, tmp_path, monkeypatch):
+    async def main():
+        conn = await aiosqlite.connect(str(tmp_path / "upgrade.db"))
+        try:
+            await conn.execute("PRAGMA foreign_keys=ON;")
+            with monkeypatch.context() as m:
+                m.setattr(
+                    migrations,
+                    "MIGRATIONS",
+                    [mig for mig in migrations.MIGRATIONS if mig.version <= 5],
+                )
+                await init_db(conn)
+            await register_user(conn, 1)
+            await conn.executemany(
+                """
+                INSERT INTO expenses (message_id, chat_id, user_id, date, amount_cents, category_name, currency, message)
+                VALUES (30, 1, 1, ?, ?, 'AGUA', 'ARS', 'x')
+                """,
+                [(DATE, cents) for cents in (100, 200, 300)],
+            )
+            await conn.commit()
+            await init_db(conn)
+            return await message_lines(conn, 30), await verify_monthly_totals(conn)
+        finally:
+            await conn.close()
+
+    lines, mismatches = run(main())
+    assert lines == [(0, 100), (1, 200), (2, 300)]
+    assert mismatches == []
@@ -0,0 +1,92 @@
+"""LLMBatcher against the local Responses API stub."""
+
+import asyncio
+import socket
+
+import pytest
+from openai import AsyncOpenAI
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from src import llm_batcher, llm_call
+from src.llm_batcher import LLMBatcher
+
+CATEGORIES = ["GAS", "SUPERMERCADO", "Otros"]
+LATENCY = 0.2
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def server():
+    with FakeOpenAIServer(latency=LATENCY, port=free_port()) as server:
+        yield server
+
+
+@pytest.fixture
+def batcher(server, monkeypatch) -> LLMBatcher:
+    # A client per test: each test runs on its own event loop
+    client = AsyncOpenAI(api_key="fake", base_url=server.base_url, max_retries=0)
+    monkeypatch.setattr(llm_call, "async_client", client)
+    return LLMBatcher(window_seconds=0.02, max_size=4)
+
+
+def test_burst_is_sent_in_batches(run, server, batcher):
+    async def main():
+        return await asyncio.gather(
+            *(batcher.submit(f"nafta {i}", CATEGORIES) for i in range(10))
+        )
+
+    before = server.requests
+    results = run(main())
+    assert len(results) == 10
+    assert all(r.category == "GAS" for r in results)
+    # max_size 4: two full batches, then the last two after the window
+    assert server.requests - before == 3
+    assert batcher.stats() == {"requests": 3, "messages": 10, "pending": 0}
+
+
+def test_failed_batch_falls_back_to_one_call_per_message(
+    run, server, batcher, monkeypatch
+):
+    async def wrong_count(messages, categories):
+        raise ValueError(f"Expected {len(messages)} extractions, got 1.")
+
+    monkeypatch.setattr(llm_batcher, "async_llm_call_many", wrong_count)
+
+    async def main():
+        return await asyncio.gather(
+            *(batcher.submit(f"nafta {i}", CATEGORIES) for i in range(3))
+        )
+
+    before = server.requests
+    results = run(main())
+    assert [r.value for r in results] == [100, 100, 100]
+    assert server.requests - before == 3
+
+
+def test_cancelled_submitter_does_not_break_its_batch(run, batcher, monkeypatch):
+    async def all_fail(messages, categories):
+        raise ValueError("batch failed")
+
+    async def main(fail: bool):
+        if fail:
+            monkeypatch.setattr(llm_batcher, "async_llm_call_many", all_fail)
+        tasks = [
+            asyncio.create_task(batcher.submit(f"nafta {i}", CATEGORIES))
+            for i in range(3)
+        ]
+        # Cancel one while its batch is in flight
+        await asyncio.sleep(0.02 + LATENCY / 2)
+        tasks[0].cancel()
+        return await asyncio.wait_for(
+            asyncio.gather(*tasks, return_exceptions=True), timeout=5
+        )
+
+    for fail in (False, True):
+        cancelled, *others = run(main(fail))
+        assert isinstance(cancelled, asyncio.CancelledError)
+        assert [r.category for r in others] == ["GAS", "GAS"]
@@ -0,0 +1,24 @@
+"""The strict JSON schemas sent as `text.format`."""
+
+from src.llm_call import get_extraction_spec
+
+
+def test_text_format_is_strict():
+    spec = get_extraction_spec(("GAS", "Otros"))
+    assert spec.text_format["type"] == "json_schema"
+    assert spec.text_format["strict"] is True
+    assert spec.text_format["name"] == "ExpenseExtraction"
+    schema = spec.text_format["schema"]
+    # Defaulted fields are required too: strict mode allows no optional keys
+    assert schema["required"] == ["value", "category", "currency"]
+    assert schema["additionalProperties"] is False
+    assert schema["properties"]["category"]["enum"] == ["GAS", "Otros"]
+
+
+def test_batch_text_format_is_strict_down_to_the_items():
+    schema = get_extraction_spec(("GAS", "Otros")).batch_text_format["schema"]
+    assert schema["required"] == ["items"]
+    assert schema["additionalProperties"] is False
+    item = schema["$defs"]["ExpenseExtraction"]
+    assert item["required"] == ["value", "category", "currency"]
+    assert item["additionalProperties"] is False
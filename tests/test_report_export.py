@@ -0,0 +1,64 @@
+"""/report arguments and the CSV they produce."""
+
+import csv
+import io
+from typing import Optional
+
+import aiosqlite
+
+from src.db import (
+    ReportFilter,
+    add_expense,
+    get_user_expenses_report,
+    init_db,
+    iter_user_expenses_report,
+    register_user,
+)
+from src.report_filters import parse_report_args
+from src.rows_to_csv_bytes import rows_to_csv_bytes, rows_to_csv_file
+
+DATE = 1735689600  # 2025-01-01
+
+
+def test_base_column_is_opt_in():
+    assert parse_report_args("2025-03").base is False
+    assert parse_report_args("base=1").base is True
+    assert parse_report_args("2025-03 base=0").base is False
+
+
+def test_currency_filter_matches_stored_codes():
+    for text in ("moneda=usd", "moneda=dólares", "moneda=u$s", "moneda=US$"):
+        assert parse_report_args(text).currency == "USD"
+
+
+async def export(filters: Optional[ReportFilter]):
+    conn = await aiosqlite.connect(":memory:")
+    try:
+        await init_db(conn)
+        await register_user(conn, 1)
+        await add_expense(conn, 1, 1, 1, DATE, 150, "GAS", "ARS", "nafta")
+        base = filters is not None and filters.base
+        with await rows_to_csv_file(
+            iter_user_expenses_report(conn, 1, filters), base=base
+        ) as f:
+            streamed = f.read().decode("utf-8")
+        rows = await get_user_expenses_report(conn, 1, filters)
+        buffered = rows_to_csv_bytes(rows, base=base).getvalue().decode("utf-8")
+        return streamed, buffered
+    finally:
+        await conn.close()
+
+
+def test_default_export_keeps_five_columns(run):
+    for text in (run(export(None)), run(export(ReportFilter(category="GAS")))):
+        for out in text:
+            header, row = list(csv.reader(io.StringIO(out)))
+            assert header == ["Fecha", "Monto", "Categoría", "Moneda", "Mensaje"]
+            assert row == ["2025-01-01 00:00:00", "150.0", "GAS", "ARS", "nafta"]
+
+
+def test_base_export_adds_the_base_amount(run):
+    for out in run(export(ReportFilter(base=True))):
+        header, row = list(csv.reader(io.StringIO(out)))
+        assert header[5].startswith("Monto ")
+        assert len(row) == 6
@@ -0,0 +1,56 @@
+"""Every /report filter combination must be served by an index: no table
+scan and no temp B-tree sort, so a monthly export touches only that
+month's rows."""
+
+from typing import Any, Dict, Optional
+
+import aiosqlite
+import pytest
+
+from src.db import ReportFilter, build_report_query, init_db
+
+MONTH: Dict[str, Any] = dict(
+    date_from="2025-03-01 00:00:00", date_to="2025-04-01 00:00:00"
+)
+CASES = {
+    "all": (None, "idx_expenses_user_date (user_id=?)"),
+    "month": (
+        ReportFilter(**MONTH),
+        "idx_expenses_user_date (user_id=? AND date>? AND date<?)",
+    ),
+    "month+category": (
+        ReportFilter(category="GAS", **MONTH),
+        "idx_expenses_user_cat_date (user_id=? AND category_name=? AND date>? AND date<?)",
+    ),
+    "month+currency": (
+        ReportFilter(currency="USD", **MONTH),
+        "idx_expenses_user_date (user_id=? AND date>? AND date<?)",
+    ),
+    "month+base": (
+        ReportFilter(base=True, **MONTH),
+        "idx_expenses_user_date (user_id=? AND date>? AND date<?)",
+    ),
+    "category": (
+        ReportFilter(category="GAS"),
+        "idx_expenses_user_cat_date (user_id=? AND category_name=?)",
+    ),
+}
+
+
+async def query_plan(filters: Optional[ReportFilter]) -> str:
+    conn = await aiosqlite.connect(":memory:")
+    try:
+        await init_db(conn)
+        sql, params = build_report_query(1, filters)
+        cur = await conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return " | ".join(r[3] for r in await cur.fetchall())
+    finally:
+        await conn.close()
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_report_query_uses_index(run, name):
+    filters, expected = CASES[name]
+    plan = run(query_plan(filters))
+    assert expected in plan
+    assert "TEMP B-TREE" not in plan
@@ -0,0 +1,54 @@
+"""Two pools on one file, as two gunicorn workers open it."""
+
+import time
+
+import pytest
+
+from src import db_pool
+from src.db import add_expense, add_expenses, register_user
+from src.db_pool import DBPool
+
+DATE = 1735689600  # 2025-01-01
+
+
+def test_failed_writes_release_the_lock_for_other_workers(run, tmp_path, monkeypatch):
+    # A write that leaves BEGIN IMMEDIATE open holds the file's write lock,
+    # so the other worker's next write would wait out the whole busy timeout
+    monkeypatch.setattr(db_pool, "DB_BUSY_TIMEOUT_MS", 2000)
+    path = str(tmp_path / "bot.db")
+
+    async def main():
+        first, second = DBPool(path, readers=1), DBPool(path, readers=1)
+        await first.open()
+        await second.open()
+        waits = {}
+        try:
+            await register_user(first.writer, 1)
+            await register_user(second.writer, 2)
+
+            async def other_worker_writes(after: str) -> None:
+                start = time.perf_counter()
+                await register_user(second.writer, 2)
+                waits[after] = time.perf_counter() - start
+
+            await add_expense(first.writer, 1, 1, 1, DATE, 3, "GAS", "ARS", "x")
+            await add_expense(first.writer, 1, 1, 1, DATE, 3, "GAS", "ARS", "x")
+            await other_worker_writes("duplicate")
+
+            with pytest.raises(ValueError):
+                await add_expense(first.writer, 2, 1, 1, DATE, 3, "NONE", "ARS", "x")
+            await other_worker_writes("rejected expense")
+
+            with pytest.raises(ValueError):
+                await add_expenses(
+                    first.writer, 3, 1, 1, DATE, [(3, "NONE", "ARS", "x")]
+                )
+            await other_worker_writes("rejected message")
+        finally:
+            await first.close()
+            await second.close()
+        return waits
+
+    waits = run(main())
+    assert list(waits) == ["duplicate", "rejected expense", "rejected message"]
+    assert max(waits.values()) < 1, waits